@@ -0,0 +1,111 @@
+"""
+Бенчмарк разбора страниц /properties/list: прежний разбор (json.loads всей страницы и обход цепочек .get())
+ и текущие hotel_search / hotel_search_distance на основе генератора iter_hotels, который прекращает разбор, как только
+  набрано нужное количество отелей. Используются страницы по 25 отелей из benchmarks.fake_data.
+
+Запуск: python -m benchmarks.bench_hotel_parser [количество повторов, по умолчанию 2000]
+"""
+import json
+import sys
+import time
+from typing import Callable, Dict, List
+
+from benchmarks.fake_data import TOTAL_PAGES, make_properties_page
+from bot.function import hotel_search, hotel_search_distance
+from bot.hotel_parser import _ijson
+
+
+def legacy_hotel_search(data: Dict, quantity: int) -> Dict[str, List]:
+    """
+    Прежний разбор страницы функцией hotel_search (до перехода на iter_hotels)
+    """
+    hotels = dict()
+    if data.get('data').get('body').get('searchResults').get('results'):
+        for element in data.get('data').get('body').get('searchResults').get('results'):
+            if len(hotels) < quantity:
+                if element.get('ratePlan') is not None and element.get('address') is not None:
+                    postal_code = element.get('address').get('postalCode')
+                    street_address = element.get('address').get('streetAddress')
+                    locality = element.get('address').get('locality')
+                    region = element.get('address').get('region')
+                    country_name = element.get('address').get('countryName')
+                    if region == locality or locality == '':
+                        full_address = [postal_code, street_address, region, country_name]
+                    elif region == '':
+                        full_address = [postal_code, street_address, locality, country_name]
+                    else:
+                        full_address = [postal_code, street_address, locality, region, country_name]
+                    full_address = ', '.join([value for value in full_address if value is not None])
+                    current_price = element.get('ratePlan').get('price').get('exactCurrent')
+                    hotels[element.get('name')] = [full_address, current_price]
+            else:
+                break
+    return hotels
+
+
+def legacy_hotel_search_distance(data: Dict, quantity: int, distance_minimum: float, distance_maximum: float,
+                                 price_min: float, price_max: float) -> Dict[str, List]:
+    """
+    Прежний разбор страницы функцией hotel_search_distance (до перехода на iter_hotels)
+    """
+    hotels = dict()
+    for element in data.get('data').get('body').get('searchResults').get('results'):
+        if (element.get('landmarks') is not None and element.get('ratePlan') is not None and
+                element.get('address') is not None):
+            current_distance = element.get('landmarks')[0].get('distance').split()[0]
+            if ',' in current_distance:
+                current_distance = current_distance.replace(',', '.')
+            current_distance = float(current_distance)
+            postal_code = element.get('address').get('postalCode')
+            street_address = element.get('address').get('streetAddress')
+            locality = element.get('address').get('locality')
+            region = element.get('address').get('region')
+            country_name = element.get('address').get('countryName')
+            if region == locality or locality == '':
+                full_address = [postal_code, street_address, region, country_name]
+            elif region == '':
+                full_address = [postal_code, street_address, locality, country_name]
+            else:
+                full_address = [postal_code, street_address, locality, region, country_name]
+            full_address = ', '.join(full_address)
+            current_price = element.get('ratePlan').get('price').get('exactCurrent')
+            if (len(hotels) < quantity and distance_minimum <= current_distance <= distance_maximum and
+                    price_min <= current_price <= price_max):
+                hotels[element.get('name')] = [full_address, current_price, current_distance]
+    return hotels
+
+
+def measure(parse: Callable[[bytes], Dict], pages: List[bytes], repeat: int) -> float:
+    """
+    Функция измерения среднего времени разбора одной страницы
+
+    :param parse: функция разбора тела ответа (Callable)
+    :param pages: тела ответов (List)
+    :param repeat: количество повторов (int)
+    :return: время разбора одной страницы в микросекундах (float)
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for raw in pages:
+            parse(raw)
+    return (time.perf_counter() - start) / (repeat * len(pages)) * 1e6
+
+
+if __name__ == '__main__':
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    pages = [json.dumps(make_properties_page(number), ensure_ascii=False).encode('utf-8')
+             for number in range(1, TOTAL_PAGES + 1)]
+    print(f'Страниц: {len(pages)} по 25 отелей, средний размер {sum(map(len, pages)) // len(pages)} байт, '
+          f'потоковый разбор (ijson): {"да" if _ijson is not None else "нет"}')
+    ranges = dict(distance_minimum=0.0, distance_maximum=5.0, price_min=0.0, price_max=1e9)
+    for quantity in (5, 25):
+        assert hotel_search(pages[0], quantity) == legacy_hotel_search(json.loads(pages[0]), quantity)
+        assert hotel_search_distance(pages[0], quantity, **ranges)[0] == \
+            legacy_hotel_search_distance(json.loads(pages[0]), quantity, **ranges)
+        legacy = measure(lambda raw: legacy_hotel_search(json.loads(raw), quantity), pages, repeat)
+        current = measure(lambda raw: hotel_search(raw, quantity), pages, repeat)
+        print(f'hotel_search, {quantity} отелей: прежний {legacy:.1f} мкс, текущий {current:.1f} мкс на страницу')
+        legacy = measure(lambda raw: legacy_hotel_search_distance(json.loads(raw), quantity, **ranges), pages, repeat)
+        current = measure(lambda raw: hotel_search_distance(raw, quantity, **ranges), pages, repeat)
+        print(f'hotel_search_distance, {quantity} отелей: прежний {legacy:.1f} мкс, '
+              f'текущий {current:.1f} мкс на страницу')
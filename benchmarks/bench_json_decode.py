@@ -0,0 +1,49 @@
+"""
+Бенчмарк декодирования ответов API в форматах /properties/list и /locations/search: прежний путь
+ json.loads(response.text) (тело ответа сначала декодируется в строку), json.loads из байтов и orjson.loads из байтов
+  (если orjson установлен). Для каждого способа выводятся время декодирования и пиковый объем памяти (tracemalloc).
+
+Запуск: python -m benchmarks.bench_json_decode [количество повторов, по умолчанию 2000]
+"""
+import json
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict
+
+from benchmarks.fake_data import make_locations, make_properties_page
+from bot.json_codec import DECODERS
+
+
+def measure(decode: Callable[[bytes], Any], raw: bytes, repeat: int) -> Dict[str, float]:
+    """
+    Функция измерения времени и пикового объема памяти декодирования ответа
+
+    :param decode: функция декодирования тела ответа (Callable)
+    :param raw: тело ответа (bytes)
+    :param repeat: количество повторов (int)
+    :return: среднее время в микросекундах и пиковый объем памяти в КБ (Dict)
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        decode(raw)
+    elapsed = (time.perf_counter() - start) / repeat * 1e6
+    tracemalloc.start()
+    data = decode(raw)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del data
+    return {'time': elapsed, 'peak': peak / 1024}
+
+
+if __name__ == '__main__':
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    payloads = {'/properties/list': make_properties_page(1), '/locations/search': make_locations('london')}
+    decoders = {'json.loads(text)': lambda raw: json.loads(raw.decode('utf-8'))}
+    decoders.update({f'{name}.loads(bytes)': decoder for name, decoder in DECODERS.items()})
+    for path, payload in payloads.items():
+        raw = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        print(f'{path}: {len(raw)} байт')
+        for name, decoder in decoders.items():
+            result = measure(decoder, raw, repeat)
+            print(f'    {name:<20} {result["time"]:8.1f} мкс, пик памяти {result["peak"]:7.1f} КБ')
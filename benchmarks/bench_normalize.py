@@ -0,0 +1,105 @@
+"""
+Бенчмарк нормализации названий городов: прежние определение языка в get_city_name (строка letters и проверки all()
+ по списковым включениям), разбор подписи города в parse_cities (re.sub при каждом вызове) и ключ кэша городов -
+  и текущие CityNormalizer, city_caption и city_cache_key из bot.normalize. Используются корпуса введенных
+   пользователями названий (benchmarks/fixtures/city_inputs.txt) и подписей /locations/search
+    (benchmarks/fixtures/city_captions.txt).
+
+Запуск: python -m benchmarks.bench_normalize [количество повторов, по умолчанию 2000]
+"""
+import os
+import re
+import sys
+import time
+from typing import Callable, List, Tuple
+
+from bot.locations_search import city_cache_key
+from bot.normalize import CityNormalizer, city_caption
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def legacy_city_name(text: str) -> Tuple[str, str]:
+    """
+    Прежние контроль ввода и определение языка в get_city_name
+    """
+    current_message = text.lower()
+    letters = 'abcdefghijklmnopqrstuvwxyz- абвгдеёжзийклмнопрстуфхцчшщъыьэюя'
+    current_message = ''.join([symbol for symbol in current_message if symbol in letters])
+
+    if all([True if symbol in letters[26:] else False for symbol in current_message]):
+        current_local = 'ru_RU'
+    elif all([True if symbol in letters[:28] else False for symbol in current_message]):
+        current_local = 'en_US'
+    else:
+        current_local = 'ERROR'
+    return current_message, current_local
+
+
+def legacy_city_caption(caption: str) -> str:
+    """
+    Прежний разбор подписи города в parse_cities
+    """
+    current_city_name = re.sub(r'<.+?>', '', caption)
+    city_full_name = current_city_name.split(',')
+    length = len(city_full_name)
+    country_name = city_full_name[length - 1]
+    if len([symbol for symbol in country_name if symbol.isupper()]) > 1:
+        city_full_name[length - 1] = re.sub(r'[a-z ]', '', country_name)
+    return ', '.join(city_full_name)
+
+
+def read_corpus(name: str) -> List[str]:
+    """
+    Функция чтения корпуса: одна строка - один пример, пробелы в начале и конце строки сохраняются
+
+    :param name: имя файла в каталоге benchmarks/fixtures (str)
+    :return: список примеров (List)
+    """
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as file:
+        return [line.rstrip('\n') for line in file if line.strip()]
+
+
+def measure(function: Callable[[str], object], corpus: List[str], repeat: int) -> float:
+    """
+    Функция измерения среднего времени обработки одного примера
+
+    :param function: проверяемая функция (Callable)
+    :param corpus: примеры (List)
+    :param repeat: количество повторов (int)
+    :return: время обработки одного примера в микросекундах (float)
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in corpus:
+            function(text)
+    return (time.perf_counter() - start) / (repeat * len(corpus)) * 1e6
+
+
+if __name__ == '__main__':
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    inputs, captions = read_corpus('city_inputs.txt'), read_corpus('city_captions.txt')
+    normalizer, legacy_locales = CityNormalizer(), CityNormalizer('ru_RU,en_US')
+    for text in inputs:  # С прежними языками результат совпадает, кроме пустого названия (теперь - ошибка ввода)
+        city, local = legacy_city_name(text)
+        if city.strip(' -'):
+            assert legacy_locales.normalize(text) == (city, None if local == 'ERROR' else local), text
+    for caption in captions:
+        assert city_caption(caption) == legacy_city_caption(caption), caption
+
+    legacy_accepted = [(city, local) for city, local in map(legacy_city_name, inputs)
+                       if local != 'ERROR' and city.strip(' -')]
+    accepted = [(city, local) for city, local in map(normalizer.normalize, inputs) if local is not None]
+    legacy_keys = {(' '.join(city.lower().split()), local) for city, local in legacy_accepted}
+    keys = {city_cache_key(city, local) for city, local in accepted}
+    print(f'Названий: {len(inputs)}, принято: прежний {len(legacy_accepted)}, текущий {len(accepted)} '
+          f'(языки {", ".join(normalizer.alphabets)}); ключей кэша: прежний {len(legacy_keys)}, текущий {len(keys)}')
+    legacy = measure(legacy_city_name, inputs, repeat)
+    current = measure(normalizer.normalize, inputs, repeat)
+    print(f'Определение языка: прежний {legacy:.2f} мкс, текущий {current:.2f} мкс на название')
+    legacy = measure(lambda text: ' '.join(text.lower().split()), inputs, repeat)
+    current = measure(lambda text: city_cache_key(text, 'ru_RU'), inputs, repeat)
+    print(f'Ключ кэша: прежний {legacy:.2f} мкс, текущий {current:.2f} мкс на название')
+    legacy = measure(legacy_city_caption, captions, repeat)
+    current = measure(city_caption, captions, repeat)
+    print(f'Подпись города: прежний {legacy:.2f} мкс, текущий {current:.2f} мкс на подпись')
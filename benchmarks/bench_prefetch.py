@@ -0,0 +1,42 @@
+"""
+Бенчмарк параллельной загрузки страниц: время поиска /bestdeal на 25 отелей с редкими совпадениями по расстоянию
+ при задержке API 300 мс, последовательно и с упреждающей загрузкой следующих страниц.
+
+Запуск: python -m benchmarks.bench_prefetch
+"""
+import time
+
+from benchmarks.fake_data import fake_hotels_api
+from bot import page_loader
+from bot.api_client import HotelsApiClient, MockTransport, set_client
+from bot.bestdeal import hotel_search_range
+from bot.page_cache import page_cache, parsed_cache
+from bot.quota import QuotaGovernor
+
+API_KEY = 'benchmark'
+LATENCY = 0.3
+
+
+def run(prefetch: int) -> float:
+    """
+    Функция выполнения одного поиска с заданной глубиной упреждающей загрузки
+
+    :param prefetch: количество страниц, загружаемых заранее (int)
+    :return: время выполнения поиска в секундах (float)
+    """
+    set_client(HotelsApiClient(API_KEY, transport=MockTransport(fake_hotels_api, latency=LATENCY),
+                               governor=QuotaGovernor(0, 0, 0, 0)))
+    page_loader.PAGE_PREFETCH = prefetch
+    page_cache.clear()  # Каждый прогон начинается с пустого кэша страниц
+    parsed_cache.clear()
+    start = time.perf_counter()
+    hotels = hotel_search_range(quantity=25, city_id=1506246, minimum_price=0, maximum_price=100000,
+                                minimum_distance=1.0, maximum_distance=2.0, api_key=API_KEY)
+    elapsed = time.perf_counter() - start
+    print(f'prefetch={prefetch}: {elapsed:.2f} s, найдено отелей: {len(hotels)}')
+    return elapsed
+
+
+if __name__ == '__main__':
+    for depth in (0, 1, 3, 9):
+        run(depth)
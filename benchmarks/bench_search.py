@@ -0,0 +1,121 @@
+"""
+Бенчмарк функций поиска hotel_search_sort (PRICE и PRICE_HIGHEST_FIRST), hotel_search_range (bestdeal) и city_search
+ через HTTP на имитаторе API benchmarks.fake_hotels_server. Имитатор запускается отдельным процессом, поэтому время
+  процессора относится только к боту. Для каждого вида поиска выводятся задержка p50 / p95, количество загруженных
+   страниц и время процессора на один поиск, а также количество поисков, завершившихся ошибкой.
+Перед каждым поиском кэши страниц и городов очищаются, а локальный индекс отелей отключен (кроме запуска с --warm).
+
+Запуск: python -m benchmarks.bench_search [--searches 20] [--fixtures каталог] [--latency 0.3] [--jitter 0.1]
+         [--error-rate 0.0] [--slow-rate 0.0] [--slow-latency 5.0] [--url адрес уже запущенного имитатора] [--warm]
+Повторы, автомат защиты и дублирование запросов клиента API настраиваются переменными окружения API_RETRIES,
+ CIRCUIT_FAILURES, API_HEDGE_AFTER и т.д.
+"""
+import argparse
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List
+
+from bot import hotel_index
+from bot.api_client import HotelsApiClient, set_client
+from bot.bestdeal import hotel_search_range
+from bot.locations_search import city_cache, city_search
+from bot.low_high_price import hotel_search_sort
+from bot.page_cache import page_cache, parsed_cache
+from bot.quota import QuotaGovernor
+
+API_KEY = 'benchmark'
+CITY_ID = 1506246
+
+SEARCHES: Dict[str, Callable[[], Dict]] = {
+    'PRICE': lambda: hotel_search_sort(quantity=10, city_id=CITY_ID, api_key=API_KEY, search_kind='PRICE'),
+    'PRICE_HIGHEST_FIRST': lambda: hotel_search_sort(quantity=10, city_id=CITY_ID, api_key=API_KEY,
+                                                     search_kind='PRICE_HIGHEST_FIRST'),
+    'bestdeal': lambda: hotel_search_range(quantity=10, city_id=CITY_ID, minimum_price=0, maximum_price=100000,
+                                           minimum_distance=1.0, maximum_distance=2.0, api_key=API_KEY),
+    'bestdeal_far': lambda: hotel_search_range(quantity=10, city_id=CITY_ID, minimum_price=0, maximum_price=100000,
+                                               minimum_distance=12.0, maximum_distance=20.0, api_key=API_KEY),
+    'city_search': lambda: city_search('london', api_key=API_KEY, local='en_US'),
+}
+
+
+def start_server(arguments: argparse.Namespace) -> subprocess.Popen:
+    """
+    Функция запуска имитатора API отдельным процессом
+
+    :param arguments: параметры командной строки (argparse.Namespace)
+    :return: процесс имитатора; адрес имитатора записывается в arguments.url (subprocess.Popen)
+    """
+    command = [sys.executable, '-m', 'benchmarks.fake_hotels_server', '--port', '0',
+               '--latency', str(arguments.latency), '--jitter', str(arguments.jitter),
+               '--error-rate', str(arguments.error_rate), '--slow-rate', str(arguments.slow_rate),
+               '--slow-latency', str(arguments.slow_latency)]
+    if arguments.fixtures:
+        command += ['--fixtures', arguments.fixtures]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    for line in process.stdout:
+        if line.startswith('Имитатор API работает:'):
+            arguments.url = line.split()[-1]
+            break
+    return process
+
+
+def run(name: str, search: Callable[[], Dict], client: HotelsApiClient, count: int, warm: bool) -> Dict[str, float]:
+    """
+    Функция выполнения count поисков одного вида
+
+    :param name: вид поиска (str)
+    :param search: функция поиска (Callable)
+    :param client: клиент API, через который выполняются запросы (HotelsApiClient)
+    :param count: количество поисков (int)
+    :param warm: не очищать кэши перед поиском (bool)
+    :return: метрики поиска (Dict)
+    """
+    latencies: List[float] = list()
+    errors, requests_before, cpu_before = 0, client.requests_count, time.process_time()
+    for _ in range(count):
+        if not warm:
+            page_cache.clear()
+            parsed_cache.clear()
+            city_cache.clear()
+        start = time.perf_counter()
+        try:
+            search()
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {'name': name, 'p50': latencies[len(latencies) // 2], 'p95': latencies[int(len(latencies) * 0.95)],
+            'pages': (client.requests_count - requests_before) / count,
+            'cpu': (time.process_time() - cpu_before) / count, 'errors': errors}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Бенчмарк функций поиска на имитаторе API')
+    parser.add_argument('--searches', type=int, default=20)
+    parser.add_argument('--fixtures', default='')
+    parser.add_argument('--latency', type=float, default=0.3)
+    parser.add_argument('--jitter', type=float, default=0.1)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--slow-rate', type=float, default=0.0)
+    parser.add_argument('--slow-latency', type=float, default=5.0)
+    parser.add_argument('--url', default='')
+    parser.add_argument('--warm', action='store_true')
+    arguments = parser.parse_args()
+
+    hotel_index.HOTEL_INDEX = arguments.warm
+    server = None if arguments.url else start_server(arguments)
+    api_client = HotelsApiClient(API_KEY, base_url=arguments.url, governor=QuotaGovernor(0, 0, 0, 0))
+    set_client(api_client)
+    try:
+        print(f'Имитатор API: {arguments.url}, поисков каждого вида: {arguments.searches}')
+        print(f'{"Поиск":<20} {"p50, мс":>9} {"p95, мс":>9} {"страниц":>8} {"CPU, мс":>8} {"ошибок":>7}')
+        for search_name, search_function in SEARCHES.items():
+            metrics = run(search_name, search_function, api_client, arguments.searches, arguments.warm)
+            print(f'{metrics["name"]:<20} {metrics["p50"] * 1000:9.1f} {metrics["p95"] * 1000:9.1f} '
+                  f'{metrics["pages"]:8.1f} {metrics["cpu"] * 1000:8.2f} {metrics["errors"]:7d}')
+    finally:
+        api_client.close()
+        if server is not None:
+            server.terminate()
+            server.wait()
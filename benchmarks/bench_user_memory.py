@@ -0,0 +1,78 @@
+"""
+Бенчмарк памяти сессий: объем памяти, занимаемый N сессиями пользователей в прежнем представлении (свойства поверх
+ __dict__, строковый вид поиска, словарь result_cities у каждого пользователя) и в текущем классе User (__slots__,
+  SearchMode), а также время сериализации to_bytes / from_bytes.
+
+Запуск: python -m benchmarks.bench_user_memory [количество сессий, по умолчанию 1000000]
+"""
+import sys
+import time
+import tracemalloc
+from typing import Callable
+
+from bot.user import SearchMode, User
+
+
+class LegacyUser:
+    """
+    Прежнее представление сессии пользователя (до перехода на __slots__)
+    """
+
+    def __init__(self, user_id: int) -> None:
+        self.__user_id = user_id
+        self.__flag_search, self.__current_city_id, self.__message_id = 'NOT_CHOSEN', '', 0
+        self.__minimum_price, self.__maximum_price, self.__minimum_distance, self.__maximum_distance = 0, 0, 0, 0
+        self.__result_cities = dict()
+
+    @property
+    def flag_search(self) -> str:
+        return self.__flag_search
+
+    @flag_search.setter
+    def flag_search(self, value: str) -> None:
+        self.__flag_search = value
+
+
+def measure(factory: Callable, count: int) -> int:
+    """
+    Функция измерения памяти, занимаемой count экземплярами, созданными функцией factory
+
+    :param factory: функция создания сессии по id пользователя (Callable)
+    :param count: количество сессий (int)
+    :return: объем памяти в байтах (int)
+    """
+    tracemalloc.start()
+    sessions = [factory(user_id) for user_id in range(count)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del sessions
+    return size
+
+
+def legacy_session(user_id: int) -> LegacyUser:
+    user = LegacyUser(user_id)
+    user.flag_search = 'LOW_PRICE'
+    return user
+
+
+def compact_session(user_id: int) -> User:
+    user = User(user_id)
+    user.flag_search = SearchMode.LOW_PRICE
+    return user
+
+
+if __name__ == '__main__':
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    legacy_size = measure(legacy_session, number)
+    compact_size = measure(compact_session, number)
+    print(f'Сессий: {number}')
+    print(f'Прежнее представление: {legacy_size / 2 ** 20:.1f} МБ ({legacy_size / number:.0f} байт на сессию)')
+    print(f'User со __slots__:     {compact_size / 2 ** 20:.1f} МБ ({compact_size / number:.0f} байт на сессию)')
+
+    sample = compact_session(1)
+    sample.current_city_id, sample.result_cities = '1153093', {'1153093': 'Москва, Россия'}
+    start = time.perf_counter()
+    for _ in range(100000):
+        User.from_bytes(sample.to_bytes())
+    elapsed = time.perf_counter() - start
+    print(f'to_bytes + from_bytes: {elapsed * 10:.2f} мкс на сессию, размер {len(sample.to_bytes())} байт')
@@ -0,0 +1,89 @@
+"""
+Синтетические ответы API сайта hotels.com в формате /properties/list и /locations/search.
+Используются бенчмарками вместе с MockTransport, чтобы измерения не зависели от сети и квоты RapidAPI.
+"""
+import json
+from typing import Dict, Tuple
+
+PAGE_SIZE = 25
+TOTAL_PAGES = 10
+
+
+def make_hotel(page_number: int, position: int) -> Dict:
+    """
+    Функция создания описания одного отеля. Стоимость растет вместе с номером страницы и позицией на ней (как при
+     сортировке 'PRICE'), расстояние от центра псевдослучайно распределено от 0 до 10 км.
+
+    :param page_number: номер страницы (int)
+    :param position: позиция отеля на странице (int)
+    :return: описание отеля в формате API (Dict)
+    """
+    number = (page_number - 1) * PAGE_SIZE + position
+    distance = (number * 37 % 100) / 10
+    return {
+        'id': 100000 + number,
+        'name': f'Hotel {number}',
+        'address': {'streetAddress': f'Street {number}', 'locality': 'Moscow', 'postalCode': '101000',
+                    'region': 'Moscow', 'countryName': 'Russia'},
+        'ratePlan': {'price': {'current': f'{1000 + number * 40} RUB', 'exactCurrent': float(1000 + number * 40)}},
+        'landmarks': [{'label': 'City center', 'distance': f'{distance:.1f} км'.replace('.', ',')}]
+    }
+
+
+def make_properties_page(page_number: int, page_size: int = PAGE_SIZE, sort_order: str = 'PRICE') -> Dict:
+    """
+    Функция создания страницы ответа /properties/list. При сортировке 'DISTANCE_FROM_LANDMARK' отели упорядочены по
+     расстоянию от центра, при 'PRICE_HIGHEST_FIRST' - по убыванию стоимости, иначе - по возрастанию стоимости.
+
+    :param page_number: номер страницы (int)
+    :param page_size: количество отелей на странице (int)
+    :param sort_order: вид сортировки (str)
+    :return: страница ответа (Dict)
+    """
+    if sort_order == 'DISTANCE_FROM_LANDMARK':
+        hotels = sorted((make_hotel(1, number) for number in range(TOTAL_PAGES * PAGE_SIZE)),
+                        key=lambda hotel: float(hotel['landmarks'][0]['distance'].split()[0].replace(',', '.')))
+        results = hotels[(page_number - 1) * page_size:page_number * page_size]
+    elif sort_order == 'PRICE_HIGHEST_FIRST':
+        last = TOTAL_PAGES * PAGE_SIZE - 1
+        results = [make_hotel(1, last - number)
+                   for number in range((page_number - 1) * page_size, min(page_number * page_size, last + 1))]
+    else:
+        results = [make_hotel(page_number, position) for position in range(page_size)] \
+            if page_number <= TOTAL_PAGES else []
+    return {'result': 'OK', 'data': {'body': {'searchResults': {
+        'totalCount': TOTAL_PAGES * PAGE_SIZE, 'results': results,
+        'pagination': {'currentPage': page_number, 'nextPageNumber': page_number + 1}}}}}
+
+
+def make_locations(query: str) -> Dict:
+    """
+    Функция создания ответа /locations/search с несколькими городами с переданным названием
+
+    :param query: название города (str)
+    :return: ответ (Dict)
+    """
+    name = query.title()
+    entities = [{'destinationId': str(1000 + number), 'type': 'CITY', 'name': name,
+                 'caption': f"<span class='highlighted'>{name}</span>, Region {number}, United States of America"}
+                for number in range(3)]
+    return {'term': query, 'suggestions': [{'group': 'CITY_GROUP', 'entities': entities},
+                                           {'group': 'HOTEL_GROUP', 'entities': []}]}
+
+
+def fake_hotels_api(path: str, params: Dict[str, str]) -> Tuple[int, bytes]:
+    """
+    Обработчик запросов для MockTransport, имитирующий API сайта
+
+    :param path: путь запроса (str)
+    :param params: параметры запроса (Dict)
+    :return: код ответа и тело ответа (Tuple)
+    """
+    if path == '/properties/list':
+        data = make_properties_page(int(params.get('pageNumber', 1)), int(params.get('pageSize', PAGE_SIZE)),
+                                    params.get('sortOrder', 'PRICE'))
+    elif path == '/locations/search':
+        data = make_locations(params.get('query', ''))
+    else:
+        return 404, b'{"message": "Not found"}'
+    return 200, json.dumps(data, ensure_ascii=False).encode('utf-8')
@@ -0,0 +1,114 @@
+"""
+Имитатор API сайта hotels.com (hotels4) для бенчмарков и ручной проверки бота без сети. Отвечает на запросы
+ /properties/list и /locations/search записанными ответами из каталога (--fixtures, см. API_RECORD_DIR) или
+  синтетическими ответами benchmarks.fake_data. Задержка ответа, ее разброс, доля ответов с ошибкой и доля очень
+   медленных ответов (для проверки повторов, автомата защиты и дублирования запросов клиента API) настраиваются.
+
+Запуск: python -m benchmarks.fake_hotels_server [--port 8081] [--fixtures каталог] [--latency 0.3] [--jitter 0.1]
+         [--error-rate 0.0] [--slow-rate 0.0] [--slow-latency 5.0]
+Бот направляется на имитатор переменной окружения API_URL=http://127.0.0.1:8081
+"""
+import argparse
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from benchmarks.fake_data import fake_hotels_api
+from bot.fixtures import FixtureStore
+
+
+class FakeHotelsServer:
+    """
+    Класс - HTTP-сервер, имитирующий API сайта
+
+    Args:
+        handler (Callable): функция, принимающая путь и параметры запроса и возвращающая код и тело ответа
+        host (str): адрес
+        port (int): порт, 0 - любой свободный
+        latency (float): средняя задержка ответа в секундах
+        jitter (float): максимальное отклонение задержки от средней в секундах
+        error_rate (float): доля ответов с кодом 503
+        slow_rate (float): доля ответов с задержкой slow_latency
+        slow_latency (float): задержка медленного ответа в секундах
+    """
+
+    def __init__(self, handler: Callable[[str, Dict[str, str]], Tuple[int, bytes]], host: str = '127.0.0.1',
+                 port: int = 0, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 slow_rate: float = 0.0, slow_latency: float = 5.0) -> None:
+        self.handler = handler
+        self.latency, self.jitter, self.error_rate = latency, jitter, error_rate
+        self.slow_rate, self.slow_latency = slow_rate, slow_latency
+        self.requests_count, self.errors_count = 0, 0
+        self.httpd = ThreadingHTTPServer((host, port), self.__handler_class())
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def respond(self, path: str, params: Dict[str, str]) -> Tuple[int, bytes]:
+        """
+        Метод формирования ответа с учетом задержки и доли ошибок
+
+        :param path: путь запроса (str)
+        :param params: параметры запроса (Dict)
+        :return: код и тело ответа (Tuple)
+        """
+        self.requests_count += 1
+        delay = self.latency + random.uniform(-self.jitter, self.jitter)
+        if random.random() < self.slow_rate:
+            delay = self.slow_latency
+        if delay > 0:
+            time.sleep(delay)
+        if random.random() < self.error_rate:
+            self.errors_count += 1
+            return 503, b'{"message": "Service unavailable"}'
+        return self.handler(path, params)
+
+    def __handler_class(self) -> Any:
+        server = self
+
+        class FakeHotelsHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Соединения клиента переиспользуются, как у настоящего API
+
+            def do_GET(self) -> None:
+                url = urlsplit(self.path)
+                status, body = server.respond(url.path, dict(parse_qsl(url.query)))
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        return FakeHotelsHandler
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Имитатор API сайта hotels.com')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--fixtures', default='')
+    parser.add_argument('--latency', type=float, default=0.3)
+    parser.add_argument('--jitter', type=float, default=0.1)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--slow-rate', type=float, default=0.0)
+    parser.add_argument('--slow-latency', type=float, default=5.0)
+    arguments = parser.parse_args()
+
+    handler = fake_hotels_api
+    if arguments.fixtures:
+        handler = FixtureStore(arguments.fixtures)
+        print(f'Записанных ответов: {len(handler)}')
+    server = FakeHotelsServer(handler, arguments.host, arguments.port, arguments.latency, arguments.jitter,
+                              arguments.error_rate, arguments.slow_rate, arguments.slow_latency)
+    print(f'Имитатор API работает: {server.url}', flush=True)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
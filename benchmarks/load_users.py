@@ -0,0 +1,260 @@
+"""
+Нагрузочный тест диалогов бота: синтетические пользователи проходят полный диалог /start -> вид поиска -> город ->
+ выбор города кнопкой -> (стоимость и расстояние для /bestdeal) -> количество отелей. Обновления передаются в
+  обработчики main.py так же, как при опросе сервера телеграмма (bot.process_new_updates из одного потока), Bot API
+   заменен заглушкой apihelper._make_request, API сайта - MockTransport с синтетическими ответами.
+Каждый шаг диалога считается выполненным, когда бот отправил ожидаемое пользователем сообщение (например, клавиатуру
+ выбора города). Для каждого числа одновременных пользователей выводятся время ответа на шаг (p50 / p95), время всего
+  диалога, пропускная способность обработчиков, а также размеры хранилища сессий users и реестра next-step
+   обработчиков и пиковый объем памяти процесса.
+
+Запуск: python -m benchmarks.load_users [--users 100 500 1000] [--think 0.5] [--api-latency 0.05]
+         [--chat-rate 1.0] [--send-rate 30] [--timeout 120] [--tracemalloc]
+Ограничения частоты отправки (--chat-rate, --send-rate) по умолчанию равны ограничениям телеграмма; для измерения
+ производительности самих обработчиков их можно увеличить.
+"""
+import argparse
+import heapq
+import itertools
+import json
+import os
+import random
+import resource
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional, Tuple
+
+import telebot
+
+# Шаги диалога: вид шага, текст сообщения пользователя, ожидаемый фрагмент ответа бота
+CONVERSATIONS = {
+    'lowprice': [('text', '/start', 'Ожидаю Ваш выбор'), ('text', '/lowprice', 'В каком городе ищем'),
+                 ('text', 'london', 'Выберите город'), ('callback', '', 'Сколько гостиниц'),
+                 ('text', '5', 'Результат')],
+    'highprice': [('text', '/start', 'Ожидаю Ваш выбор'), ('text', '/highprice', 'В каком городе ищем'),
+                  ('text', 'москва', 'Выберите город'), ('callback', '', 'Сколько гостиниц'),
+                  ('text', '5', 'Результат')],
+    'bestdeal': [('text', '/start', 'Ожидаю Ваш выбор'), ('text', '/bestdeal', 'В каком городе ищем'),
+                 ('text', 'paris', 'Выберите город'), ('callback', '', 'минимальную стоимость'),
+                 ('text', '1000', 'максимальную стоимость'), ('text', '20000', 'минимальное расстояние'),
+                 ('text', '1', 'максимальное расстояние'), ('text', '5', 'Сколько гостиниц'),
+                 ('text', '5', 'Результат')],
+}
+FAILURE_MARKERS = ('Не нашел', 'сбой', 'недоступен', 'лимит')
+USER_SHIFT = 10000000
+
+
+class SimulatedUser:
+    """
+    Класс - синтетический пользователь, проходящий один диалог
+
+    Args:
+        user_id (int): id пользователя и чата
+        mode (str): вид поиска, ключ CONVERSATIONS
+    """
+    __slots__ = ('user_id', 'steps', 'step', 'sent_at', 'started', 'finished', 'failed', 'callback_data',
+                 'keyboard_id')
+
+    def __init__(self, user_id: int, mode: str) -> None:
+        self.user_id = user_id
+        self.steps = CONVERSATIONS[mode]
+        self.step, self.sent_at, self.started, self.finished, self.failed = 0, 0.0, 0.0, 0.0, False
+        self.callback_data, self.keyboard_id = '', 0
+
+
+class LoadDriver:
+    """
+    Класс - генератор нагрузки: передает обновления пользователей боту и отслеживает ответы бота через заглушку
+     Bot API
+
+    Args:
+        bot (telebot.TeleBot): бот из main.py
+        think (float): пауза пользователя перед следующим сообщением в секундах
+    """
+
+    def __init__(self, bot: Any, think: float) -> None:
+        self.bot = bot
+        self.think = think
+        self.users: Dict[int, SimulatedUser] = dict()
+        self.latencies: List[float] = list()
+        self.durations: List[float] = list()
+        self.updates, self.replies = 0, 0
+        self.__message_ids: Dict[int, itertools.count] = dict()
+        self.__schedule: List[Tuple[float, int, int]] = list()
+        self.__ready = threading.Condition()
+        self.__update_ids = itertools.count(1)
+        self.__active = 0
+
+    def make_request(self, token: str, method_name: str, method: str = 'get', params: Optional[Dict] = None,
+                     files: Any = None) -> Any:
+        """
+        Заглушка telebot.apihelper._make_request: отвечает как Bot API и передает отправленные ботом сообщения
+         пользователям
+        """
+        params = params or dict()
+        if method_name not in ('sendMessage', 'editMessageText'):
+            return True
+        chat_id = int(params['chat_id'])
+        message_id = self.__next_message_id(chat_id) if method_name == 'sendMessage' else int(params['message_id'])
+        self.__on_reply(chat_id, message_id, params.get('text', ''), params.get('reply_markup'))
+        return {'message_id': message_id, 'date': int(time.time()), 'text': params.get('text', ''),
+                'chat': {'id': chat_id, 'type': 'private'}}
+
+    def run(self, count: int, first_user_id: int, timeout: float) -> float:
+        """
+        Метод одновременного запуска count пользователей и ожидания окончания их диалогов
+
+        :param count: количество пользователей (int)
+        :param first_user_id: id первого пользователя (int)
+        :param timeout: максимальное время ожидания в секундах (float)
+        :return: время выполнения в секундах (float)
+        """
+        modes = list(CONVERSATIONS)
+        start = time.perf_counter()
+        with self.__ready:
+            for user_id in range(first_user_id, first_user_id + count):
+                self.users[user_id] = SimulatedUser(user_id, random.choice(modes))
+                heapq.heappush(self.__schedule, (time.monotonic() + random.uniform(0, self.think), user_id, 0))
+            self.__active += count
+            self.__ready.notify_all()
+        feeder = threading.Thread(target=self.__feed, args=(start + timeout,), daemon=True)
+        feeder.start()
+        feeder.join(timeout + 1)
+        return time.perf_counter() - start
+
+    def __next_message_id(self, chat_id: int) -> int:
+        # В личном чате сообщения пользователя и бота нумеруются общим счетчиком
+        with self.__ready:
+            counter = self.__message_ids.get(chat_id)
+            if counter is None:
+                counter = self.__message_ids[chat_id] = itertools.count(1)
+            return next(counter)
+
+    def __on_reply(self, chat_id: int, message_id: int, text: str, reply_markup: Optional[str]) -> None:
+        now = time.monotonic()
+        with self.__ready:
+            self.replies += 1
+            user = self.users.get(chat_id)
+            if user is None or user.finished:
+                return
+            marker = user.steps[user.step][2]
+            if marker in text:
+                self.latencies.append(now - user.sent_at)
+                if reply_markup:
+                    keyboard = json.loads(reply_markup)
+                    user.callback_data = keyboard['inline_keyboard'][0][0]['callback_data']
+                    user.keyboard_id = message_id
+                user.step += 1
+                if user.step == len(user.steps):
+                    self.__finish(user, now)
+                else:
+                    heapq.heappush(self.__schedule, (now + self.think, user.user_id, user.step))
+                    self.__ready.notify()
+            elif any(failure in text for failure in FAILURE_MARKERS):
+                user.failed = True
+                self.__finish(user, now)
+
+    def __finish(self, user: SimulatedUser, now: float) -> None:
+        user.finished = now
+        self.durations.append(now - user.started)
+        self.__active -= 1
+        self.__ready.notify_all()
+
+    def __feed(self, deadline: float) -> None:
+        while True:
+            with self.__ready:
+                while True:
+                    now = time.monotonic()
+                    if self.__active == 0 or time.perf_counter() >= deadline:
+                        return
+                    if self.__schedule and self.__schedule[0][0] <= now:
+                        _, user_id, step = heapq.heappop(self.__schedule)
+                        break
+                    self.__ready.wait(self.__schedule[0][0] - now if self.__schedule else 0.1)
+                user = self.users[user_id]
+                user.sent_at = now
+                if step == 0:
+                    user.started = now
+                self.updates += 1
+            self.bot.process_new_updates([self.__update(user, step)])
+
+    def __update(self, user: SimulatedUser, step: int) -> telebot.types.Update:
+        kind, text, _ = user.steps[step]
+        sender = {'id': user.user_id, 'is_bot': False, 'first_name': f'User{user.user_id}'}
+        chat = {'id': user.user_id, 'type': 'private'}
+        if kind == 'callback':
+            update = {'update_id': next(self.__update_ids), 'callback_query': {
+                'id': str(next(self.__update_ids)), 'from': sender, 'chat_instance': str(user.user_id),
+                'data': user.callback_data,
+                'message': {'message_id': user.keyboard_id, 'date': int(time.time()), 'chat': chat,
+                            'from': {'id': 1, 'is_bot': True, 'first_name': 'Bot'}, 'text': 'Выберите город'}}}
+        else:
+            update = {'update_id': next(self.__update_ids), 'message': {
+                'message_id': self.__next_message_id(user.user_id), 'date': int(time.time()), 'from': sender,
+                'chat': chat, 'text': text}}
+        return telebot.types.Update.de_json(update)
+
+
+def percentile(values: List[float], share: float) -> float:
+    """
+    Функция вычисления перцентиля
+
+    :param values: значения (List)
+    :param share: доля от 0 до 1 (float)
+    :return: значение перцентиля или 0 для пустого списка (float)
+    """
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Нагрузочный тест диалогов бота')
+    parser.add_argument('--users', type=int, nargs='+', default=[100, 500, 1000])
+    parser.add_argument('--think', type=float, default=0.5)
+    parser.add_argument('--api-latency', type=float, default=0.05)
+    parser.add_argument('--chat-rate', type=float, default=1.0)
+    parser.add_argument('--send-rate', type=float, default=30.0)
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--tracemalloc', action='store_true')
+    arguments = parser.parse_args()
+
+    # Настройки бота читаются из окружения при импорте main
+    os.environ.setdefault('BOT_TOKEN', '1:load-test')
+    os.environ.setdefault('API_KEY', 'load-test')
+    os.environ['CHAT_SEND_RATE'] = str(arguments.chat_rate)
+    os.environ['SEND_RATE'] = str(arguments.send_rate)
+    os.environ['SEND_BURST'] = str(max(int(arguments.send_rate), 1))
+    os.environ.setdefault('QUOTA_GLOBAL_MINUTE', '0')  # Общий бюджет квоты не ограничивает синтетическую нагрузку
+    os.environ.setdefault('QUOTA_GLOBAL_DAY', '0')
+    import main
+    from benchmarks.fake_data import fake_hotels_api
+    from bot.api_client import HotelsApiClient, MockTransport, set_client
+
+    set_client(HotelsApiClient(main.api_key, transport=MockTransport(fake_hotels_api, latency=arguments.api_latency)))
+    driver = LoadDriver(main.bot, arguments.think)
+    telebot.apihelper._make_request = driver.make_request
+    if arguments.tracemalloc:
+        tracemalloc.start()
+
+    first_id = USER_SHIFT
+    print(f'{"Польз.":>7} {"время, с":>9} {"шаг p50":>8} {"шаг p95":>8} {"диалог p50":>11} {"обраб./с":>9} '
+          f'{"готово":>7} {"ошибок":>7} {"сессий":>7} {"next-step":>10} {"память, МБ":>11}')
+    for users_count in arguments.users:
+        driver.latencies, driver.durations = list(), list()
+        dispatcher = getattr(main.bot, 'dispatcher', None)
+        completed_before = dispatcher.metrics()['completed'] if dispatcher is not None else driver.updates
+        elapsed = driver.run(users_count, first_id, arguments.timeout)
+        completed = (dispatcher.metrics()['completed'] if dispatcher is not None else driver.updates) \
+            - completed_before
+        phase_users = [driver.users[user_id] for user_id in range(first_id, first_id + users_count)]
+        memory = tracemalloc.get_traced_memory()[1] if arguments.tracemalloc else \
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        print(f'{users_count:7d} {elapsed:9.2f} {percentile(driver.latencies, 0.5) * 1000:6.0f}мс '
+              f'{percentile(driver.latencies, 0.95) * 1000:6.0f}мс {percentile(driver.durations, 0.5):10.2f}с '
+              f'{completed / elapsed:9.1f} {sum(1 for user in phase_users if user.finished and not user.failed):7d} '
+              f'{sum(1 for user in phase_users if user.failed):7d} {len(main.users):7d} '
+              f'{len(main.bot.next_step_backend.handlers):10d} {memory / 2 ** 20:11.1f}')
+        first_id += users_count
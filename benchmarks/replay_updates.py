@@ -0,0 +1,93 @@
+"""
+Инструмент воспроизведения записанных обновлений телеграмма: отправляет обновления из JSONL-файла POST-запросами на
+ адрес webhook-сервера бота и выводит пропускную способность, задержки ответа и распределение HTTP-кодов.
+При повторах (--repeat) id пользователей и обновлений сдвигаются, чтобы каждый повтор был отдельным пользователем.
+
+Запуск: python -m benchmarks.replay_updates http://127.0.0.1:8443/telegram [--file ...] [--secret ...]
+         [--concurrency 16] [--repeat 1]
+"""
+import argparse
+import copy
+import json
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import requests
+
+from bot.webhook import SECRET_HEADER
+
+DEFAULT_FILE = Path(__file__).parent / 'fixtures' / 'updates.jsonl'
+USER_SHIFT = 1000000
+
+
+def load_updates(path: Path, repeat: int) -> List[List[Dict]]:
+    """
+    Функция загрузки обновлений, сгруппированных по чатам с сохранением порядка внутри чата
+
+    :param path: путь к JSONL-файлу с обновлениями (Path)
+    :param repeat: количество повторов записи (int)
+    :return: список последовательностей обновлений, по одной на чат (List)
+    """
+    with open(path, encoding='utf-8') as file:
+        recorded = [json.loads(line) for line in file if line.strip()]
+    chats = dict()
+    for number in range(repeat):
+        for update in recorded:
+            update = copy.deepcopy(update)
+            update['update_id'] += number * USER_SHIFT
+            if 'callback_query' in update:
+                update['callback_query']['from']['id'] += number * USER_SHIFT
+                message = update['callback_query']['message']
+            else:
+                message = update['message']
+                message['from']['id'] += number * USER_SHIFT
+            message['chat']['id'] += number * USER_SHIFT
+            chats.setdefault(message['chat']['id'], list()).append(update)
+    return list(chats.values())
+
+
+def replay_chat(session: requests.Session, url: str, secret: str, updates: List[Dict]) -> List[Tuple[int, float]]:
+    """
+    Функция последовательной отправки обновлений одного чата
+
+    :param session: сессия requests (requests.Session)
+    :param url: адрес webhook (str)
+    :param secret: секретный токен (str)
+    :param updates: обновления чата (List)
+    :return: список пар из HTTP-кода и времени ответа в секундах (List)
+    """
+    results = list()
+    for update in updates:
+        start = time.perf_counter()
+        response = session.post(url, data=json.dumps(update, ensure_ascii=False).encode('utf-8'),
+                                headers={SECRET_HEADER: secret, 'Content-Type': 'application/json'})
+        results.append((response.status_code, time.perf_counter() - start))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Воспроизведение обновлений телеграмма на webhook-сервере')
+    parser.add_argument('url')
+    parser.add_argument('--file', type=Path, default=DEFAULT_FILE)
+    parser.add_argument('--secret', default='')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--repeat', type=int, default=1)
+    arguments = parser.parse_args()
+
+    chats = load_updates(arguments.file, arguments.repeat)
+    http = requests.Session()
+    http.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=arguments.concurrency))
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=arguments.concurrency) as executor:
+        replies = [reply for chat in executor.map(lambda chat: replay_chat(http, arguments.url, arguments.secret,
+                                                                           chat), chats) for reply in chat]
+    total = time.perf_counter() - started
+    latencies = sorted(latency for _, latency in replies)
+    print(f'Обновлений: {len(replies)}, чатов: {len(chats)}, время: {total:.2f} с, '
+          f'{len(replies) / total:.0f} обновлений/с')
+    print(f'Задержка p50: {latencies[len(latencies) // 2] * 1000:.1f} мс, '
+          f'p95: {latencies[int(len(latencies) * 0.95)] * 1000:.1f} мс')
+    print('HTTP-коды:', dict(Counter(status for status, _ in replies)))
@@ -0,0 +1,293 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+from decouple import config
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from bot import json_codec, metrics
+from bot.fixtures import FixtureStore, RecordingTransport
+from bot.quota import QuotaExceeded, QuotaGovernor, governor as quota_governor
+from bot.resilience import API_HEDGE_AFTER, API_RETRIES, API_TIMEOUTS, ApiError, CircuitBreaker, backoff_delays, \
+    parse_timeouts
+
+API_HOST = 'hotels4.p.rapidapi.com'
+API_URL = config('API_URL', default=f'https://{API_HOST}')
+API_RECORD_DIR = config('API_RECORD_DIR', default='')
+
+CONNECT_TIMEOUT = config('API_CONNECT_TIMEOUT', default=3.05, cast=float)
+READ_TIMEOUT = config('API_READ_TIMEOUT', default=15.0, cast=float)
+POOL_CONNECTIONS = config('API_POOL_CONNECTIONS', default=4, cast=int)
+POOL_MAXSIZE = config('API_POOL_MAXSIZE', default=20, cast=int)
+HEDGE_WORKERS = config('API_HEDGE_WORKERS', default=16, cast=int)
+
+_hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix='api_hedge')
+
+
+class HotelsApiClient:
+    """
+    Класс - клиент API сайта hotels.com (hotels4.p.rapidapi.com), владеющий общим пулом соединений.
+    Все запросы выполняются через один экземпляр requests.Session, поэтому TCP и TLS соединения с хостом
+     переиспользуются (keep-alive), а не открываются заново на каждую страницу результатов.
+    Таймауты, ошибки соединения и ответы 408, 429, 5xx повторяются не более retries раз с экспоненциально растущей
+     паузой (backoff_delays). Запросы, неудачные после всех повторов, учитывает автомат защиты breaker: когда сайт
+      недоступен, запросы сразу завершаются ошибкой, не дожидаясь таймаутов. При hedge_after > 0 запрос, на который
+       сайт не ответил за hedge_after секунд, дублируется в общем пуле потоков: исходный запрос выполняется в
+        вызывающем потоке и не ждет свободного потока пула, а ответ дублирующего запроса используется, если исходный
+         завершился ошибкой (например, таймаутом чтения). Все ошибки передаются вызывающей функции в виде ApiError.
+    Перед каждым обращением к сайту, включая повторы и дублирование запроса, расходуется бюджет ограничителя квоты
+     governor; при исчерпанном бюджете обращение не выполняется, повторы прекращаются и вызывается исключение
+      QuotaExceeded (если исходный запрос еще выполняется, исключение при дублировании не передается).
+
+    Args:
+        api_key (str): ключ доступа на хост
+        transport (BaseAdapter): транспорт, через который выполняются запросы. По умолчанию - HTTPAdapter с пулом
+                                 соединений; для работы без сети можно передать MockTransport
+        pool_connections (int): количество пулов соединений (по одному на хост)
+        pool_maxsize (int): максимальное количество соединений в пуле одного хоста
+        timeout (Tuple[float, float]): таймауты установки соединения и чтения ответа в секундах
+        base_url (str): адрес API; для работы без сети можно указать адрес benchmarks.fake_hotels_server
+        retries (int): количество повторов запроса
+        timeouts (Dict): таймауты чтения ответа по путям запросов, по умолчанию - из API_TIMEOUTS; для остальных
+                         путей используется таймаут чтения из timeout
+        hedge_after (float): время в секундах, после которого запрос дублируется; 0 - без дублирования
+        breaker (CircuitBreaker): автомат защиты, по умолчанию - собственный автомат клиента
+        governor (QuotaGovernor): ограничитель квоты, по умолчанию - общий ограничитель bot.quota.governor
+    """
+
+    def __init__(self, api_key: str, transport: Optional[BaseAdapter] = None,
+                 pool_connections: int = POOL_CONNECTIONS, pool_maxsize: int = POOL_MAXSIZE,
+                 timeout: Tuple[float, float] = (CONNECT_TIMEOUT, READ_TIMEOUT), base_url: str = API_URL,
+                 retries: int = API_RETRIES, timeouts: Optional[Dict[str, float]] = None,
+                 hedge_after: float = API_HEDGE_AFTER, breaker: Optional[CircuitBreaker] = None,
+                 governor: Optional[QuotaGovernor] = None) -> None:
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.retries = retries
+        self.timeouts = parse_timeouts(API_TIMEOUTS) if timeouts is None else timeouts
+        self.hedge_after = hedge_after
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.governor = governor if governor is not None else quota_governor
+        self.requests_count = 0
+        self.__count_lock = threading.Lock()
+        self.session = requests.Session()
+        self.session.headers.update({
+            'x-rapidapi-key': api_key,
+            'x-rapidapi-host': API_HOST,
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive'
+        })
+        if transport is None:
+            transport = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount('https://', transport)
+        self.session.mount('http://', transport)
+
+    def get(self, path: str, params: Dict[str, str]) -> Dict:
+        """
+        Метод, выполняющий GET-запрос к API и конвертирующий полученный JSON-файл в словарь. Тело ответа
+         декодируется из байтов декодером json_codec.
+
+        :param path: путь запроса, например, '/properties/list' (str)
+        :param params: параметры запроса (Dict)
+        :return: словарь с данными, полученными с сайта (Dict)
+        :raise ApiError: сайт недоступен или вернул ответ, который не удалось декодировать
+        """
+        content = self.__request(path, params)
+        try:
+            return json_codec.loads(content)
+        except ValueError as error:
+            raise ApiError(f'{path}: invalid JSON ({error})') from error
+
+    def get_raw(self, path: str, params: Dict[str, str], validate: bool = False) -> bytes:
+        """
+        Метод, выполняющий GET-запрос к API и возвращающий тело ответа без преобразования. В случае ответа с кодом
+         ошибки вызывается исключение ApiError, чтобы ошибочные ответы не попадали в кэш. При validate=True ответ,
+          который не удалось декодировать (например, html-страница ошибки с кодом 200), считается ошибкой сайта и
+           повторяется, как ответ 5xx.
+
+        :param path: путь запроса, например, '/properties/list' (str)
+        :param params: параметры запроса (Dict)
+        :param validate: проверить, что тело ответа - JSON (bool)
+        :return: тело ответа (bytes)
+        :raise ApiError: сайт недоступен или вернул ответ с кодом ошибки или не в формате JSON
+        :raise QuotaExceeded: бюджет запросов исчерпан
+        """
+        return self.__request(path, params, validate)
+
+    def close(self) -> None:
+        """
+        Метод закрытия всех соединений пула
+        """
+        self.session.close()
+
+    def __request(self, path: str, params: Dict[str, str], validate: bool = False) -> bytes:
+        trial = self.breaker.before_request()
+        delays = backoff_delays(self.retries)
+        failed = False
+        while True:
+            try:
+                content = self.__hedged(path, params)
+                if validate:
+                    validate_json(path, content)
+            except QuotaExceeded:  # Повтор не выполняется: на него нет бюджета
+                if failed:  # Автомат защиты учитывает запрос, неудачный после всех возможных повторов
+                    self.breaker.record_failure()
+                elif trial:  # Пробный запрос не был отправлен на сайт
+                    self.breaker.cancel_trial()
+                raise
+            except ApiError as error:
+                if not error.retryable:  # Сайт доступен, но отклонил запрос (например, неверный ключ)
+                    self.breaker.record_success()
+                    raise
+                delay = next(delays, None)
+                if delay is None:  # Автомат защиты учитывает запрос, неудачный после всех повторов
+                    self.breaker.record_failure()
+                    raise
+                failed = True
+                metrics.inc('api_retries_total', path=path)
+                time.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return content
+
+    def __hedged(self, path: str, params: Dict[str, str]) -> bytes:
+        if self.hedge_after <= 0:
+            return self.__attempt(path, params)
+        context = contextvars.copy_context()  # Дублирующий запрос расходует бюджет того же пользователя
+        hedges: List[Future] = list()
+
+        def hedge() -> None:  # Ответа долго нет, дублируем запрос в пуле потоков
+            metrics.inc('api_hedged_total', path=path)
+            hedges.append(_hedge_executor.submit(context.run, self.__attempt, path, params))
+
+        timer = threading.Timer(self.hedge_after, hedge)
+        timer.daemon = True
+        timer.start()
+        try:
+            return self.__attempt(path, params)  # Исходный запрос не ждет свободного потока пула
+        except ApiError:
+            timer.cancel()
+            timer.join()
+            for future in hedges:
+                try:
+                    return future.result()
+                except ApiError:
+                    pass
+            raise
+        finally:
+            timer.cancel()
+            for future in hedges:  # Дублирующий запрос, еще не начатый в пуле, не нужен
+                future.cancel()
+
+    def __attempt(self, path: str, params: Dict[str, str]) -> bytes:
+        self.governor.acquire()  # Бюджет расходует каждое обращение к сайту
+        with self.__count_lock:  # Клиент общий для потоков обработчиков и загрузки страниц
+            self.requests_count += 1
+        status = 'error'
+        timeout = (self.timeout[0], self.timeouts.get(path, self.timeout[1]))
+        try:
+            with metrics.timer('api_request_seconds', path=path):
+                response = self.session.get(f'{self.base_url}{path}', params=params, timeout=timeout)
+            status = response.status_code
+        except requests.RequestException as error:
+            raise ApiError(f'{path}: {error}') from error
+        finally:
+            metrics.inc('api_requests_total', path=path, status=status)
+        if status >= 400:
+            raise ApiError(f'{path}: HTTP {status}', status)
+        return response.content
+
+
+def validate_json(path: str, content: bytes) -> None:
+    """
+    Функция проверки, что тело ответа сайта декодируется декодером json_codec
+
+    :param path: путь запроса (str)
+    :param content: тело ответа (bytes)
+    :raise ApiError: тело ответа не в формате JSON; ошибка повторяется, как ответ без кода
+    """
+    try:
+        json_codec.loads(content)
+    except ValueError as error:
+        raise ApiError(f'{path}: invalid JSON ({error})') from error
+
+
+class MockTransport(BaseAdapter):
+    """
+    Класс - локальный транспорт для requests.Session, имитирующий API сайта без обращения к сети.
+    Используется для измерения задержек и нагрузочного тестирования без расхода квоты RapidAPI.
+
+    Args:
+        handler (Callable): функция, принимающая путь запроса и словарь параметров и возвращающая кортеж из кода
+                            ответа и тела ответа в байтах
+        latency (float): искусственная задержка каждого ответа в секундах
+    """
+
+    def __init__(self, handler: Callable[[str, Dict[str, str]], Tuple[int, bytes]], latency: float = 0.0) -> None:
+        super().__init__()
+        self.handler = handler
+        self.latency = latency
+
+    def send(self, request: requests.PreparedRequest, stream: bool = False, timeout=None, verify=True, cert=None,
+             proxies=None) -> requests.Response:
+        if self.latency:
+            time.sleep(self.latency)
+        url = urlsplit(request.url)
+        status_code, body = self.handler(url.path, dict(parse_qsl(url.query)))
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = body
+        response.headers = CaseInsensitiveDict({'Content-Type': 'application/json; charset=utf-8'})
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+_clients = dict()
+_clients_lock = threading.Lock()
+
+
+def get_client(api_key: str) -> HotelsApiClient:
+    """
+    Функция получения общего клиента API для переданного ключа доступа. Клиент создается при первом обращении и
+     далее переиспользуется всеми функциями поиска. При заданном API_RECORD_DIR все ответы сайта записываются в этот
+      каталог для последующего воспроизведения.
+
+    :param api_key: ключ доступа на хост (str)
+    :return: клиент API (HotelsApiClient)
+    """
+    client = _clients.get(api_key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(api_key)
+            if client is None:
+                transport = None
+                if API_RECORD_DIR:
+                    transport = RecordingTransport(FixtureStore(API_RECORD_DIR),
+                                                   HTTPAdapter(pool_connections=POOL_CONNECTIONS,
+                                                               pool_maxsize=POOL_MAXSIZE))
+                client = _clients[api_key] = HotelsApiClient(api_key, transport=transport)
+    return client
+
+
+def set_client(client: HotelsApiClient) -> None:
+    """
+    Функция замены общего клиента API для ключа доступа клиента, например, клиентом с MockTransport
+
+    :param client: клиент API (HotelsApiClient)
+    """
+    with _clients_lock:
+        previous = _clients.get(client.api_key)
+        _clients[client.api_key] = client
+    if previous is not None and previous is not client:
+        previous.close()
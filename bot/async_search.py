@@ -0,0 +1,493 @@
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+
+import telebot
+from decouple import config
+
+from bot import json_codec, metrics
+from bot.api_client import API_HOST, API_URL, CONNECT_TIMEOUT, READ_TIMEOUT, get_client, validate_json
+from bot.bestdeal import RangeCollector, indexed_range, range_query, range_search_key, use_distance_sort
+from bot.hotel_index import DestinationIndex, get_index
+from bot.locations_search import city_cache, city_cache_key, parse_cities
+from bot.low_high_price import SortCollector, highest_first, indexed_sort, sort_query, sort_search_key
+from bot.page_cache import load_page, page_cache, page_key
+from bot.page_loader import PAGE_PREFETCH
+from bot.quota import QuotaExceeded, QuotaGovernor, governor as quota_governor
+from bot.search_flight import search_flight
+from bot.resilience import API_HEDGE_AFTER, API_RETRIES, API_TIMEOUTS, ApiError, CircuitBreaker, backoff_delays, \
+    parse_timeouts
+
+try:  # Асинхронный конвейер поиска доступен при установленном aiohttp, бот использует синхронные функции поиска
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+ASYNC_POOL_SIZE = config('ASYNC_POOL_SIZE', default=100, cast=int)
+ASYNC_KEEPALIVE_TIMEOUT = config('ASYNC_KEEPALIVE_TIMEOUT', default=30.0, cast=float)
+
+
+class AsyncHotelsApiClient:
+    """
+    Класс - асинхронный клиент API сайта hotels.com на основе aiohttp. Все запросы выполняются через одну
+     aiohttp.ClientSession с пулом соединений, поэтому один процесс может вести тысячи одновременных поисков без
+      отдельного потока на каждый.
+    Сессия создается при первом запросе внутри работающего цикла событий.
+    Повторы, таймауты по путям, автомат защиты, дублирование медленных запросов и ограничение квоты работают так же,
+     как в HotelsApiClient.
+
+    Args:
+        api_key (str): ключ доступа на хост
+        base_url (str): адрес API; для работы без сети можно указать адрес локального имитатора API
+        pool_size (int): максимальное количество соединений с хостом
+        retries (int): количество повторов запроса
+        timeouts (Dict): таймауты чтения ответа по путям запросов, по умолчанию - из API_TIMEOUTS
+        hedge_after (float): время в секундах, после которого запрос дублируется; 0 - без дублирования
+        breaker (CircuitBreaker): автомат защиты, по умолчанию - собственный автомат клиента
+        governor (QuotaGovernor): ограничитель квоты, по умолчанию - общий ограничитель bot.quota.governor
+    """
+
+    def __init__(self, api_key: str, base_url: str = API_URL, pool_size: int = ASYNC_POOL_SIZE,
+                 retries: int = API_RETRIES, timeouts: Optional[Dict[str, float]] = None,
+                 hedge_after: float = API_HEDGE_AFTER, breaker: Optional[CircuitBreaker] = None,
+                 governor: Optional[QuotaGovernor] = None) -> None:
+        _require_aiohttp()
+        self.api_key = api_key
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.retries = retries
+        self.timeouts = parse_timeouts(API_TIMEOUTS) if timeouts is None else timeouts
+        self.hedge_after = hedge_after
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.governor = governor if governor is not None else quota_governor
+        self.requests_count = 0
+        self.__session: Optional[aiohttp.ClientSession] = None
+
+    async def get(self, path: str, params: Dict[str, str]) -> Dict:
+        """
+        Асинхронный вариант метода HotelsApiClient.get: тело ответа декодируется декодером json_codec
+
+        :param path: путь запроса, например, '/locations/search' (str)
+        :param params: параметры запроса (Dict)
+        :return: словарь с данными, полученными с сайта (Dict)
+        :raise ApiError: сайт недоступен или вернул ответ, который не удалось декодировать
+        :raise QuotaExceeded: бюджет запросов исчерпан
+        """
+        content = await self.get_raw(path, params)
+        try:
+            return json_codec.loads(content)
+        except ValueError as error:
+            raise ApiError(f'{path}: invalid JSON ({error})') from error
+
+    async def get_raw(self, path: str, params: Dict[str, str], validate: bool = False) -> bytes:
+        """
+        Метод, выполняющий GET-запрос к API и возвращающий тело ответа. В случае ответа с кодом ошибки вызывается
+         исключение ApiError. Параметр validate - как в методе HotelsApiClient.get_raw.
+
+        :param path: путь запроса, например, '/properties/list' (str)
+        :param params: параметры запроса (Dict)
+        :param validate: проверить, что тело ответа - JSON (bool)
+        :return: тело ответа (bytes)
+        :raise ApiError: сайт недоступен или вернул ответ с кодом ошибки или не в формате JSON
+        :raise QuotaExceeded: бюджет запросов исчерпан
+        """
+        trial = self.breaker.before_request()
+        delays = backoff_delays(self.retries)
+        failed = False
+        while True:
+            try:
+                content = await self.__hedged(path, params)
+                if validate:
+                    validate_json(path, content)
+            except QuotaExceeded:  # Повтор не выполняется: на него нет бюджета
+                if failed:  # Автомат защиты учитывает запрос, неудачный после всех возможных повторов
+                    self.breaker.record_failure()
+                elif trial:  # Пробный запрос не был отправлен на сайт
+                    self.breaker.cancel_trial()
+                raise
+            except ApiError as error:
+                if not error.retryable:  # Сайт доступен, но отклонил запрос (например, неверный ключ)
+                    self.breaker.record_success()
+                    raise
+                delay = next(delays, None)
+                if delay is None:  # Автомат защиты учитывает запрос, неудачный после всех повторов
+                    self.breaker.record_failure()
+                    raise
+                failed = True
+                metrics.inc('api_retries_total', path=path)
+                await asyncio.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return content
+
+    async def close(self) -> None:
+        """
+        Метод закрытия сессии и всех соединений пула
+        """
+        if self.__session is not None:
+            await self.__session.close()
+            self.__session = None
+
+    async def __hedged(self, path: str, params: Dict[str, str]) -> bytes:
+        if self.hedge_after <= 0:
+            return await self.__attempt(path, params)
+        attempts = {asyncio.ensure_future(self.__attempt(path, params))}
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=self.hedge_after)
+            if not done:  # Ответа долго нет, дублируем запрос
+                metrics.inc('api_hedged_total', path=path)
+                attempts.add(asyncio.ensure_future(self.__attempt(path, params)))
+            error = None
+            pending = attempts
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    if attempt.exception() is None:
+                        return attempt.result()
+                    error = attempt.exception()
+            raise error
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+    async def __attempt(self, path: str, params: Dict[str, str]) -> bytes:
+        self.governor.acquire()  # Бюджет расходует каждое обращение к сайту
+        self.requests_count += 1
+        status = 'error'
+        timeout = aiohttp.ClientTimeout(sock_connect=CONNECT_TIMEOUT, sock_read=self.timeouts.get(path, READ_TIMEOUT))
+        try:
+            with metrics.timer('api_request_seconds', path=path):
+                async with self.__get_session().get(f'{self.base_url}{path}', params=params,
+                                                    timeout=timeout) as response:
+                    status = response.status
+                    content = await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+            raise ApiError(f'{path}: {error!r}') from error
+        finally:
+            metrics.inc('api_requests_total', path=path, status=status)
+        if status >= 400:
+            raise ApiError(f'{path}: HTTP {status}', status)
+        return content
+
+    def __get_session(self) -> 'aiohttp.ClientSession':
+        if self.__session is None or self.__session.closed:
+            self.__session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit_per_host=self.pool_size,
+                                               keepalive_timeout=ASYNC_KEEPALIVE_TIMEOUT),
+                timeout=aiohttp.ClientTimeout(sock_connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT),
+                headers={'x-rapidapi-key': self.api_key, 'x-rapidapi-host': API_HOST,
+                         'Accept-Encoding': 'gzip, deflate'})
+        return self.__session
+
+
+class AsyncBotSender:
+    """
+    Класс асинхронной отправки сообщений через Bot API телеграмма
+
+    Args:
+        token (str): токен бота
+    """
+
+    def __init__(self, token: str) -> None:
+        _require_aiohttp()
+        self.token = token
+        self.__session: Optional[aiohttp.ClientSession] = None
+
+    async def send_message(self, chat_id: int, text: str, parse_mode: Optional[str] = None,
+                           reply_markup: Any = None) -> Dict:
+        """
+        Метод отправки сообщения
+
+        :param chat_id: id чата (int)
+        :param text: текст сообщения (str)
+        :param parse_mode: режим форматирования текста, например, 'html' (str)
+        :param reply_markup: клавиатура telebot.types (Any)
+        :return: отправленное сообщение в формате Bot API (Dict)
+        """
+        payload = {'chat_id': chat_id, 'text': text}
+        if parse_mode:
+            payload['parse_mode'] = parse_mode
+        if reply_markup is not None:
+            payload['reply_markup'] = reply_markup.to_json()
+        if self.__session is None or self.__session.closed:
+            self.__session = aiohttp.ClientSession()
+        async with self.__session.post(telebot.apihelper.API_URL.format(self.token, 'sendMessage'),
+                                       json=payload) as response:
+            data = await response.json()
+        if not data.get('ok'):
+            raise telebot.apihelper.ApiException(data.get('description'), 'sendMessage', data)
+        return data['result']
+
+    async def close(self) -> None:
+        """
+        Метод закрытия сессии
+        """
+        if self.__session is not None:
+            await self.__session.close()
+            self.__session = None
+
+
+def _require_aiohttp() -> None:
+    if aiohttp is None:
+        raise ImportError('The async search pipeline requires aiohttp: pip install aiohttp')
+
+
+_clients: Dict[str, AsyncHotelsApiClient] = dict()
+_page_tasks: Dict[Tuple[str, ...], asyncio.Future] = dict()
+
+
+def get_async_client(api_key: str) -> AsyncHotelsApiClient:
+    """
+    Функция получения общего асинхронного клиента API для переданного ключа доступа
+
+    :param api_key: ключ доступа на хост (str)
+    :return: асинхронный клиент API (AsyncHotelsApiClient)
+    """
+    client = _clients.get(api_key)
+    if client is None:
+        client = _clients[api_key] = AsyncHotelsApiClient(api_key)
+    return client
+
+
+def set_async_client(client: AsyncHotelsApiClient) -> None:
+    """
+    Функция замены общего асинхронного клиента API для ключа доступа клиента
+
+    :param client: асинхронный клиент API (AsyncHotelsApiClient)
+    """
+    _clients[client.api_key] = client
+
+
+async def load_page_async(client: AsyncHotelsApiClient,
+                          params: Dict[str, str]) -> Tuple[Tuple[str, ...], bytes]:
+    """
+    Асинхронный вариант функции load_page: страница берется из общего кэша page_cache, одновременные загрузки одной
+     и той же страницы объединяются в одну. При отказе общей загрузки из-за бюджета другого пользователя страница
+      загружается за счет бюджета своего пользователя.
+
+    :param client: асинхронный клиент API (AsyncHotelsApiClient)
+    :param params: параметры запроса (Dict)
+    :return: ключ страницы и тело ответа (Tuple)
+    """
+    key = page_key(params)
+    raw = page_cache.get(key)
+    metrics.inc('cache_requests_total', cache='page', result='miss' if raw is None else 'hit')
+    if raw is None:
+        task = _page_tasks.get(key)
+        leader = task is None
+        if leader:
+            task = _page_tasks[key] = asyncio.ensure_future(_download_page(client, key, params))
+            task.add_done_callback(lambda _: _page_tasks.pop(key, None))
+        try:
+            raw = await asyncio.shield(task)  # Отмена одного поиска не отменяет общую загрузку
+        except QuotaExceeded:
+            if leader:
+                raise
+            raw = await _download_page(client, key, params)  # Бюджет запросов у каждого пользователя свой
+    return key, raw
+
+
+async def iterate_pages_async(fetch_page: Callable[[int], Awaitable[Any]], first_page: int = 1, last_page: int = 10,
+                              prefetch: Optional[int] = None) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Асинхронный вариант генератора iterate_pages: страницы выдаются по порядку, следующие prefetch страниц
+     загружаются одновременно с текущей. При закрытии генератора лишние загрузки отменяются.
+
+    :param fetch_page: сопрограмма загрузки страницы по её номеру (Callable)
+    :param first_page: номер первой страницы (int)
+    :param last_page: номер последней страницы включительно (int)
+    :param prefetch: количество страниц, загружаемых заранее, по умолчанию - значение PAGE_PREFETCH (int)
+    :return: асинхронный итератор кортежей из номера страницы и данных страницы (AsyncIterator)
+    """
+    if prefetch is None:
+        prefetch = PAGE_PREFETCH
+    pending: Deque[Tuple[int, asyncio.Future]] = deque()
+    next_page = first_page
+    try:
+        while pending or next_page <= last_page:
+            while next_page <= last_page and len(pending) <= max(prefetch, 0):
+                pending.append((next_page, asyncio.ensure_future(fetch_page(next_page))))
+                next_page += 1
+            page_number, task = pending.popleft()
+            yield page_number, await task
+    finally:
+        for _, task in pending:
+            task.cancel()
+
+
+@metrics.timed('search_seconds', search='sort_async')
+@search_flight.coalesce(sort_search_key, tail=highest_first)
+async def hotel_search_sort_async(quantity: int, city_id: int, api_key: str, search_kind: str) -> Dict[str, List]:
+    """
+    Асинхронный вариант функции hotel_search_sort с теми же параметрами и результатом
+
+    :param quantity: количество отелей (int)
+    :param city_id: идентификационный номер города (int)
+    :param api_key: ключ доступа на хост (str)
+    :param search_kind: вид сортировки (str)
+    :return: словарь с данными отелей (Dict)
+    """
+    hotels = dict()
+    async for hotels in _sort_results_async(quantity, city_id, api_key, search_kind):
+        pass
+    return hotels
+
+
+@metrics.timed('search_seconds', search='sort_async')
+@search_flight.coalesce(sort_search_key, tail=highest_first)
+async def iter_hotel_search_sort_async(quantity: int, city_id: int, api_key: str,
+                                       search_kind: str) -> AsyncIterator[Dict[str, List]]:
+    """
+    Асинхронный вариант генератора iter_hotel_search_sort
+
+    :param quantity: количество отелей (int)
+    :param city_id: идентификационный номер города (int)
+    :param api_key: ключ доступа на хост (str)
+    :param search_kind: вид сортировки (str)
+    :return: асинхронный итератор словарей с данными отелей (AsyncIterator)
+    """
+    async for hotels in _sort_results_async(quantity, city_id, api_key, search_kind):
+        yield hotels
+
+
+async def _sort_results_async(quantity: int, city_id: int, api_key: str,
+                              search_kind: str) -> AsyncIterator[Dict[str, List]]:
+    hotels = indexed_sort(destination_index(city_id, api_key), quantity, search_kind)
+    if hotels is not None:
+        yield hotels
+        return
+    client = get_async_client(api_key)
+    collector = SortCollector(quantity)
+    pages = iterate_pages_async(lambda page_number: load_page_async(client,
+                                                                    sort_query(city_id, search_kind, page_number)))
+    try:
+        async for request_number, (key, raw) in pages:
+            found = len(collector.final_hotels)
+            if collector.add_page(key, raw):
+                break
+            if len(collector.final_hotels) > found:
+                yield collector.result()
+    except QuotaExceeded:
+        if not collector.final_hotels:
+            raise
+        metrics.inc('quota_degraded_total', kind=search_kind)
+    finally:
+        await pages.aclose()
+    metrics.inc('search_pages_total', request_number, kind=search_kind)
+    yield collector.result()
+
+
+@metrics.timed('search_seconds', search='range_async')
+@search_flight.coalesce(range_search_key)
+async def hotel_search_range_async(quantity: int, city_id: int, minimum_price: int, maximum_price: int,
+                                   minimum_distance: float, maximum_distance: float,
+                                   api_key: str) -> Dict[str, List]:
+    """
+    Асинхронный вариант функции hotel_search_range с теми же параметрами и результатом
+
+    :param quantity: количество отелей (int)
+    :param city_id: идентификационный номер города (int)
+    :param minimum_price: минимальная стоимость снятия номера на ночь в рублях (int)
+    :param maximum_price: максимальная стоимость снятия номера на ночь в рублях (int)
+    :param minimum_distance: минимальная дистанция от центра до отеля в километрах (float)
+    :param maximum_distance: максимальная дистанция от центра до отеля в километрах (float)
+    :param api_key: ключ доступа на хост (str)
+    :return: словарь с данными отелей (Dict)
+    """
+    hotels = dict()
+    async for hotels in _range_results_async(quantity, city_id, minimum_price, maximum_price, minimum_distance,
+                                             maximum_distance, api_key):
+        pass
+    return hotels
+
+
+@metrics.timed('search_seconds', search='range_async')
+@search_flight.coalesce(range_search_key)
+async def iter_hotel_search_range_async(quantity: int, city_id: int, minimum_price: int, maximum_price: int,
+                                        minimum_distance: float, maximum_distance: float,
+                                        api_key: str) -> AsyncIterator[Dict[str, List]]:
+    """
+    Асинхронный вариант генератора iter_hotel_search_range
+
+    :param quantity: количество отелей (int)
+    :param city_id: идентификационный номер города (int)
+    :param minimum_price: минимальная стоимость снятия номера на ночь в рублях (int)
+    :param maximum_price: максимальная стоимость снятия номера на ночь в рублях (int)
+    :param minimum_distance: минимальная дистанция от центра до отеля в километрах (float)
+    :param maximum_distance: максимальная дистанция от центра до отеля в километрах (float)
+    :param api_key: ключ доступа на хост (str)
+    :return: асинхронный итератор словарей с данными отелей (AsyncIterator)
+    """
+    async for hotels in _range_results_async(quantity, city_id, minimum_price, maximum_price, minimum_distance,
+                                             maximum_distance, api_key):
+        yield hotels
+
+
+async def _range_results_async(quantity: int, city_id: int, minimum_price: int, maximum_price: int,
+                               minimum_distance: float, maximum_distance: float,
+                               api_key: str) -> AsyncIterator[Dict[str, List]]:
+    hotels = indexed_range(destination_index(city_id, api_key), quantity, minimum_price, maximum_price,
+                           minimum_distance, maximum_distance)
+    if hotels is not None:
+        yield hotels
+        return
+    client = get_async_client(api_key)
+    distance_sort = use_distance_sort(city_id, minimum_distance, maximum_distance)
+    collector = RangeCollector(quantity, minimum_price, maximum_price, minimum_distance, maximum_distance,
+                               city_id=city_id, distance_sort=distance_sort)
+    pages = iterate_pages_async(lambda page_number: load_page_async(
+        client, range_query(city_id, minimum_price, maximum_price, page_number, distance_sort=distance_sort)))
+    try:
+        async for request_number, (key, raw) in pages:
+            found = len(collector.final_hotels)
+            if collector.add_page(key, raw):
+                break
+            if len(collector.final_hotels) > found:
+                yield collector.result()
+    except QuotaExceeded:
+        if not collector.final_hotels:
+            raise
+        metrics.inc('quota_degraded_total', kind='bestdeal')
+    finally:
+        await pages.aclose()
+    metrics.inc('search_pages_total', request_number, kind='bestdeal')
+    yield collector.result()
+
+
+def destination_index(city_id: int, api_key: str) -> Optional[DestinationIndex]:
+    """
+    Функция получения локального индекса направления. Индекс строится в фоновом потоке, поэтому страницы для него
+     загружаются синхронным клиентом API.
+
+    :param city_id: идентификационный номер города (int)
+    :param api_key: ключ доступа на хост (str)
+    :return: индекс или None (DestinationIndex)
+    """
+    return get_index(city_id, lambda page_number: load_page(get_client(api_key),
+                                                            sort_query(city_id, 'PRICE', page_number)))
+
+
+async def city_search_async(city: str, api_key: str, local: str) -> Dict[str, str]:
+    """
+    Асинхронный вариант функции city_search с теми же параметрами и результатом
+
+    :param city: наименование города (str)
+    :param api_key: ключ доступа на хост (str)
+    :param local: код языка (str)
+    :return: словарь с идентификационными номерами городов и их названиями городов (Dict)
+    """
+    cache_key = city_cache_key(city, local)
+    cached_cities = city_cache.get(cache_key)
+    metrics.inc('cache_requests_total', cache='city', result='miss' if cached_cities is None else 'hit')
+    if cached_cities is not None:
+        return dict(cached_cities)
+    cities = parse_cities(await get_async_client(api_key).get('/locations/search', {'query': city, 'locale': local}))
+    if cities:
+        city_cache.set(cache_key, cities)
+    return dict(cities)
+
+
+async def _download_page(client: AsyncHotelsApiClient, key: Tuple[str, ...], params: Dict[str, str]) -> bytes:
+    raw = await client.get_raw('/properties/list', params, validate=True)
+    page_cache.set(key, raw)
+    return raw
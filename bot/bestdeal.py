@@ -1,27 +1,73 @@
-import json
+import threading
 from datetime import date, timedelta
-from typing import Dict, List
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-import requests
+from decouple import config
 
+from bot import metrics
+from bot.api_client import get_client
+from bot.cache import SQLiteCache, TTLCache
 from bot.function import hotel_search_distance
+from bot.hotel_index import DestinationIndex, get_index, index_key
+from bot.hotel_parser import page_distances, page_results
+from bot.low_high_price import sort_query
+from bot.page_cache import PAGE_CACHE_SIZE, PAGE_CACHE_TTL, load_page, parse_page
+from bot.page_loader import iterate_pages
+from bot.quota import QuotaExceeded
+from bot.search_flight import search_flight
 
+BESTDEAL_MIN_PAGES = config('BESTDEAL_MIN_PAGES', default=2, cast=int)
+BESTDEAL_MIN_EXPECTED = config('BESTDEAL_MIN_EXPECTED', default=0.5, cast=float)
+BESTDEAL_PRIOR_WEIGHT = config('BESTDEAL_PRIOR_WEIGHT', default=25.0, cast=float)
+BESTDEAL_DISTANCE_SORT = config('BESTDEAL_DISTANCE_SORT', default=False, cast=bool)
+BESTDEAL_SORT_SHARE = config('BESTDEAL_SORT_SHARE', default=0.2, cast=float)
+BESTDEAL_STATS_DB = config('BESTDEAL_STATS_DB', default='')
+LAST_PAGE = 10
+STATS_BUCKET = 0.5  # Ширина интервала гистограммы дистанций в километрах
+STATS_BUCKETS = 40  # Интервалы от 0 до 20 км, последний интервал включает все большие дистанции
+STATS_LIMIT = 10000  # При превышении количества отелей в гистограмме счетчики уменьшаются вдвое
 
+# Статистика городов: ключ - id города, значение - гистограмма дистанций от центра всех просмотренных отелей
+city_stats = TTLCache(maxsize=4096, ttl=30 * 24 * 60 * 60,
+                      storage=SQLiteCache(BESTDEAL_STATS_DB, table='bestdeal_stats') if BESTDEAL_STATS_DB else None)
+# Ключи страниц, дистанции которых уже учтены в статистике: страница из кэша или общей загрузки учитывается один раз
+_recorded_pages = TTLCache(maxsize=PAGE_CACHE_SIZE, ttl=PAGE_CACHE_TTL)
+_stats_lock = threading.Lock()
+
+
+def range_search_key(arguments: Dict[str, Any]) -> Tuple:
+    """
+    Функция построения ключа объединения одинаковых поисков hotel_search_range (search_flight)
+
+    :param arguments: аргументы функции поиска (Dict)
+    :return: ключ поиска: id города, дата заезда, диапазоны цен и дистанций (Tuple)
+    """
+    return ('bestdeal',) + index_key(arguments['city_id']) + (
+        arguments['minimum_price'], arguments['maximum_price'],
+        arguments['minimum_distance'], arguments['maximum_distance'])
+
+
+@metrics.timed('search_seconds', search='range')
+@search_flight.coalesce(range_search_key)
 def hotel_search_range(quantity: int, city_id: int, minimum_price: int, maximum_price: int,
                        minimum_distance: float, maximum_distance: float, api_key: str) -> Dict[str, List[float]]:
     """
-    Функция, выполняющая запрос по адресу, указанному в переменной url и копирующая необходимую информацию об отелях
-     из полученных данных в отдельный словарь.
+    Функция, выполняющая запрос к API сайта через общий клиент (get_client) и копирующая необходимую информацию об
+     отелях из полученных данных в отдельный словарь.
     В запросе на сайт передается идентификатор города, где расположены отели, диапазон цен и расстояний от центра
      города до предполагаемых отелей, а также количество отелей. Сайт может передать информацию о 25 отелях максимум.
     После выполнения запроса, сайт передает JSON-файл c данными об отелях в интересующемся городе. Полученный JSON-файл
-     конвертируется в словарь и передается в функцию hotel_search_distance для извлечения из данного словаря
-      интересующейся информации, а именно, наименований отелей, стоимости снятия номера на ночь в соответствующем
-       отеле и расстояния от центра до конкретного отеля.
+     передается в функцию hotel_search_distance для извлечения из него интересующейся информации, а именно,
+      наименований отелей, стоимости снятия номера на ночь в соответствующем отеле и расстояния от центра до
+       конкретного отеля.
     Необходимо отметить, что данные, полученные с сайта уже приходят отсортированные по стоимости от минимального к
      максимальному. Для этого, до выполнения запроса на сайт, в переменной querystring ключу 'sortOrder' необходимо
       присвоить значение 'PRICE'.
     Функция hotel_search_distance возвращает словарь, после чего передается далее.
+    Если бюджет запросов на сайт (bot.quota) исчерпан после загрузки части страниц, возвращаются уже найденные
+     отели; если не найдено ни одного, исключение QuotaExceeded передается обработчику.
+    Одновременные поиски с теми же городом и диапазонами выполняются один раз, поиски меньшего количества отелей
+     получают самые дешевые отели результата (bot.search_flight).
 
     :param quantity: количество отелей (int)
     :param city_id: идентификационный номер города (int)
@@ -34,49 +80,283 @@ def hotel_search_range(quantity: int, city_id: int, minimum_price: int, maximum_
      элемент с индексом "0" - стоимость снятия номера на ночь, элемент с индексом "1" - дистанция от центра до данного
       отеля (Dict).
     """
-    final_hotels = dict()
+    hotels = dict()
+    for hotels in _range_results(quantity, city_id, minimum_price, maximum_price, minimum_distance,
+                                 maximum_distance, api_key):  # Нужен только итоговый результат
+        pass
+    return hotels
+
+
+@metrics.timed('search_seconds', search='range')
+@search_flight.coalesce(range_search_key)
+def iter_hotel_search_range(quantity: int, city_id: int, minimum_price: int, maximum_price: int,
+                            minimum_distance: float, maximum_distance: float,
+                            api_key: str) -> Iterator[Dict[str, List]]:
+    """
+    Генератор результатов функции hotel_search_range по мере загрузки страниц: после каждой страницы, добавившей
+     отели, выдается словарь уже найденных отелей, отсортированный по цене, последним выдается итоговый результат.
+    Одновременные одинаковые поиски объединяются так же, как в hotel_search_range: присоединившийся поиск получает
+     только итоговый результат.
+
+    :param quantity: количество отелей (int)
+    :param city_id: идентификационный номер города (int)
+    :param minimum_price: минимальная стоимость снятия номера на ночь в рублях (int)
+    :param maximum_price: максимальная стоимость снятия номера на ночь в рублях (int)
+    :param minimum_distance: минимальная дистанция от центра до отеля в километрах (float)
+    :param maximum_distance: максимальная дистанция от центра до отеля в километрах (float)
+    :param api_key: ключ доступа на хост (str)
+    :return: итератор словарей с данными отелей (Iterator)
+    """
+    yield from _range_results(quantity, city_id, minimum_price, maximum_price, minimum_distance, maximum_distance,
+                              api_key)
+
+
+def _range_results(quantity: int, city_id: int, minimum_price: int, maximum_price: int, minimum_distance: float,
+                   maximum_distance: float, api_key: str) -> Iterator[Dict[str, List]]:
+    client = get_client(api_key)
+    index = get_index(city_id, lambda page_number: load_page(client, sort_query(city_id, 'PRICE', page_number)))
+    hotels = indexed_range(index, quantity, minimum_price, maximum_price, minimum_distance, maximum_distance)
+    if hotels is not None:
+        yield hotels
+        return
+    distance_sort = use_distance_sort(city_id, minimum_distance, maximum_distance)
+    collector = RangeCollector(quantity, minimum_price, maximum_price, minimum_distance, maximum_distance,
+                               city_id=city_id, distance_sort=distance_sort)
+
+    def fetch_page(page_number: int) -> Tuple[Tuple[str, ...], bytes]:
+        return load_page(client, range_query(city_id, minimum_price, maximum_price, page_number,
+                                             distance_sort=distance_sort))
+
+    try:
+        for request_number, (key, raw) in iterate_pages(fetch_page):  # Делаем не более 10 запросов
+            found = len(collector.final_hotels)
+            if collector.add_page(key, raw):
+                break
+            if len(collector.final_hotels) > found:
+                yield collector.result()
+    except QuotaExceeded:
+        if not collector.final_hotels:  # Показать нечего, обработчик сообщит об исчерпанном бюджете
+            raise
+        metrics.inc('quota_degraded_total', kind='bestdeal')  # Результат по уже загруженным страницам
+    metrics.inc('search_pages_total', request_number, kind='bestdeal')
+
+    yield collector.result()
+
+
+def indexed_range(index: Optional[DestinationIndex], quantity: int, minimum_price: int, maximum_price: int,
+                  minimum_distance: float, maximum_distance: float) -> Optional[Dict[str, List]]:
+    """
+    Функция получения результата hotel_search_range из локального индекса направления
+
+    :param index: индекс направления или None (DestinationIndex)
+    :param quantity: количество отелей (int)
+    :param minimum_price: минимальная стоимость снятия номера на ночь в рублях (int)
+    :param maximum_price: максимальная стоимость снятия номера на ночь в рублях (int)
+    :param minimum_distance: минимальная дистанция от центра до отеля в километрах (float)
+    :param maximum_distance: максимальная дистанция от центра до отеля в километрах (float)
+    :return: словарь с данными отелей или None, если нужен запрос на сайт (Dict)
+    """
+    hotels = None
+    if index is not None:
+        hotels = index.in_range(quantity, minimum_price, maximum_price, minimum_distance, maximum_distance)
+    metrics.inc('cache_requests_total', cache='hotel_index', result='miss' if hotels is None else 'hit')
+    return hotels
+
+
+def range_query(city_id: int, minimum_price: int, maximum_price: int, page_number: int,
+                distance_sort: bool = False) -> Dict[str, str]:
+    """
+    Функция формирования параметров запроса страницы отелей в диапазоне цен, отсортированных по цене или, при
+     distance_sort=True, по дистанции от центра города
+
+    :param city_id: идентификационный номер города (int)
+    :param minimum_price: минимальная стоимость снятия номера на ночь в рублях (int)
+    :param maximum_price: максимальная стоимость снятия номера на ночь в рублях (int)
+    :param page_number: номер страницы (int)
+    :param distance_sort: сортировка по дистанции от центра (bool)
+    :return: параметры запроса (Dict)
+    """
     date_today = str(date.today())
     date_tomorrow = str(date.today() + timedelta(days=1))
-    previous_quantity, retry_flag = 0, 0
-
-    url = 'https://hotels4.p.rapidapi.com/properties/list'
-    current_quantity = quantity
-
-    for request_number in range(1, 11):  # Делаем не более 10 запросов
-        print('Запрос на сайт:', request_number)
-        querystring = {'adults1': '1', 'pageNumber': str(request_number), 'destinationId': str(city_id),
-                       'pageSize': '25', 'checkOut': date_tomorrow, 'checkIn': date_today,
-                       'priceMax': str(maximum_price), 'sortOrder': 'PRICE', 'locale': 'ru_RU',
-                       'currency': 'RUB', 'priceMin': str(minimum_price), 'landmarkIds': 'City center'}
-        headers = {
-            'x-rapidapi-key': api_key,
-            'x-rapidapi-host': 'hotels4.p.rapidapi.com'
-        }
-        response = requests.request("GET", url, headers=headers, params=querystring)
-        data_site = json.loads(response.text)
-        current_hotels = hotel_search_distance(data=data_site,
-                                               quantity=current_quantity,
-                                               distance_minimum=minimum_distance,
-                                               distance_maximum=maximum_distance,
-                                               price_min=minimum_price,
-                                               price_max=maximum_price)
-        final_hotels.update(current_hotels[0])
-        current_length = len(final_hotels)
-        current_quantity = quantity - current_length
+    return {'adults1': '1', 'pageNumber': str(page_number), 'destinationId': str(city_id),
+            'pageSize': '25', 'checkOut': date_tomorrow, 'checkIn': date_today,
+            'priceMax': str(maximum_price), 'sortOrder': 'DISTANCE_FROM_LANDMARK' if distance_sort else 'PRICE',
+            'locale': 'ru_RU', 'currency': 'RUB', 'priceMin': str(minimum_price), 'landmarkIds': 'City center'}
+
+
+def record_distances(city_id: int, key: Tuple[str, ...], distances: Tuple[float, ...]) -> None:
+    """
+    Функция добавления дистанций отелей страницы в гистограмму города. Каждая страница учитывается один раз за время
+     хранения в кэше страниц, поэтому повторные поиски популярных городов не искажают статистику. Чтобы статистика
+      следовала за изменениями на сайте, при превышении STATS_LIMIT отелей все счетчики уменьшаются вдвое.
+
+    :param city_id: идентификационный номер города (int)
+    :param key: ключ страницы (Tuple)
+    :param distances: дистанции от центра в километрах (Tuple)
+    """
+    with _stats_lock:
+        if _recorded_pages.get(key) is not None:
+            return
+        _recorded_pages.set(key, True)
+        histogram = list(city_stats.get(str(city_id)) or [0] * STATS_BUCKETS)
+        for distance in distances:
+            histogram[min(int(distance / STATS_BUCKET), STATS_BUCKETS - 1)] += 1
+        if sum(histogram) > STATS_LIMIT:
+            histogram = [count // 2 for count in histogram]
+        city_stats.set(str(city_id), histogram)
+
+
+def band_share(city_id: int, minimum_distance: float, maximum_distance: float) -> Optional[float]:
+    """
+    Функция оценки доли отелей города, расположенных в диапазоне дистанций, по гистограмме города. Дистанции на сайте
+     указываются с точностью 0,1 км, поэтому границы диапазона расширяются на 0,05 км.
+
+    :param city_id: идентификационный номер города (int)
+    :param minimum_distance: минимальная дистанция от центра до отеля в километрах (float)
+    :param maximum_distance: максимальная дистанция от центра до отеля в километрах (float)
+    :return: доля отелей от 0 до 1 или None, если статистики города нет (float)
+    """
+    histogram = city_stats.get(str(city_id))
+    if not histogram or not sum(histogram):
+        return None
+    low, high = minimum_distance - 0.05, maximum_distance + 0.05
+    share = 0.0
+    for number, count in enumerate(histogram):
+        left = number * STATS_BUCKET
+        right = left + STATS_BUCKET if number < STATS_BUCKETS - 1 else max(high, left + STATS_BUCKET)
+        share += count * max(0.0, min(high, right) - max(low, left)) / (right - left)
+    return share / sum(histogram)
+
+
+def use_distance_sort(city_id: int, minimum_distance: float, maximum_distance: float) -> bool:
+    """
+    Функция выбора сортировки страниц для поиска /bestdeal. Сортировка сайтом по дистанции от центра выбирается при
+     включенном BESTDEAL_DISTANCE_SORT для узких диапазонов дистанций: по статистике города в диапазон попадает не
+      более BESTDEAL_SORT_SHARE отелей. Для широких диапазонов и городов без статистики выгоднее сортировка по цене,
+       при которой запросы прекращаются, как только набрано нужное количество отелей.
+
+    :param city_id: идентификационный номер города (int)
+    :param minimum_distance: минимальная дистанция от центра до отеля в километрах (float)
+    :param maximum_distance: максимальная дистанция от центра до отеля в километрах (float)
+    :return: True - сортировка по дистанции (bool)
+    """
+    if not BESTDEAL_DISTANCE_SORT:
+        return False
+    share = band_share(city_id, minimum_distance, maximum_distance)
+    return share is not None and 0 < share <= BESTDEAL_SORT_SHARE
+
+
+class RangeCollector:
+    """
+    Класс, накапливающий отели из последовательно получаемых страниц для функций hotel_search_range и
+     hotel_search_range_async и определяющий момент прекращения запросов на сайт.
+    Кроме прежних условий (набрано нужное количество отелей, стоимость выше максимальной, две страницы без новых
+     отелей) запросы прекращаются, когда сайт вернул страницу без отелей или когда на оставшихся страницах
+      ожидается меньше BESTDEAL_MIN_EXPECTED подходящих отелей. Доля отелей в диапазоне дистанций оценивается по уже
+       полученным страницам с учетом статистики города (band_share), которая пополняется каждой страницей.
+    При distance_sort=True страницы отсортированы сайтом по дистанции: собираются все отели диапазона, запросы
+     прекращаются после первого отеля дальше максимальной дистанции, результат - самые дешевые из найденных.
+
+    Args:
+        quantity (int): количество отелей
+        minimum_price (int): минимальная стоимость снятия номера на ночь в рублях
+        maximum_price (int): максимальная стоимость снятия номера на ночь в рублях
+        minimum_distance (float): минимальная дистанция от центра до отеля в километрах
+        maximum_distance (float): максимальная дистанция от центра до отеля в километрах
+        city_id (int): идентификационный номер города для статистики, None - без статистики
+        distance_sort (bool): страницы отсортированы по дистанции от центра
+    """
+
+    def __init__(self, quantity: int, minimum_price: int, maximum_price: int, minimum_distance: float,
+                 maximum_distance: float, city_id: Optional[int] = None, distance_sort: bool = False) -> None:
+        self.quantity = quantity
+        self.current_quantity = quantity
+        self.minimum_price, self.maximum_price = minimum_price, maximum_price
+        self.minimum_distance, self.maximum_distance = minimum_distance, maximum_distance
+        self.city_id, self.distance_sort = city_id, distance_sort
+        self.previous_quantity, self.retry_flag = 0, 0
+        self.pages, self.seen, self.matched, self.page_size = 0, 0, 0, 0
+        self.prior = band_share(city_id, minimum_distance, maximum_distance) if city_id is not None else None
+        self.final_hotels = dict()
+
+    def add_page(self, key: Tuple[str, ...], raw: bytes) -> bool:
+        """
+        Метод добавления отелей очередной страницы
+
+        :param key: ключ страницы (Tuple)
+        :param raw: тело ответа (bytes)
+        :return: True, если запросы следующих страниц не нужны (bool)
+        """
+        results = parse_page(key, raw, page_results)
+        if not results:  # Отели в диапазоне цен закончились
+            return True
+        # Отели без стоимости или дистанции (например, без свободных номеров) не подходят, но страница из таких
+        # отелей - не последняя: она учитывается как страница без подходящих отелей
+        distances = parse_page(key, raw, page_distances)
+        self.pages += 1
+        self.seen += results
+        self.matched += sum(1 for distance in distances if self.minimum_distance <= distance <= self.maximum_distance)
+        self.page_size = max(self.page_size, results)
+        if self.distance_sort:
+            return self.__add_sorted_by_distance(key, raw, distances)
+        if self.city_id is not None:
+            record_distances(self.city_id, key, distances)
+
+        current_hotels = parse_page(key, raw, hotel_search_distance,
+                                    quantity=self.current_quantity,
+                                    distance_minimum=self.minimum_distance,
+                                    distance_maximum=self.maximum_distance,
+                                    price_min=self.minimum_price,
+                                    price_max=self.maximum_price)
+        self.final_hotels.update(current_hotels[0])
+        current_length = len(self.final_hotels)
+        self.current_quantity = self.quantity - current_length
 
         # Если количество отелей равно или выше запрошенного, цена выше запрошенного или флаг повтора равен двум,
         # выходим из цикла
-        if len(final_hotels) >= quantity or current_hotels[1] > maximum_price or retry_flag == 2:
-            break
+        if len(self.final_hotels) >= self.quantity or current_hotels[1] > self.maximum_price or self.retry_flag == 2:
+            return True
+        # Если на оставшихся страницах подходящих отелей почти не ожидается, выходим из цикла
+        if self.pages >= BESTDEAL_MIN_PAGES and self.expected_matches() < BESTDEAL_MIN_EXPECTED:
+            return True
         # Считаем количество повторов
-        if previous_quantity == current_length and current_length > 0:
-            retry_flag += 1
+        if self.previous_quantity == current_length and current_length > 0:
+            self.retry_flag += 1
         else:
-            retry_flag = 0
+            self.retry_flag = 0
+
+        self.previous_quantity = len(self.final_hotels)
+        return False
+
+    def expected_matches(self) -> float:
+        """
+        Метод оценки количества отелей в диапазоне дистанций на оставшихся страницах. Доля подходящих отелей
+         оценивается по просмотренным отелям, статистика города учитывается с весом BESTDEAL_PRIOR_WEIGHT отелей,
+          без статистики - как один отель с долей 0,5.
+
+        :return: ожидаемое количество отелей (float)
+        """
+        prior, weight = (self.prior, BESTDEAL_PRIOR_WEIGHT) if self.prior is not None else (0.5, 1.0)
+        share = (self.matched + prior * weight) / (self.seen + weight)
+        return share * self.page_size * (LAST_PAGE - self.pages)
 
-        previous_quantity = len(final_hotels)
+    def result(self) -> Dict[str, List]:
+        """
+        Метод получения итогового словаря отелей, отсортированного по цене
 
-    if len(final_hotels) > 1:  # Сортировка по цене
-        final_hotels = {i_key: i_value for i_key, i_value in sorted(final_hotels.items(), key=lambda elem: elem[1][1])}
+        :return: словарь с данными отелей (Dict)
+        """
+        if len(self.final_hotels) > 1:  # Сортировка по цене
+            return {i_key: i_value for i_key, i_value in sorted(self.final_hotels.items(),
+                                                                key=lambda elem: elem[1][1])[:self.quantity]}
+        return self.final_hotels
 
-    return final_hotels
+    def __add_sorted_by_distance(self, key: Tuple[str, ...], raw: bytes, distances: Tuple[float, ...]) -> bool:
+        current_hotels = parse_page(key, raw, hotel_search_distance,
+                                    quantity=len(distances),
+                                    distance_minimum=self.minimum_distance,
+                                    distance_maximum=self.maximum_distance,
+                                    price_min=self.minimum_price,
+                                    price_max=self.maximum_price)
+        self.final_hotels.update(current_hotels[0])
+        return bool(distances) and distances[-1] > self.maximum_distance
@@ -0,0 +1,221 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class SQLiteCache:
+    """
+    Класс - дисковое хранилище кэша в базе данных SQLite. Используется как второй уровень TTLCache, чтобы записи
+     переживали перезапуск бота. Значения хранятся в виде JSON.
+
+    Args:
+        path (str): путь к файлу базы данных
+        table (str): имя таблицы, что позволяет нескольким кэшам использовать один файл
+    """
+
+    def __init__(self, path: str, table: str = 'cache') -> None:
+        self.table = table
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(path, check_same_thread=False)
+        with self.__lock, self.__connection:
+            self.__connection.execute(f'CREATE TABLE IF NOT EXISTS {table} '
+                                      f'(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)')
+
+    def get(self, key: Hashable) -> Any:
+        """
+        Метод получения значения по ключу. Просроченные записи удаляются.
+
+        :param key: ключ (Hashable)
+        :return: значение или None, если записи нет или она просрочена
+        """
+        with self.__lock:
+            row = self.__connection.execute(f'SELECT value, expires FROM {self.table} WHERE key = ?',
+                                            (json.dumps(key),)).fetchone()
+        if row is None:
+            return None
+        if row[1] < time.time():
+            self.delete(key)
+            return None
+        return json.loads(row[0])
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        """
+        Метод сохранения значения
+
+        :param key: ключ (Hashable)
+        :param value: значение, сериализуемое в JSON (Any)
+        :param ttl: время жизни записи в секундах (float)
+        """
+        with self.__lock, self.__connection:
+            self.__connection.execute(f'INSERT OR REPLACE INTO {self.table} (key, value, expires) VALUES (?, ?, ?)',
+                                      (json.dumps(key), json.dumps(value, ensure_ascii=False), time.time() + ttl))
+
+    def delete(self, key: Hashable) -> None:
+        """
+        Метод удаления записи
+
+        :param key: ключ (Hashable)
+        """
+        with self.__lock, self.__connection:
+            self.__connection.execute(f'DELETE FROM {self.table} WHERE key = ?', (json.dumps(key),))
+
+    def purge(self) -> None:
+        """
+        Метод удаления всех просроченных записей
+        """
+        with self.__lock, self.__connection:
+            self.__connection.execute(f'DELETE FROM {self.table} WHERE expires < ?', (time.time(),))
+
+
+class TTLCache:
+    """
+    Класс - потокобезопасный кэш в памяти с ограничением количества записей (вытеснение давно не использованных
+     записей, LRU) и временем жизни записей (TTL). Ведет счетчики попаданий и промахов.
+    При переданном max_bytes объем записей дополнительно ограничивается в байтах, размер каждой записи вычисляется
+     функцией sizeof. При sliding=True время жизни записи отсчитывается от последнего обращения к ней (время
+      простоя), а не от момента сохранения.
+
+    Args:
+        maxsize (int): максимальное количество записей в памяти
+        ttl (float): время жизни записи в секундах
+        storage (SQLiteCache): необязательное дисковое хранилище второго уровня
+        max_bytes (int): максимальный суммарный размер записей в байтах, 0 - без ограничения
+        sizeof (Callable): функция вычисления размера записи в байтах, по умолчанию - len
+        sliding (bool): продлевать время жизни записи при каждом обращении
+    """
+
+    def __init__(self, maxsize: int, ttl: float, storage: Optional[SQLiteCache] = None, max_bytes: int = 0,
+                 sizeof: Callable[[Any], int] = len, sliding: bool = False) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.storage = storage
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.sliding = sliding
+        self.hits, self.misses, self.size_bytes = 0, 0, 0
+        self.__data = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.__data)
+
+    def get(self, key: Hashable) -> Any:
+        """
+        Метод получения значения по ключу. При промахе в памяти значение ищется в дисковом хранилище.
+
+        :param key: ключ (Hashable)
+        :return: значение или None при отсутствии действующей записи
+        """
+        now = time.monotonic()
+        with self.__lock:
+            item = self.__data.get(key)
+            if item is not None:
+                if item[1] > now:
+                    self.__data.move_to_end(key)
+                    if self.sliding:
+                        self.__data[key] = (item[0], now + self.ttl, item[2])
+                    self.hits += 1
+                    return item[0]
+                self.__remove(key)
+        if self.storage is not None:
+            value = self.storage.get(key)
+            if value is not None:
+                with self.__lock:
+                    self.hits += 1
+                    self.__put(key, value, now)
+                return value
+        with self.__lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Метод сохранения значения в кэше и, при наличии, в дисковом хранилище
+
+        :param key: ключ (Hashable)
+        :param value: значение (Any)
+        """
+        with self.__lock:
+            self.__put(key, value, time.monotonic())
+        if self.storage is not None:
+            self.storage.set(key, value, self.ttl)
+
+    def delete(self, key: Hashable) -> None:
+        """
+        Метод удаления записи
+
+        :param key: ключ (Hashable)
+        """
+        with self.__lock:
+            if key in self.__data:
+                self.__remove(key)
+        if self.storage is not None:
+            self.storage.delete(key)
+
+    def clear(self) -> None:
+        """
+        Метод очистки кэша в памяти и сброса счетчиков
+        """
+        with self.__lock:
+            self.__data.clear()
+            self.hits, self.misses, self.size_bytes = 0, 0, 0
+
+    def __put(self, key: Hashable, value: Any, now: float) -> None:
+        size = self.sizeof(value) if self.max_bytes else 0
+        if key in self.__data:
+            self.__remove(key)
+        if self.max_bytes and size > self.max_bytes:  # Запись больше всего кэша не сохраняем
+            return
+        self.__data[key] = (value, now + self.ttl, size)
+        self.size_bytes += size
+        while len(self.__data) > self.maxsize or (self.max_bytes and self.size_bytes > self.max_bytes):
+            self.size_bytes -= self.__data.popitem(last=False)[1][2]
+
+    def __remove(self, key: Hashable) -> None:
+        self.size_bytes -= self.__data.pop(key)[2]
+
+
+class SingleFlight:
+    """
+    Класс объединения одновременных одинаковых запросов: пока выполняется функция для ключа, остальные потоки с тем же
+     ключом не запускают ее повторно, а ожидают и получают тот же результат (или то же исключение).
+    """
+
+    def __init__(self) -> None:
+        self.coalesced = 0
+        self.__calls: Dict[Hashable, list] = dict()
+        self.__lock = threading.Lock()
+
+    def do(self, key: Hashable, function: Callable[[], Any]) -> Any:
+        """
+        Метод выполнения функции с объединением одновременных вызовов по ключу
+
+        :param key: ключ вызова (Hashable)
+        :param function: выполняемая функция без аргументов (Callable)
+        :return: результат функции
+        """
+        with self.__lock:
+            call = self.__calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.__calls[key] = [threading.Event(), None, None]
+            else:
+                self.coalesced += 1
+        if not leader:
+            call[0].wait()
+            if call[2] is not None:
+                raise call[2]
+            return call[1]
+        try:
+            call[1] = function()
+            return call[1]
+        except Exception as error:
+            call[2] = error
+            raise
+        finally:
+            with self.__lock:
+                del self.__calls[key]
+            call[0].set()
@@ -0,0 +1,160 @@
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+import telebot
+from decouple import config
+
+DISPATCH_WORKERS = config('DISPATCH_WORKERS', default=8, cast=int)
+DISPATCH_QUEUE_SIZE = config('DISPATCH_QUEUE_SIZE', default=100, cast=int)
+
+_STOP = object()
+
+
+class ChatDispatcher:
+    """
+    Класс - диспетчер обработки обновлений в нескольких потоках. Каждый чат закрепляется за одним потоком по остатку
+     от деления id чата на количество потоков, поэтому сообщения одного чата обрабатываются строго по порядку, а
+      разные чаты - параллельно, и долгий поиск одного пользователя не задерживает остальных.
+    У каждого потока своя ограниченная очередь: при ее заполнении поток, передающий задачи (поток опроса сервера
+     телеграмма), ожидает освобождения места. Время ожидания и глубина очередей отражаются в метриках.
+
+    Args:
+        workers (int): количество потоков
+        queue_size (int): максимальная длина очереди одного потока
+    """
+
+    def __init__(self, workers: int = DISPATCH_WORKERS, queue_size: int = DISPATCH_QUEUE_SIZE) -> None:
+        self.queues: List[queue.Queue] = [queue.Queue(maxsize=queue_size) for _ in range(workers)]
+        self.submitted, self.completed, self.failed, self.blocked, self.blocked_seconds = 0, 0, 0, 0, 0.0
+        self.__lock = threading.Lock()
+        self.__threads = [threading.Thread(target=self.__work, args=(task_queue,), daemon=True,
+                                           name=f'dispatcher_{number}')
+                          for number, task_queue in enumerate(self.queues)]
+        for thread in self.__threads:
+            thread.start()
+
+    def submit(self, chat_id: int, task: Callable, *args, **kwargs) -> None:
+        """
+        Метод передачи задачи в поток, закрепленный за чатом
+
+        :param chat_id: id чата (int)
+        :param task: выполняемая функция (Callable)
+        :param args: позиционные аргументы функции
+        :param kwargs: именованные аргументы функции
+        """
+        task_queue = self.queues[hash(chat_id) % len(self.queues)]
+        item = (task, args, kwargs)
+        try:
+            task_queue.put_nowait(item)
+        except queue.Full:
+            start = time.monotonic()
+            task_queue.put(item)
+            with self.__lock:
+                self.blocked += 1
+                self.blocked_seconds += time.monotonic() - start
+        with self.__lock:
+            self.submitted += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Метод получения метрик диспетчера: глубины очередей, количества задач и времени ожидания при заполненных
+         очередях
+
+        :return: словарь метрик (Dict)
+        """
+        with self.__lock:
+            return {'queue_depth': [task_queue.qsize() for task_queue in self.queues],
+                    'submitted': self.submitted, 'completed': self.completed, 'failed': self.failed,
+                    'blocked': self.blocked, 'blocked_seconds': self.blocked_seconds}
+
+    def stop(self, timeout: float = None) -> None:
+        """
+        Метод остановки потоков после выполнения уже поставленных в очереди задач
+
+        :param timeout: максимальное время ожидания завершения каждого потока в секундах (float)
+        """
+        for task_queue in self.queues:
+            task_queue.put(_STOP)
+        for thread in self.__threads:
+            thread.join(timeout)
+
+    def __work(self, task_queue: queue.Queue) -> None:
+        while True:
+            item = task_queue.get()
+            if item is _STOP:
+                break
+            task, args, kwargs = item
+            try:
+                task(*args, **kwargs)
+                with self.__lock:
+                    self.completed += 1
+            except Exception as error_message:
+                with self.__lock:
+                    self.failed += 1
+                logging.exception(error_message)
+
+
+def chat_id_of(update: Any) -> int:
+    """
+    Функция определения id чата по объекту, передаваемому обработчику: сообщению, нажатию кнопки или списку сообщений
+
+    :param update: объект из Bot API
+    :return: id чата или 0, если определить его не удалось (int)
+    """
+    if isinstance(update, list):
+        update = update[0] if update else None
+    if isinstance(update, telebot.types.CallbackQuery):
+        update = update.message
+    chat = getattr(update, 'chat', None)
+    return chat.id if chat is not None else 0
+
+
+class DispatchingTeleBot(telebot.TeleBot):
+    """
+    Класс - бот телеграмма, выполняющий обработчики в потоках ChatDispatcher вместо общего пула потоков telebot.
+    Сообщения каждого чата передаются в поток чата одной задачей, и обработчик сообщения (следующего шага, ответа или
+     команды) выбирается уже в этом потоке, после выполнения обработчиков предыдущих сообщений чата. Иначе ответ
+      пользователя (название города, количество отелей) при занятом потоке попал бы в get_text_messages, так как
+       предыдущий обработчик еще не успел зарегистрировать обработчик следующего шага.
+
+    Args:
+        token (str): токен бота
+        dispatcher (ChatDispatcher): диспетчер обработки обновлений
+    """
+
+    def __init__(self, token: str, dispatcher: ChatDispatcher, **kwargs) -> None:
+        super().__init__(token, threaded=False, **kwargs)
+        self.dispatcher = dispatcher
+        self.__routing = threading.local()
+
+    def process_new_messages(self, new_messages: List[telebot.types.Message]) -> None:
+        chats: Dict[int, List[telebot.types.Message]] = dict()
+        for message in new_messages:
+            chats.setdefault(chat_id_of(message), list()).append(message)
+        for chat_id, messages in chats.items():
+            self.dispatcher.submit(chat_id, self.__route, messages)
+
+    def _exec_task(self, task: Callable, *args, **kwargs) -> None:
+        if getattr(self.__routing, 'active', False):  # Обработчик выбран в потоке чата и выполняется в нем же
+            task(*args, **kwargs)
+        else:
+            self.dispatcher.submit(chat_id_of(args[0]) if args else 0, task, *args, **kwargs)
+
+    def __route(self, messages: List[telebot.types.Message]) -> None:
+        first_error = None
+        self.__routing.active = True
+        try:
+            for message in messages:
+                try:
+                    super().process_new_messages([message])
+                except Exception as error_message:  # Ошибка обработчика не отменяет следующие сообщения чата
+                    if first_error is not None:
+                        logging.exception(error_message)
+                    first_error = first_error or error_message
+        finally:
+            self.__routing.active = False
+        if first_error is not None:
+            raise first_error
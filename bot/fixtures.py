@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+# Параметры запроса, не влияющие на выбор записанного ответа: даты заезда и выезда меняются каждый день
+VOLATILE_PARAMS = ('checkIn', 'checkOut')
+
+
+def fixture_key(path: str, params: Dict[str, str]) -> str:
+    """
+    Функция построения имени записанного ответа по пути и параметрам запроса без учета дат
+
+    :param path: путь запроса, например, '/properties/list' (str)
+    :param params: параметры запроса (Dict)
+    :return: имя файла ответа без расширения (str)
+    """
+    stable = sorted((name, value) for name, value in params.items() if name not in VOLATILE_PARAMS)
+    digest = hashlib.sha1(json.dumps([path, stable], ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+    return f'{path.strip("/").replace("/", "_")}_{digest}'
+
+
+class FixtureStore:
+    """
+    Класс - каталог записанных ответов API сайта. Каждый ответ хранится в отдельном JSON-файле с путем,
+     параметрами, кодом и телом ответа. Экземпляр класса является обработчиком для MockTransport и
+      benchmarks.fake_hotels_server: на запрос возвращается записанный ответ или код 404, если ответ не записан.
+
+    Args:
+        directory (str): каталог с записанными ответами
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.__responses: Dict[str, Tuple[int, bytes]] = dict()
+        self.__lock = threading.Lock()
+        if os.path.isdir(directory):
+            for file_name in sorted(os.listdir(directory)):
+                if file_name.endswith('.json'):
+                    with open(os.path.join(directory, file_name), encoding='utf-8') as file:
+                        record = json.load(file)
+                    self.__responses[file_name[:-5]] = (record['status'], self.__encode(record))
+
+    def __len__(self) -> int:
+        return len(self.__responses)
+
+    def __call__(self, path: str, params: Dict[str, str]) -> Tuple[int, bytes]:
+        return self.__responses.get(fixture_key(path, params), (404, b'{"message": "Fixture not found"}'))
+
+    def save(self, path: str, params: Dict[str, str], status: int, body: bytes) -> None:
+        """
+        Метод записи ответа в каталог
+
+        :param path: путь запроса (str)
+        :param params: параметры запроса (Dict)
+        :param status: код ответа (int)
+        :param body: тело ответа (bytes)
+        """
+        record = {'path': path, 'params': params, 'status': status}
+        try:
+            record['body'] = json.loads(body)
+        except ValueError:
+            record['text'] = body.decode('utf-8', errors='replace')
+        key = fixture_key(path, params)
+        with self.__lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, f'{key}.json'), 'w', encoding='utf-8') as file:
+                json.dump(record, file, ensure_ascii=False, indent=1)
+            self.__responses[key] = (status, self.__encode(record))
+
+    @staticmethod
+    def __encode(record: Dict) -> bytes:
+        if 'body' in record:
+            return json.dumps(record['body'], ensure_ascii=False).encode('utf-8')
+        return record.get('text', '').encode('utf-8')
+
+
+class RecordingTransport(BaseAdapter):
+    """
+    Класс - транспорт для requests.Session, выполняющий запросы через переданный транспорт и сохраняющий каждый
+     полученный ответ в FixtureStore. Записанные ответы затем воспроизводятся без сети и без расхода квоты RapidAPI.
+
+    Args:
+        store (FixtureStore): каталог записанных ответов
+        transport (BaseAdapter): транспорт, выполняющий запросы, по умолчанию - HTTPAdapter
+    """
+
+    def __init__(self, store: FixtureStore, transport: Optional[BaseAdapter] = None) -> None:
+        super().__init__()
+        self.store = store
+        self.transport = transport if transport is not None else HTTPAdapter()
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        response = self.transport.send(request, **kwargs)
+        url = urlsplit(request.url)
+        self.store.save(url.path, dict(parse_qsl(url.query)), response.status_code, response.content)
+        return response
+
+    def close(self) -> None:
+        self.transport.close()
@@ -1,92 +1,67 @@
 import functools
 import logging
-from typing import Dict, List, Callable, Type, Tuple, Any
+import time
+from typing import Dict, List, Callable, Type, Tuple, Any, Union
 import telebot
-from bot.user import User
+from bot import metrics
+from bot.hotel_parser import iter_hotels
+from bot.session_store import SessionStore
+from bot.user import SearchMode, User
 
+logger = logging.getLogger(__name__)
 
-def hotel_search(data: Dict, quantity: int) -> Dict[str, List]:
+
+def hotel_search(data: Union[bytes, Dict], quantity: int) -> Dict[str, List]:
     """
-    Функция копирования в новый словарь hotels наименования отелей и стоимости снятия одного номера на ночь в копируемом
-     отеле из переданного словаря data с известной структурой. Ключи в новом словаре - наименования отелей,
-      значения ключей - стоимости снятия номера на ночь в соответствующем отеле.
-    Копирование наименования отелей продолжается до тех пор, пока их количество не приравняется переданному значению
-     quantity, или функция не скопирует все наименования отелей, имеющиеся в переданном словаре data
+    Функция копирования в новый словарь hotels наименования отелей, адреса и стоимости снятия одного номера на ночь
+     из переданного ответа data с известной структурой. Ключи в новом словаре - наименования отелей, значения ключей -
+      список из адреса и стоимости снятия номера на ночь в соответствующем отеле.
+    Отели перебираются генератором iter_hotels, и перебор прекращается, как только количество отелей приравняется
+     переданному значению quantity, поэтому остаток страницы не разбирается.
 
-    :param data: передаваемый словарь (Dict)
+    :param data: тело ответа (bytes) или разобранный ответ (Dict)
     :param quantity: количество запрашиваемых отелей (int)
-    :return hotels: итоговый словарь с наименованиями отелей (int)
+    :return hotels: итоговый словарь с наименованиями отелей (Dict)
     """
     hotels = dict()
-    if data.get('data').get('body').get('searchResults').get('results'):
-        for element in data.get('data').get('body').get('searchResults').get('results'):
-            if len(hotels) < quantity:
-                if element.get('ratePlan') is not None and element.get('address') is not None:
-                    postal_code = element.get('address').get('postalCode')
-                    street_address = element.get('address').get('streetAddress')
-                    locality = element.get('address').get('locality')
-                    region = element.get('address').get('region')
-                    country_name = element.get('address').get('countryName')
-                    if region == locality or locality == '':
-                        full_address = [postal_code, street_address, region, country_name]
-                    elif region == '':
-                        full_address = [postal_code, street_address, locality, country_name]
-                    else:
-                        full_address = [postal_code, street_address, locality, region, country_name]
-                    full_address = ', '.join([value for value in full_address if value is not None])
-                    current_price = element.get('ratePlan').get('price').get('exactCurrent')
-                    hotels[element.get('name')] = [full_address, current_price]
-            else:
+    if quantity > 0:
+        for hotel in iter_hotels(data):
+            hotels[hotel.name] = [hotel.address, hotel.price]
+            if len(hotels) >= quantity:
                 break
     return hotels
 
 
-def hotel_search_distance(data: Dict, quantity: int, distance_minimum: float, distance_maximum: float,
+def hotel_search_distance(data: Union[bytes, Dict], quantity: int, distance_minimum: float, distance_maximum: float,
                           price_min: float, price_max: float) -> Tuple[Dict[str, List[float]], float]:
     """
-    Функция копирования в новый словарь hotels наименования отелей, стоимости снятия одного номера на ночь и дистанции
-     от центра до копируемого отеля из переданного словаря data с известной структурой. Ключи в новом словаре -
-      наименования отелей, значения ключей - список, где элемент с индексом "0" - стоимость снятия номера на ночь,
-       элемент с индексом "1" - дистанция от центра до данного отеля.
-    Копирование наименования отелей продолжается до тех пор, пока их количество не станет равной переданному значению
-     quantity, или функция не скопирует все наименования отелей, имеющиеся в переданном словаре data.
+    Функция копирования в новый словарь hotels наименования отелей, адреса, стоимости снятия одного номера на ночь и
+     дистанции от центра до копируемого отеля из переданного ответа data с известной структурой. Ключи в новом
+      словаре - наименования отелей, значения ключей - список, где элемент с индексом "0" - адрес, "1" - стоимость
+       снятия номера на ночь, "2" - дистанция от центра до данного отеля.
     Добавление в новый словарь выполняется только при выполнения условия: стоимость одной ночи должно входит в
      переданный диапазон цен, и расстояние от центра до отеля должно входить в переданный диапазон расстояний.
-      Предполагается, что цена снятия номера на одну ночь и расстояние от центра до отеля имеются в передаваемом словаре
+    Перебор отелей прекращается, как только их количество станет равным переданному значению quantity. Кроме
+     словаря функция возвращает стоимость последнего просмотренного отеля, по которой определяется, что следующие
+      страницы дороже максимальной стоимости.
 
-    :param data: передаваемый извне словарь (Dict)
+    :param data: тело ответа (bytes) или разобранный ответ (Dict)
     :param quantity: количество запрашиваемых отелей (int)
     :param distance_minimum: минимальная дистанция от центра до отеля (float)
     :param distance_maximum: максимальная дистанция от центра до отеля (float)
     :param price_min: минимальная стоимость снятия номера на одну ночь (float)
-    :param price_max: минимальная стоимость снятия номера на одну ночь (float)
-    :return: итоговый словарь с наименованиями отелей (Dict)
+    :param price_max: максимальная стоимость снятия номера на одну ночь (float)
+    :return: итоговый словарь с наименованиями отелей и стоимость последнего отеля (Tuple)
     """
     hotels = dict()
     price_high = 0
-    for element in data.get('data').get('body').get('searchResults').get('results'):
-        if (element.get('landmarks') is not None and element.get('ratePlan') is not None and
-                element.get('address') is not None):
-            current_distance = element.get('landmarks')[0].get('distance').split()[0]
-            if ',' in current_distance:
-                current_distance = current_distance.replace(',', '.')
-            current_distance = float(current_distance)
-            postal_code = element.get('address').get('postalCode')
-            street_address = element.get('address').get('streetAddress')
-            locality = element.get('address').get('locality')
-            region = element.get('address').get('region')
-            country_name = element.get('address').get('countryName')
-            if region == locality or locality == '':
-                full_address = [postal_code, street_address, region, country_name]
-            elif region == '':
-                full_address = [postal_code, street_address, locality, country_name]
-            else:
-                full_address = [postal_code, street_address, locality, region, country_name]
-            full_address = ', '.join(full_address)
-            price_high = current_price = element.get('ratePlan').get('price').get('exactCurrent')
-            if (len(hotels) < quantity and distance_minimum <= current_distance <= distance_maximum and
-                    price_min <= current_price <= price_max):
-                hotels[element.get('name')] = [full_address, current_price, current_distance]
+    if quantity > 0:
+        for hotel in iter_hotels(data, with_distance=True):
+            price_high = hotel.price
+            if distance_minimum <= hotel.distance <= distance_maximum and price_min <= hotel.price <= price_max:
+                hotels[hotel.name] = [hotel.address, hotel.price, hotel.distance]
+                if len(hotels) >= quantity:
+                    break
     return hotels, price_high
 
 
@@ -129,21 +104,21 @@ def at_first(current_bot: telebot.TeleBot, current_message: telebot.types.Messag
                              parse_mode='html')
     message_low = current_message.text.lower()
     if message_low == '/lowprice':
-        instance.flag_search = 'LOW_PRICE'
+        instance.flag_search = SearchMode.LOW_PRICE
     elif message_low == '/highprice':
-        instance.flag_search = 'HIGH_PRICE'
+        instance.flag_search = SearchMode.HIGH_PRICE
     elif message_low == '/bestdeal':
-        instance.flag_search = 'BEST_DEAL'
+        instance.flag_search = SearchMode.BEST_DEAL
     current_bot.register_next_step_handler(message=current_message, callback=next_step)
 
 
-def get_user(user_message: int, data: Dict) -> Type[User] or str:
+def get_user(user_message: int, data: SessionStore) -> Type[User] or str:
     """
-    Функция поиска значения передаваемого ключа в передаваемом словаре. В случае отсутствия значения ключа функция
-     возвращает строку 'NO_USER'
+    Функция поиска сессии пользователя в передаваемом хранилище сессий. В случае отсутствия действующей сессии
+     функция возвращает строку 'NO_USER'
 
-    :param user_message: ключ словаря, в данном случа - это id пользователя
-    :param data: словарь, где ключи - id пользователей, значения ключей - экземпляры класса пользователей
+    :param user_message: ключ хранилища, в данном случа - это id пользователя
+    :param data: хранилище сессий, где ключи - id пользователей, значения ключей - экземпляры класса пользователей
     :return: экземпляр класса или строка 'No_USER'
     """
     current_user = data.get(str(user_message))
@@ -156,22 +131,42 @@ def get_user(user_message: int, data: Dict) -> Type[User] or str:
 def user_logging(user_func: Callable) -> Callable:
     """
     Декоратор логирования переданной функции
-    Перед выполнением наименование функции записывается в файл log_file.log.
+    После выполнения в журнал записывается событие в формате JSON: id пользователя, наименование функции, время
+     выполнения и результат ('ok' или 'error' с текстом исключения). Журнал записывается фоновым потоком
+      (bot.log_pipeline.setup_logging), поэтому запись не увеличивает время обработки сообщения. Успешные вызовы -
+       частые события, которые сохраняются с долей LOG_SAMPLE_RATE.
 
     :param user_func: передаваемая пользователем функция
     :return: wrapped_func
     """
 
+    timed_func = metrics.timed('handler_seconds', handler=user_func.__name__)(user_func)
+
     @functools.wraps(user_func)
     def wrapped_func(*args, **kwargs) -> Any:
-        logging.basicConfig(filename='log_file.log', level=logging.INFO,
-                            filemode='w', format='%(asctime)s - %(message)s')
-        logging.info(f'The function is called: {user_func.__name__}')
-        return user_func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            result = timed_func(*args, **kwargs)
+        except Exception:
+            _log_handler_call(logging.ERROR, user_func.__name__, args, start, 'error', exc_info=True)
+            raise
+        _log_handler_call(logging.INFO, user_func.__name__, args, start, 'ok')
+        return result
 
     return wrapped_func
 
 
+def _log_handler_call(level: int, handler: str, args: Tuple, start: float, outcome: str,
+                      exc_info: bool = False) -> None:
+    if not logger.isEnabledFor(level):
+        return
+    sender = getattr(args[0], 'from_user', None) if args else None
+    logger.log(level, f'The function is called: {handler}', exc_info=exc_info,
+               extra={'user_id': getattr(sender, 'id', None), 'handler': handler,
+                      'latency_ms': round((time.perf_counter() - start) * 1000, 3), 'outcome': outcome,
+                      'sampled': level < logging.WARNING})
+
+
 def checking_numbers(current_bot: telebot.TeleBot, current_message: telebot.types.Message, instance: Type[User],
                      next_step: Callable, error_next_step: Callable,
                      output_message: str, error_output_message: str, variable: str) -> None:
@@ -0,0 +1,216 @@
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from decouple import config
+
+from bot import metrics
+from bot.cache import TTLCache
+from bot.hotel_parser import HotelRecord, iter_hotels
+from bot.page_loader import iterate_pages
+
+HOTEL_INDEX = config('HOTEL_INDEX', default=True, cast=bool)
+HOTEL_INDEX_TTL = config('HOTEL_INDEX_TTL', default=6 * 60 * 60, cast=float)
+HOTEL_INDEX_REFRESH = config('HOTEL_INDEX_REFRESH', default=60 * 60, cast=float)
+HOTEL_INDEX_SIZE = config('HOTEL_INDEX_SIZE', default=256, cast=int)
+HOTEL_INDEX_MIN_QUERIES = config('HOTEL_INDEX_MIN_QUERIES', default=2, cast=int)
+HOTEL_INDEX_WORKERS = config('HOTEL_INDEX_WORKERS', default=2, cast=int)
+LAST_PAGE = 10
+PAGE_SIZE = 25
+
+# Индексы направлений: ключ - id города и дата заезда, значение - DestinationIndex
+hotel_indexes = TTLCache(maxsize=HOTEL_INDEX_SIZE, ttl=HOTEL_INDEX_TTL)
+# Количество поисков по городу, после которого строится индекс
+_demand = TTLCache(maxsize=HOTEL_INDEX_SIZE * 4, ttl=HOTEL_INDEX_TTL)
+_demand_lock = threading.Lock()
+_building = set()
+_building_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=HOTEL_INDEX_WORKERS, thread_name_prefix='hotel_index')
+
+
+class DestinationIndex:
+    """
+    Класс - локальный индекс отелей одного направления, построенный по страницам, отсортированным сайтом по цене.
+    Отели хранятся в порядке возрастания цены в параллельных массивах цен и дистанций, дополнительно хранятся
+     отсортированные дистанции с номерами отелей. Запрос "N самых дешевых отелей с ценой в [p, q] и дистанцией в
+      [a, b]" выполняется двоичным поиском по одному из массивов.
+    Если сайт вернул не все отели направления (загружены все LAST_PAGE страниц), индекс полон только для цен ниже
+     covered_price: запросы, для ответа на которые нужны более дорогие отели, индексом не обслуживаются.
+
+    Args:
+        hotels (Iterable): данные отелей (HotelRecord)
+        complete (bool): в индекс попали все отели направления
+    """
+    __slots__ = ('hotels', 'prices', 'distances', 'distance_order', 'sorted_distances',
+                 'covered_price', 'complete', 'built_at')
+
+    def __init__(self, hotels: Iterable[HotelRecord], complete: bool) -> None:
+        unique = dict()
+        for hotel in hotels:
+            unique[hotel.name] = hotel
+        records = sorted(unique.values(), key=lambda hotel: hotel.price)
+        self.hotels = tuple(records)
+        self.prices = array('d', (hotel.price for hotel in records))
+        self.distances = array('d', (hotel.distance if hotel.distance is not None else float('nan')
+                                     for hotel in records))
+        self.distance_order = array('l', sorted((number for number, hotel in enumerate(records)
+                                                 if hotel.distance is not None),
+                                                key=lambda number: self.distances[number]))
+        self.sorted_distances = array('d', (self.distances[number] for number in self.distance_order))
+        self.complete = complete
+        self.covered_price = float('inf') if complete or not records else records[-1].price
+        self.built_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.hotels)
+
+    def age(self) -> float:
+        """
+        Метод получения возраста индекса
+
+        :return: время с момента построения в секундах (float)
+        """
+        return time.monotonic() - self.built_at
+
+    def cheapest(self, quantity: int) -> Optional[Dict[str, List]]:
+        """
+        Метод получения самых дешевых отелей (/lowprice)
+
+        :param quantity: количество отелей (int)
+        :return: словарь в формате hotel_search_sort или None, если индекс не содержит ответа (Dict)
+        """
+        if len(self) < quantity and not self.complete:
+            return None
+        return {hotel.name: [hotel.address, hotel.price] for hotel in self.hotels[:quantity]}
+
+    def most_expensive(self, quantity: int) -> Optional[Dict[str, List]]:
+        """
+        Метод получения самых дорогих отелей (/highprice). Ответ возможен только по полному индексу.
+
+        :param quantity: количество отелей (int)
+        :return: словарь в формате hotel_search_sort (по возрастанию цены) или None (Dict)
+        """
+        if not self.complete:
+            return None
+        return {hotel.name: [hotel.address, hotel.price] for hotel in self.hotels[max(len(self) - quantity, 0):]}
+
+    def in_range(self, quantity: int, minimum_price: float, maximum_price: float, minimum_distance: float,
+                 maximum_distance: float) -> Optional[Dict[str, List]]:
+        """
+        Метод получения самых дешевых отелей в диапазонах цен и дистанций (/bestdeal). Перебираются отели того
+         диапазона, в котором по двоичному поиску их меньше.
+
+        :param quantity: количество отелей (int)
+        :param minimum_price: минимальная стоимость снятия номера на ночь (float)
+        :param maximum_price: максимальная стоимость снятия номера на ночь (float)
+        :param minimum_distance: минимальная дистанция от центра до отеля в километрах (float)
+        :param maximum_distance: максимальная дистанция от центра до отеля в километрах (float)
+        :return: словарь в формате hotel_search_range или None, если индекс не содержит ответа (Dict)
+        """
+        price_start = bisect_left(self.prices, minimum_price)
+        price_end = bisect_right(self.prices, maximum_price)
+        distance_start = bisect_left(self.sorted_distances, minimum_distance)
+        distance_end = bisect_right(self.sorted_distances, maximum_distance)
+        if price_end - price_start <= distance_end - distance_start:
+            candidates = (number for number in range(price_start, price_end)
+                          if minimum_distance <= self.distances[number] <= maximum_distance)
+        else:
+            candidates = iter(sorted(number for number in self.distance_order[distance_start:distance_end]
+                                     if minimum_price <= self.prices[number] <= maximum_price))
+
+        found = list()
+        for number in candidates:
+            if self.prices[number] >= self.covered_price:  # Дороже этой цены индекс может быть неполным
+                break
+            found.append(number)
+            if len(found) == quantity:
+                break
+        if len(found) < quantity and maximum_price >= self.covered_price:
+            return None
+        return {self.hotels[number].name: [self.hotels[number].address, self.hotels[number].price,
+                                           self.hotels[number].distance] for number in found}
+
+
+def index_key(city_id: int) -> Tuple[str, str]:
+    """
+    Функция построения ключа индекса: цены отелей зависят от даты заезда
+
+    :param city_id: идентификационный номер города (int)
+    :return: ключ индекса (Tuple)
+    """
+    return str(city_id), str(date.today())
+
+
+def build_index(fetch_page: Callable[[int], Tuple[Tuple[str, ...], bytes]]) -> DestinationIndex:
+    """
+    Функция построения индекса по страницам, отсортированным по цене. Загружаются страницы до первой неполной или
+     до LAST_PAGE включительно; уже загруженные поисками страницы берутся из кэша страниц.
+
+    :param fetch_page: функция загрузки страницы по номеру, возвращающая ключ и тело ответа (Callable)
+    :return: индекс направления (DestinationIndex)
+    """
+    hotels, complete = list(), False
+    for page_number, (key, raw) in iterate_pages(fetch_page, last_page=LAST_PAGE):
+        page = list(iter_hotels(raw))
+        hotels.extend(page)
+        if len(page) < PAGE_SIZE:
+            complete = True
+            break
+    return DestinationIndex(hotels, complete)
+
+
+def get_index(city_id: int, fetch_page: Callable[[int], Tuple[Tuple[str, ...], bytes]]) -> Optional[DestinationIndex]:
+    """
+    Функция получения индекса направления для поиска. Для холодного города после HOTEL_INDEX_MIN_QUERIES поисков
+     индекс строится в фоне, а поиск выполняется запросами на сайт. Индекс старше HOTEL_INDEX_REFRESH продолжает
+      использоваться, пока в фоне строится новый; по истечении HOTEL_INDEX_TTL индекс удаляется из кэша.
+
+    :param city_id: идентификационный номер города (int)
+    :param fetch_page: функция загрузки страницы, отсортированной по цене, по номеру (Callable)
+    :return: индекс или None, если индекса нет или он отключен (DestinationIndex)
+    """
+    if not HOTEL_INDEX:
+        return None
+    key = index_key(city_id)
+    index = hotel_indexes.get(key)
+    if index is None:
+        with _demand_lock:
+            queries = (_demand.get(key) or 0) + 1
+            _demand.set(key, queries)
+        if queries >= HOTEL_INDEX_MIN_QUERIES:
+            refresh_index(key, fetch_page)
+    elif index.age() >= HOTEL_INDEX_REFRESH:
+        refresh_index(key, fetch_page)
+    return index
+
+
+def refresh_index(key: Tuple[str, str], fetch_page: Callable[[int], Tuple[Tuple[str, ...], bytes]]) -> None:
+    """
+    Функция фонового построения индекса. Одновременно для одного ключа строится не более одного индекса. Ошибки
+     построения записываются в журнал и учитываются в метрике index_builds_total.
+
+    :param key: ключ индекса (Tuple)
+    :param fetch_page: функция загрузки страницы по номеру (Callable)
+    """
+    with _building_lock:
+        if key in _building:
+            return
+        _building.add(key)
+
+    def build() -> None:
+        try:
+            hotel_indexes.set(key, build_index(fetch_page))
+            metrics.inc('index_builds_total', result='built')
+        except Exception as error:  # Индекс будет построен при следующем поиске
+            metrics.inc('index_builds_total', result='failed')
+            logging.exception(error)
+        finally:
+            with _building_lock:
+                _building.discard(key)
+
+    _executor.submit(build)
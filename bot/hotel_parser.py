@@ -0,0 +1,126 @@
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from bot import json_codec
+
+try:  # Потоковый разбор JSON доступен при установленном ijson с C-библиотекой yajl2
+    import ijson
+    _ijson = ijson.get_backend('yajl2_c')
+except ImportError:
+    _ijson = None
+
+# Путь к списку отелей в ответе /properties/list в формате ijson
+RESULTS_PREFIX = 'data.body.searchResults.results.item'
+
+
+class HotelRecord(NamedTuple):
+    """
+    Класс - данные одного отеля из ответа /properties/list
+
+    Args:
+        name (str): наименование отеля
+        address (str): адрес отеля
+        price (float): стоимость снятия номера на ночь
+        distance (float): дистанция от центра до отеля в километрах, None - дистанция не указана
+    """
+    name: str
+    address: str
+    price: float
+    distance: Optional[float]
+
+
+def full_address(address: Dict) -> str:
+    """
+    Функция составления адреса отеля из почтового индекса, улицы, населенного пункта, региона и страны. Населенный
+     пункт не указывается, если совпадает с регионом или отсутствует; пустой регион не указывается.
+
+    :param address: раздел 'address' описания отеля (Dict)
+    :return: адрес отеля (str)
+    """
+    locality, region = address.get('locality'), address.get('region')
+    if region == locality or locality == '':
+        parts = (address.get('postalCode'), address.get('streetAddress'), region, address.get('countryName'))
+    elif region == '':
+        parts = (address.get('postalCode'), address.get('streetAddress'), locality, address.get('countryName'))
+    else:
+        parts = (address.get('postalCode'), address.get('streetAddress'), locality, region,
+                 address.get('countryName'))
+    return ', '.join([value for value in parts if value is not None])
+
+
+def iter_results(data: Union[bytes, Dict]) -> Iterator[Dict]:
+    """
+    Генератор описаний отелей из ответа /properties/list. Тело ответа при установленном ijson разбирается
+     потоково: описания выдаются по одному, и при прекращении перебора остаток документа не разбирается. Без ijson
+      тело ответа разбирается декодером json_codec.
+
+    :param data: тело ответа (bytes) или уже разобранный ответ (Dict)
+    :return: итератор описаний отелей (Iterator)
+    :raise ValueError: тело ответа не в формате JSON (при любом способе разбора)
+    """
+    if isinstance(data, (bytes, bytearray)):
+        if _ijson is not None:
+            try:
+                yield from _ijson.items(data, RESULTS_PREFIX, use_float=True)
+            except ijson.JSONError as error:  # Как у декодеров json_codec: ошибка разбора - ValueError
+                raise ValueError(f'Invalid JSON: {error}') from error
+            return
+        data = json_codec.loads(data)
+    body = (data.get('data') or dict()).get('body') or dict()  # В ответе с ошибкой разделы отсутствуют или null
+    yield from (body.get('searchResults') or dict()).get('results') or ()
+
+
+def iter_hotels(data: Union[bytes, Dict], with_distance: bool = False) -> Iterator[HotelRecord]:
+    """
+    Генератор данных отелей из ответа /properties/list. Отели без стоимости или адреса пропускаются. При
+     with_distance=True пропускаются также отели без дистанции от центра.
+
+    :param data: тело ответа (bytes) или уже разобранный ответ (Dict)
+    :param with_distance: нужна ли дистанция от центра до отеля (bool)
+    :return: итератор данных отелей (Iterator)
+    """
+    for element in iter_results(data):
+        rate_plan, address = element.get('ratePlan'), element.get('address')
+        if rate_plan is None or address is None:
+            continue
+        price = (rate_plan.get('price') or dict()).get('exactCurrent')
+        if price is None:
+            continue
+        distance = landmark_distance(element.get('landmarks'))
+        if with_distance and distance is None:
+            continue
+        yield HotelRecord(element.get('name'), full_address(address), price, distance)
+
+
+def landmark_distance(landmarks: Optional[List[Dict]]) -> Optional[float]:
+    """
+    Функция получения дистанции от первого ориентира (центра города) до отеля, например, из '1,2 км'
+
+    :param landmarks: раздел 'landmarks' описания отеля (List)
+    :return: дистанция в километрах или None, если дистанция не указана (float)
+    """
+    try:
+        return float(landmarks[0].get('distance').split()[0].replace(',', '.'))
+    except (AttributeError, IndexError, TypeError, ValueError):
+        return None
+
+
+def page_distances(data: Union[bytes, Dict]) -> Tuple[float, ...]:
+    """
+    Функция получения дистанций от центра всех отелей страницы, используется для оценки доли подходящих отелей
+     при поиске /bestdeal
+
+    :param data: тело ответа (bytes) или разобранный ответ (Dict)
+    :return: дистанции в километрах в порядке отелей на странице (Tuple)
+    """
+    return tuple(hotel.distance for hotel in iter_hotels(data, with_distance=True))
+
+
+def page_results(data: Union[bytes, Dict]) -> int:
+    """
+    Функция подсчета описаний отелей на странице, включая отели без стоимости, адреса или дистанции. Страница без
+     описаний - признак того, что следующих страниц нет
+
+    :param data: тело ответа (bytes) или разобранный ответ (Dict)
+    :return: количество описаний отелей (int)
+    """
+    return sum(1 for _ in iter_results(data))
@@ -0,0 +1,50 @@
+import json
+from typing import Any, Callable, Dict, Union
+
+from decouple import config
+
+from bot import metrics
+
+try:  # Быстрый декодер JSON из байтов без промежуточной строки
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_BACKEND = config('JSON_BACKEND', default='auto')
+
+# Доступные декодеры: наименование - функция, принимающая bytes или str
+DECODERS: Dict[str, Callable[[Union[bytes, str]], Any]] = {'json': json.loads}
+if orjson is not None:
+    DECODERS['orjson'] = orjson.loads
+
+_decoder = DECODERS['json']
+backend = 'json'
+
+
+def set_backend(name: str) -> None:
+    """
+    Функция выбора декодера JSON. Значение 'auto' выбирает orjson, если он установлен, иначе стандартный модуль json
+
+    :param name: наименование декодера: 'auto', 'json' или 'orjson' (str)
+    """
+    global _decoder, backend
+    if name == 'auto':
+        name = 'orjson' if 'orjson' in DECODERS else 'json'
+    if name not in DECODERS:
+        raise ValueError(f'JSON backend {name} is not available')
+    _decoder, backend = DECODERS[name], name
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+    Функция декодирования JSON выбранным декодером. Тело ответа передается в виде байтов, без преобразования в строку
+     (как при response.text), поэтому лишняя копия ответа не создается.
+
+    :param data: тело ответа (bytes) или строка JSON (str)
+    :return: декодированные данные (Any)
+    """
+    with metrics.timer('json_decode_seconds', backend=backend):
+        return _decoder(data)
+
+
+set_backend(JSON_BACKEND)
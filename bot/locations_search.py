@@ -1,12 +1,34 @@
-import re
-import json
-import requests
-from typing import Dict
+from typing import Dict, Tuple
+
+from decouple import config
+
+from bot import metrics
+from bot.api_client import get_client
+from bot.cache import SQLiteCache, TTLCache
+from bot.normalize import canonical_city, city_caption
+
+CITY_CACHE_SIZE = config('CITY_CACHE_SIZE', default=1024, cast=int)
+CITY_CACHE_TTL = config('CITY_CACHE_TTL', default=24 * 60 * 60, cast=float)
+CITY_CACHE_DB = config('CITY_CACHE_DB', default='')
+
+city_cache = TTLCache(maxsize=CITY_CACHE_SIZE, ttl=CITY_CACHE_TTL,
+                      storage=SQLiteCache(CITY_CACHE_DB, table='cities') if CITY_CACHE_DB else None)
+
+
+def city_cache_key(city: str, local: str) -> Tuple[str, str]:
+    """
+    Функция построения ключа кэша городов: название города приводится к каноническому виду (canonical_city)
+
+    :param city: наименование города (str)
+    :param local: код языка (str)
+    :return: ключ кэша (Tuple)
+    """
+    return canonical_city(city), local
 
 
 def city_search(city: str, api_key: str, local: str) -> Dict[str, str]:
     """
-    Функция, выполняющая запрос по адресу, указанному в переменной url и копирующая название города и его
+    Функция, выполняющая запрос к API сайта через общий клиент (get_client) и копирующая название города и его
      идентификационный номер из полученных данных в отдельный словарь.
     В запросе на сайт передается название города.
     После выполнения запроса, сайт передает JSON-файл, где приведены разные объекты со введенным названием.
@@ -20,34 +42,41 @@ def city_search(city: str, api_key: str, local: str) -> Dict[str, str]:
     Ключ нового нового словаря: идентификационный номер город, значение ключа: наименование города.
     Функция передает вновь созданный словарь далее. В случае отсутствия хотя бы одного города с переданным названием,
      функция передаст пустой словарь.
+    Непустые результаты сохраняются в кэше city_cache, поэтому повторный запрос того же города на том же языке
+     выполняется без обращения к сайту.
 
     :param city: наименование города (str)
     :param api_key: ключ доступа на хост
     :param local: код языка
     :return: словарь с идентификационными номерами городов и их названиями городов (Dict)
     """
-    cities = dict()
-    url = "https://hotels4.p.rapidapi.com/locations/search"
+    cache_key = city_cache_key(city, local)
+    cached_cities = city_cache.get(cache_key)
+    metrics.inc('cache_requests_total', cache='city', result='miss' if cached_cities is None else 'hit')
+    if cached_cities is not None:
+        return dict(cached_cities)
+
     querystring = {'query': city, 'locale': local}
-    headers = {
-        'x-rapidapi-key': api_key,
-        'x-rapidapi-host': 'hotels4.p.rapidapi.com'
-        }
-    print('Запрос города:', city)
-    response = requests.request('GET', url, headers=headers, params=querystring)
-    data = json.loads(response.text)
+    cities = parse_cities(get_client(api_key).get('/locations/search', querystring))
+    if cities:
+        city_cache.set(cache_key, cities)
+    return dict(cities)
+
+
+def parse_cities(data: Dict) -> Dict[str, str]:
+    """
+    Функция извлечения городов из ответа /locations/search. Ключ словаря: идентификационный номер города, значение
+     ключа: наименование города с сокращенным, при наличии возможности, наименованием страны.
+
+    :param data: ответ сайта, конвертированный в словарь (Dict)
+    :return: словарь с идентификационными номерами городов и их названиями городов (Dict)
+    """
+    cities = dict()
     if data.get('suggestions'):
         for suggestion in data.get('suggestions'):
             if suggestion.get('group') == 'CITY_GROUP':
                 for elem in suggestion.get('entities', 0):
                     if elem.get('type').lower() == 'city':
-                        current_city_name = re.sub(r'<.+?>', '', elem['caption'])
-                        city_full_name = current_city_name.split(',')
-                        length = len(city_full_name)
-                        country_name = city_full_name[length - 1]
-                        if len([symbol for symbol in country_name if symbol.isupper()]) > 1:
-                            city_full_name[length - 1] = re.sub(r'[a-z ]', '', country_name)
-                        city_full_name = ', '.join(city_full_name)
-                        cities[elem['destinationId']] = city_full_name
+                        cities[elem['destinationId']] = city_caption(elem['caption'])
                 break
     return cities
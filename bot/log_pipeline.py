@@ -0,0 +1,163 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, Optional
+
+from decouple import config
+
+LOG_FILE = config('LOG_FILE', default='log_file.log')
+LOG_LEVEL = config('LOG_LEVEL', default='INFO')
+LOG_MAX_BYTES = config('LOG_MAX_BYTES', default=10 * 1024 * 1024, cast=int)
+LOG_ROTATE_INTERVAL = config('LOG_ROTATE_INTERVAL', default=24 * 60 * 60, cast=float)
+LOG_BACKUPS = config('LOG_BACKUPS', default=7, cast=int)
+LOG_SAMPLE_RATE = config('LOG_SAMPLE_RATE', default=1.0, cast=float)
+LOG_QUEUE_SIZE = config('LOG_QUEUE_SIZE', default=10000, cast=int)
+
+# Стандартные атрибуты LogRecord; остальные атрибуты записи (переданные через extra) выводятся как поля JSON
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'sampled'}
+
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Класс - форматирование записи журнала в одну строку JSON: время, уровень, источник, сообщение, поля из extra
+     (например, user_id, handler, latency_ms, outcome) и текст исключения
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname, 'logger': record.name, 'message': record.getMessage()}
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRIBUTES:
+                entry[name] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Класс - фильтр частых событий: записи, помеченные extra={'sampled': True}, пропускаются с вероятностью rate.
+     Предупреждения, ошибки и записи без пометки пропускаются всегда.
+
+    Args:
+        rate (float): доля сохраняемых частых событий от 0 до 1
+    """
+
+    def __init__(self, rate: float = LOG_SAMPLE_RATE) -> None:
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1 or record.levelno >= logging.WARNING or not getattr(record, 'sampled', False):
+            return True
+        return random.random() < self.rate
+
+
+class SizeAndTimeRotatingFileHandler(RotatingFileHandler):
+    """
+    Класс - запись журнала в файл с ротацией по размеру (max_bytes) и по времени (interval): текущий файл
+     переименовывается в <файл>.1, прежние копии сдвигаются, хранится не более backup_count копий.
+
+    Args:
+        filename (str): путь к файлу журнала
+        max_bytes (int): максимальный размер файла в байтах, 0 - без ограничения
+        interval (float): период ротации в секундах, 0 - без ротации по времени
+        backup_count (int): количество хранимых копий
+    """
+
+    def __init__(self, filename: str, max_bytes: int = LOG_MAX_BYTES, interval: float = LOG_ROTATE_INTERVAL,
+                 backup_count: int = LOG_BACKUPS) -> None:
+        super().__init__(filename, mode='a', maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8',
+                         delay=True)
+        self.interval = interval
+        started = os.path.getmtime(filename) if os.path.exists(filename) else time.time()
+        self.rollover_at = started + interval
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.interval > 0 and time.time() >= self.rollover_at:
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self) -> None:
+        super().doRollover()
+        self.rollover_at = time.time() + self.interval
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Класс - передача записей журнала в очередь фонового потока записи. При переполненной очереди запись
+     отбрасывается (и учитывается в dropped), а обработчик бота не ждет записи в файл.
+
+    Args:
+        log_queue (queue.Queue): очередь записей
+    """
+
+    def __init__(self, log_queue: queue.Queue) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Сообщение подставляется сразу, а текст исключения формирует фоновый поток
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(filename: str = LOG_FILE, level: str = LOG_LEVEL,
+                  sample_rate: float = LOG_SAMPLE_RATE) -> QueueListener:
+    """
+    Функция настройки журнала: записи корневого журнала через очередь передаются фоновому потоку, который
+     записывает их в файл в формате JSON с ротацией. Файл открывается на дозапись, поэтому журнал сохраняется после
+      перезапуска бота. Повторный вызов возвращает уже запущенный поток записи.
+
+    :param filename: путь к файлу журнала (str)
+    :param level: уровень журнала, например, 'INFO' (str)
+    :param sample_rate: доля сохраняемых частых событий (float)
+    :return: фоновый поток записи (QueueListener)
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+    file_handler = SizeAndTimeRotatingFileHandler(filename)
+    file_handler.setFormatter(JsonFormatter())
+    queue_handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    queue_handler.addFilter(SamplingFilter(sample_rate))
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+    _listener = QueueListener(queue_handler.queue, file_handler)
+    _listener.start()
+    atexit.register(stop_logging)  # Оставшиеся в очереди записи дописываются при завершении
+    return _listener
+
+
+def stop_logging() -> None:
+    """
+    Функция остановки фонового потока записи журнала после записи оставшихся в очереди записей
+    """
+    global _listener
+    if _listener is not None:
+        listener, _listener = _listener, None
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            if isinstance(handler, DroppingQueueHandler) and handler.queue is listener.queue:
+                root.removeHandler(handler)
+        listener.stop()
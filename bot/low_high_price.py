@@ -1,21 +1,50 @@
-import json
 from datetime import date, timedelta
-from typing import Dict
-
-import requests
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
+from bot import metrics
+from bot.api_client import get_client
 from bot.function import hotel_search
+from bot.hotel_index import DestinationIndex, get_index, index_key
+from bot.page_cache import load_page, parse_page
+from bot.page_loader import iterate_pages
+from bot.quota import QuotaExceeded
+from bot.search_flight import search_flight
+
+
+def sort_search_key(arguments: Dict[str, Any]) -> Tuple[str, ...]:
+    """
+    Функция построения ключа объединения одинаковых поисков hotel_search_sort (search_flight)
+
+    :param arguments: аргументы функции поиска (Dict)
+    :return: ключ поиска: вид сортировки, id города и дата заезда (Tuple)
+    """
+    return (arguments['search_kind'],) + index_key(arguments['city_id'])
+
+
+def highest_first(arguments: Dict[str, Any]) -> bool:
+    """
+    Функция, определяющая по аргументам hotel_search_sort, что нужны самые дорогие (последние) отели результата
+
+    :param arguments: аргументы функции поиска (Dict)
+    :return: True - поиск самых дорогих отелей (bool)
+    """
+    return arguments['search_kind'] == 'PRICE_HIGHEST_FIRST'
 
 
+@metrics.timed('search_seconds', search='sort')
+@search_flight.coalesce(sort_search_key, tail=highest_first)
 def hotel_search_sort(quantity: int, city_id: int, api_key: str, search_kind: str) -> Dict[str, float]:
     """
-    Функция, выполняющая запрос по адресу,  указанному в переменной url и копирующая необходимую информацию об отелях
-     из полученных данных в отдельный словарь.
+    Функция, выполняющая запрос к API сайта через общий клиент (get_client) и копирующая необходимую информацию об
+     отелях из полученных данных в отдельный словарь.
     В запросе на сайт передается идентификатор города, где расположены отели и количество отелей. Сайт может передать
      информацию о 25 отелях максимум за один запрос. После выполнения запроса сайт передает JSON-файл c данными об
-      отелях в интересующемся городе. Полученный JSON-файл конвертируется в словарь и передается в функцию
-       hotel_search для извлечения из него необходимой информации: наименований отелей и стоимости снятия номера на
-        ночь в соответствующем отеле.
+      отелях в интересующемся городе. Полученный JSON-файл передается в функцию hotel_search для извлечения из него
+       необходимой информации: наименований отелей и стоимости снятия номера на ночь в соответствующем отеле.
+    Если бюджет запросов на сайт (bot.quota) исчерпан после загрузки части страниц, возвращаются уже найденные
+     отели; если не найдено ни одного, исключение QuotaExceeded передается обработчику.
+    Одновременные поиски в том же городе с тем же видом сортировки выполняются один раз, поиски меньшего количества
+     отелей получают часть результата (bot.search_flight).
 
     :param quantity:  количество отелей (int)
     :param city_id: идентификационный номер города (int)
@@ -24,41 +53,140 @@ def hotel_search_sort(quantity: int, city_id: int, api_key: str, search_kind: st
     :return: словарь с данными отелей. Каждый элемент словаря: ключ: наименование отеля, значение ключа: стоимость
      снятия номера на ночь в отеле (Dict).
     """
-    current_quantity = quantity
-    previous_quantity, retry_flag = 0, 0
-    final_hotels = dict()
+    hotels = dict()
+    for hotels in _sort_results(quantity, city_id, api_key, search_kind):  # Нужен только итоговый результат
+        pass
+    return hotels
+
+
+@metrics.timed('search_seconds', search='sort')
+@search_flight.coalesce(sort_search_key, tail=highest_first)
+def iter_hotel_search_sort(quantity: int, city_id: int, api_key: str, search_kind: str) -> Iterator[Dict[str, List]]:
+    """
+    Генератор результатов функции hotel_search_sort по мере загрузки страниц: после каждой страницы, добавившей
+     отели, выдается словарь уже найденных отелей, отсортированный по цене, последним выдается итоговый результат.
+      Первые отели можно показать пользователю через время загрузки одной страницы, не дожидаясь остальных.
+    Одновременные одинаковые поиски объединяются так же, как в hotel_search_sort: присоединившийся поиск получает
+     только итоговый результат.
+
+    :param quantity: количество отелей (int)
+    :param city_id: идентификационный номер города (int)
+    :param api_key: ключ доступа на хост (str)
+    :param search_kind: вид сортировки (str)
+    :return: итератор словарей с данными отелей (Iterator)
+    """
+    yield from _sort_results(quantity, city_id, api_key, search_kind)
+
+
+def _sort_results(quantity: int, city_id: int, api_key: str, search_kind: str) -> Iterator[Dict[str, List]]:
+    client = get_client(api_key)
+    index = get_index(city_id, lambda page_number: load_page(client, sort_query(city_id, 'PRICE', page_number)))
+    hotels = indexed_sort(index, quantity, search_kind)
+    if hotels is not None:
+        yield hotels
+        return
+    collector = SortCollector(quantity)
+
+    def fetch_page(page_number: int) -> Tuple[Tuple[str, ...], bytes]:
+        return load_page(client, sort_query(city_id, search_kind, page_number))
+
+    try:
+        for request_number, (key, raw) in iterate_pages(fetch_page):  # Делаем не более 10 запросов
+            found = len(collector.final_hotels)
+            if collector.add_page(key, raw):
+                break
+            if len(collector.final_hotels) > found:
+                yield collector.result()
+    except QuotaExceeded:
+        if not collector.final_hotels:  # Показать нечего, обработчик сообщит об исчерпанном бюджете
+            raise
+        metrics.inc('quota_degraded_total', kind=search_kind)  # Результат по уже загруженным страницам
+    metrics.inc('search_pages_total', request_number, kind=search_kind)
+
+    yield collector.result()
+
+
+def indexed_sort(index: Optional[DestinationIndex], quantity: int, search_kind: str) -> Optional[Dict[str, List]]:
+    """
+    Функция получения результата hotel_search_sort из локального индекса направления
+
+    :param index: индекс направления или None (DestinationIndex)
+    :param quantity: количество отелей (int)
+    :param search_kind: вид сортировки (str)
+    :return: словарь с данными отелей или None, если нужен запрос на сайт (Dict)
+    """
+    hotels = None
+    if index is not None and search_kind == 'PRICE':
+        hotels = index.cheapest(quantity)
+    elif index is not None and search_kind == 'PRICE_HIGHEST_FIRST':
+        hotels = index.most_expensive(quantity)
+    metrics.inc('cache_requests_total', cache='hotel_index', result='miss' if hotels is None else 'hit')
+    return hotels
+
+
+def sort_query(city_id: int, search_kind: str, page_number: int) -> Dict[str, str]:
+    """
+    Функция формирования параметров запроса страницы отелей, отсортированных по цене
+
+    :param city_id: идентификационный номер города (int)
+    :param search_kind: вид сортировки (str)
+    :param page_number: номер страницы (int)
+    :return: параметры запроса (Dict)
+    """
     date_today = str(date.today())
     date_tomorrow = str(date.today() + timedelta(days=1))
-    url = 'https://hotels4.p.rapidapi.com/properties/list'
-
-    for request_number in range(1, 11):  # Делаем не более 10 запросов
-        print('Запрос на сайт:', request_number)
-        querystring = {'adults1': '1', 'pageNumber': str(request_number), 'destinationId': str(city_id),
-                       'pageSize': '25', 'checkOut': date_tomorrow, 'checkIn': date_today, 'sortOrder': search_kind,
-                       'locale': 'ru_RU', 'currency': 'RUB'}
-        headers = {
-            'x-rapidapi-key': api_key,
-            'x-rapidapi-host': 'hotels4.p.rapidapi.com'
-        }
-        response = requests.request("GET", url, headers=headers, params=querystring)
-        data = json.loads(response.text)
-        final_hotels.update(hotel_search(data=data, quantity=current_quantity))
-
-        current_length = len(final_hotels)
-        current_quantity = quantity - current_length
+    return {'adults1': '1', 'pageNumber': str(page_number), 'destinationId': str(city_id),
+            'pageSize': '25', 'checkOut': date_tomorrow, 'checkIn': date_today, 'sortOrder': search_kind,
+            'locale': 'ru_RU', 'currency': 'RUB'}
+
+
+class SortCollector:
+    """
+    Класс, накапливающий отели из последовательно получаемых страниц для функций hotel_search_sort и
+     hotel_search_sort_async и определяющий момент прекращения запросов на сайт.
+
+    Args:
+        quantity (int): количество отелей
+    """
+
+    def __init__(self, quantity: int) -> None:
+        self.quantity = quantity
+        self.current_quantity = quantity
+        self.previous_quantity, self.retry_flag = 0, 0
+        self.final_hotels = dict()
+
+    def add_page(self, key: Tuple[str, ...], raw: bytes) -> bool:
+        """
+        Метод добавления отелей очередной страницы
+
+        :param key: ключ страницы (Tuple)
+        :param raw: тело ответа (bytes)
+        :return: True, если запросы следующих страниц не нужны (bool)
+        """
+        self.final_hotels.update(parse_page(key, raw, hotel_search, quantity=self.current_quantity))
+
+        current_length = len(self.final_hotels)
+        self.current_quantity = self.quantity - current_length
 
         # Если количество отелей равно или выше запрошенного или флаг повтора равен двум, выходим из цикла
-        if len(final_hotels) >= quantity or retry_flag == 2:
-            break
+        if len(self.final_hotels) >= self.quantity or self.retry_flag == 2:
+            return True
         # Считаем количество повторов
-        if previous_quantity == current_length and current_length > 0:
-            retry_flag += 1
+        if self.previous_quantity == current_length and current_length > 0:
+            self.retry_flag += 1
         else:
-            retry_flag = 0
+            self.retry_flag = 0
 
-        previous_quantity = len(final_hotels)
+        self.previous_quantity = len(self.final_hotels)
+        return False
 
-    if len(final_hotels) > 1:
-        final_hotels = {i_key: i_value for i_key, i_value in sorted(final_hotels.items(), key=lambda elem: elem[1][1])}
+    def result(self) -> Dict[str, List]:
+        """
+        Метод получения итогового словаря отелей, отсортированного по цене
 
-    return final_hotels
+        :return: словарь с данными отелей (Dict)
+        """
+        if len(self.final_hotels) > 1:
+            return {i_key: i_value for i_key, i_value in sorted(self.final_hotels.items(),
+                                                                key=lambda elem: elem[1][1])}
+        return self.final_hotels
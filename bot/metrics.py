@@ -0,0 +1,274 @@
+import asyncio
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from decouple import config
+
+METRICS_ENABLED = config('METRICS_ENABLED', default=False, cast=bool)
+METRICS_HOST = config('METRICS_HOST', default='127.0.0.1')
+METRICS_PORT = config('METRICS_PORT', default=9108, cast=int)
+METRICS_PREFIX = 'too_easy_travel_'
+# Границы интервалов гистограмм времени выполнения в секундах
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class _Timer:
+    """
+    Класс - контекстный менеджер, записывающий время выполнения блока в гистограмму
+    """
+    __slots__ = ('registry', 'name', 'labels', 'start')
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, labels: Labels) -> None:
+        self.registry, self.name, self.labels = registry, name, labels
+
+    def __enter__(self) -> '_Timer':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.registry.observe_labels(self.name, time.perf_counter() - self.start, self.labels)
+
+
+class MetricsRegistry:
+    """
+    Класс - хранилище метрик: счетчиков, гистограмм времени выполнения и значений, вычисляемых при выгрузке
+     (например, длина очереди отправки). Метрики выгружаются в текстовом формате Prometheus.
+    Выключенное хранилище не записывает ничего: методы сразу возвращают управление, timer возвращает общий пустой
+     контекстный менеджер, а декоратор timed возвращает функцию без изменений.
+
+    Args:
+        enabled (bool): запись метрик включена
+        buckets (Tuple): границы интервалов гистограмм в секундах
+    """
+
+    def __init__(self, enabled: bool = METRICS_ENABLED, buckets: Tuple[float, ...] = BUCKETS) -> None:
+        self.enabled = enabled
+        self.buckets = buckets
+        self.__counters: Dict[str, Dict[Labels, float]] = dict()
+        self.__histograms: Dict[str, Dict[Labels, List[float]]] = dict()
+        self.__gauges: Dict[str, Callable[[], float]] = dict()
+        self.__lock = threading.Lock()
+        self.__null_timer = nullcontext()
+
+    def inc(self, name: str, amount: float = 1, **labels: Any) -> None:
+        """
+        Метод увеличения счетчика
+
+        :param name: наименование счетчика (str)
+        :param amount: величина увеличения (float)
+        :param labels: метки значения, например, cache='page'
+        """
+        if not self.enabled:
+            return
+        key = tuple(sorted((label, str(value)) for label, value in labels.items()))
+        with self.__lock:
+            values = self.__counters.setdefault(name, dict())
+            values[key] = values.get(key, 0) + amount
+
+    def observe(self, name: str, seconds: float, **labels: Any) -> None:
+        """
+        Метод записи времени выполнения в гистограмму
+
+        :param name: наименование гистограммы (str)
+        :param seconds: время выполнения в секундах (float)
+        :param labels: метки значения
+        """
+        if self.enabled:
+            self.observe_labels(name, seconds, tuple(sorted((label, str(value)) for label, value in labels.items())))
+
+    def observe_labels(self, name: str, seconds: float, labels: Labels) -> None:
+        """
+        Метод записи времени выполнения в гистограмму с уже подготовленными метками
+
+        :param name: наименование гистограммы (str)
+        :param seconds: время выполнения в секундах (float)
+        :param labels: отсортированные пары меток (Tuple)
+        """
+        bucket = bisect_left(self.buckets, seconds)
+        with self.__lock:
+            values = self.__histograms.setdefault(name, dict())
+            counts = values.get(labels)
+            if counts is None:  # Счетчики интервалов, количество и сумма значений
+                counts = values[labels] = [0] * (len(self.buckets) + 2)
+            counts[bucket] += 1
+            counts[-1] += seconds
+
+    def timer(self, name: str, **labels: Any) -> Any:
+        """
+        Метод получения контекстного менеджера, измеряющего время выполнения блока
+
+        :param name: наименование гистограммы (str)
+        :param labels: метки значения
+        :return: контекстный менеджер (Any)
+        """
+        if not self.enabled:
+            return self.__null_timer
+        return _Timer(self, name, tuple(sorted((label, str(value)) for label, value in labels.items())))
+
+    def timed(self, name: str, **labels: Any) -> Callable[[Callable], Callable]:
+        """
+        Декоратор измерения времени выполнения функции. Для генераторов измеряется время от начала до конца
+         перебора значений.
+
+        :param name: наименование гистограммы (str)
+        :param labels: метки значения
+        :return: декоратор (Callable)
+        """
+        def decorator(function: Callable) -> Callable:
+            if not self.enabled:
+                return function
+
+            if asyncio.iscoroutinefunction(function):
+                @functools.wraps(function)
+                async def wrapped_async(*args, **kwargs) -> Any:
+                    with self.timer(name, **labels):
+                        return await function(*args, **kwargs)
+
+                return wrapped_async
+
+            if inspect.isasyncgenfunction(function):
+                @functools.wraps(function)
+                async def wrapped_async_generator(*args, **kwargs) -> AsyncIterator:
+                    with self.timer(name, **labels):
+                        async for item in function(*args, **kwargs):
+                            yield item
+
+                return wrapped_async_generator
+
+            if inspect.isgeneratorfunction(function):
+                @functools.wraps(function)
+                def wrapped_generator(*args, **kwargs) -> Iterator:
+                    with self.timer(name, **labels):
+                        yield from function(*args, **kwargs)
+
+                return wrapped_generator
+
+            @functools.wraps(function)
+            def wrapped(*args, **kwargs) -> Any:
+                with self.timer(name, **labels):
+                    return function(*args, **kwargs)
+
+            return wrapped
+
+        return decorator
+
+    def gauge(self, name: str, callback: Callable[[], float]) -> None:
+        """
+        Метод регистрации значения, вычисляемого при выгрузке метрик
+
+        :param name: наименование значения (str)
+        :param callback: функция без параметров, возвращающая текущее значение (Callable)
+        """
+        with self.__lock:
+            self.__gauges[name] = callback
+
+    def render(self) -> str:
+        """
+        Метод выгрузки метрик в текстовом формате Prometheus
+
+        :return: текст метрик (str)
+        """
+        with self.__lock:
+            counters = {name: dict(values) for name, values in self.__counters.items()}
+            histograms = {name: {labels: list(counts) for labels, counts in values.items()}
+                          for name, values in self.__histograms.items()}
+            gauges = dict(self.__gauges)
+        lines = list()
+        for name, values in sorted(counters.items()):
+            lines.append(f'# TYPE {METRICS_PREFIX}{name} counter')
+            lines.extend(f'{METRICS_PREFIX}{name}{_labels(labels)} {_number(value)}'
+                         for labels, value in sorted(values.items()))
+        for name, values in sorted(histograms.items()):
+            lines.append(f'# TYPE {METRICS_PREFIX}{name} histogram')
+            for labels, counts in sorted(values.items()):
+                lines.extend(self.__histogram_lines(name, labels, counts))
+        for name, callback in sorted(gauges.items()):
+            try:
+                value = callback()
+            except Exception:  # Значение недоступно, например, очередь уже остановлена
+                continue
+            lines.append(f'# TYPE {METRICS_PREFIX}{name} gauge')
+            lines.append(f'{METRICS_PREFIX}{name} {_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def clear(self) -> None:
+        """
+        Метод удаления всех записанных значений
+        """
+        with self.__lock:
+            self.__counters.clear()
+            self.__histograms.clear()
+
+    def __histogram_lines(self, name: str, labels: Labels, counts: List[float]) -> Iterator[str]:
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else _number(bound)
+            yield f'{METRICS_PREFIX}{name}_bucket{_labels(labels + (("le", le),))} {cumulative}'
+        yield f'{METRICS_PREFIX}{name}_count{_labels(labels)} {cumulative}'
+        yield f'{METRICS_PREFIX}{name}_sum{_labels(labels)} {_number(counts[-1])}'
+
+
+def _labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    text = ','.join(f'{label}="{_escape(value)}"' for label, value in labels)
+    return f'{{{text}}}'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def start_server(registry: 'MetricsRegistry', host: str = METRICS_HOST,
+                 port: int = METRICS_PORT) -> Optional[ThreadingHTTPServer]:
+    """
+    Функция запуска HTTP-сервера выгрузки метрик (GET /metrics) в фоновом потоке
+
+    :param registry: хранилище метрик (MetricsRegistry)
+    :param host: адрес (str)
+    :param port: порт (int)
+    :return: сервер или None, если метрики выключены (ThreadingHTTPServer)
+    """
+    if not registry.enabled:
+        return None
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    httpd = ThreadingHTTPServer((host, port), MetricsHandler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, name='metrics', daemon=True).start()
+    return httpd
+
+
+registry = MetricsRegistry()
+inc = registry.inc
+observe = registry.observe
+timer = registry.timer
+timed = registry.timed
+gauge = registry.gauge
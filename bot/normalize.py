@@ -0,0 +1,108 @@
+import re
+import string
+import unicodedata
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from decouple import config
+
+CITY_LOCALES = config('CITY_LOCALES', default='ru_RU,en_US,de_DE,fr_FR,es_ES,it_IT,pt_PT')
+
+# Буквы языков, кроме латиницы, общей для всех языков, кроме русского
+ALPHABETS = {
+    'ru_RU': 'абвгдеёжзийклмнопрстуфхцчшщъыьэюя',
+    'en_US': '',
+    'de_DE': 'äöüß',
+    'fr_FR': 'àâæçéèêëîïôœùûüÿ',
+    'es_ES': 'áéíñóúü',
+    'it_IT': 'àèéìíîòóù',
+    'pt_PT': 'ãâáàçéêíóôõú',
+}
+SEPARATORS = '- '
+
+_TAG = re.compile(r'<.+?>')
+_HYPHEN = re.compile(r' ?- ?')
+_ABBREVIATE = str.maketrans('', '', string.ascii_lowercase + ' ')
+
+
+class CityNormalizer:
+    """
+    Класс - нормализация введенного пользователем названия города. Из текста за один проход (предварительно
+     скомпилированным регулярным выражением) удаляются все символы, кроме букв включенных языков, дефиса и пробела,
+      затем язык определяется по множеству оставшихся символов: первый язык из locales, алфавит которого содержит
+       все символы. Латиница без диакритических знаков определяется как en_US, кириллица - как ru_RU, латиница со
+        знаками, например, "münchen" - как язык, которому эти знаки принадлежат. Смешение алфавитов - ошибка ввода.
+
+    Args:
+        locales (str): коды языков через запятую в порядке проверки
+    """
+
+    def __init__(self, locales: str = CITY_LOCALES) -> None:
+        self.alphabets: Dict[str, FrozenSet[str]] = dict()
+        for local in (local.strip() for local in locales.split(',')):
+            if local not in ALPHABETS:
+                raise ValueError(f'Unsupported locale: {local}')
+            latin = string.ascii_lowercase if local != 'ru_RU' else ''
+            self.alphabets[local] = frozenset(latin + ALPHABETS[local] + SEPARATORS)
+        letters = ''.join(sorted(frozenset().union(*self.alphabets.values())))
+        self.__other = re.compile(f'[^{re.escape(letters)}]+')
+
+    def normalize(self, text: str) -> Tuple[str, Optional[str]]:
+        """
+        Метод нормализации названия города
+
+        :param text: введенный текст (str)
+        :return: название города для запроса на сайт и код языка, None - название введено неверно (Tuple)
+        """
+        city = self.__other.sub('', _nfc(text).lower())
+        return city, self.detect_locale(city)
+
+    def detect_locale(self, city: str) -> Optional[str]:
+        """
+        Метод определения языка нормализованного названия города
+
+        :param city: название города из букв, дефиса и пробела (str)
+        :return: код языка, None - пустое название или смешение алфавитов (Optional)
+        """
+        symbols = frozenset(city)
+        if not symbols - frozenset(SEPARATORS):
+            return None
+        for local, alphabet in self.alphabets.items():
+            if symbols <= alphabet:
+                return local
+        return None
+
+
+def canonical_city(city: str) -> str:
+    """
+    Функция приведения названия города к каноническому виду для ключей кэша: форма NFC, нижний регистр, одиночные
+     пробелы между словами и дефис без пробелов, например, "  Санкт - Петербург " = "санкт-петербург"
+
+    :param city: наименование города (str)
+    :return: каноническое название (str)
+    """
+    city = ' '.join(_nfc(city).lower().split())
+    return _HYPHEN.sub('-', city) if '-' in city else city
+
+
+def _nfc(text: str) -> str:
+    return text if text.isascii() else unicodedata.normalize('NFC', text)  # Текст ASCII уже в форме NFC
+
+
+def city_caption(caption: str) -> str:
+    """
+    Функция получения названия города из подписи ответа /locations/search: удаляются html-теги, наименование
+     страны из нескольких слов с заглавной буквы сокращается, например, United States of America = USA
+
+    :param caption: подпись города (str)
+    :return: наименование города (str)
+    """
+    if '<' in caption:
+        caption = _TAG.sub('', caption)
+    city_full_name = caption.split(',')
+    country_name = city_full_name[-1]
+    if sum(map(str.isupper, country_name)) > 1:
+        city_full_name[-1] = country_name.translate(_ABBREVIATE)
+    return ', '.join(city_full_name)
+
+
+city_normalizer = CityNormalizer()
@@ -0,0 +1,96 @@
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from decouple import config
+
+from bot import metrics
+from bot.api_client import HotelsApiClient
+from bot.cache import SingleFlight, TTLCache
+from bot.quota import QuotaExceeded
+from bot.resilience import ApiError
+
+PAGE_CACHE_SIZE = config('PAGE_CACHE_SIZE', default=4096, cast=int)
+PAGE_CACHE_TTL = config('PAGE_CACHE_TTL', default=10 * 60, cast=float)
+PAGE_CACHE_BYTES = config('PAGE_CACHE_BYTES', default=64 * 1024 * 1024, cast=int)
+PARSED_CACHE_SIZE = config('PARSED_CACHE_SIZE', default=8192, cast=int)
+
+# Параметры запроса /properties/list, от которых зависит содержимое страницы
+PAGE_KEY_FIELDS = ('destinationId', 'sortOrder', 'checkIn', 'checkOut', 'priceMin', 'priceMax', 'pageNumber',
+                   'pageSize', 'locale', 'currency', 'landmarkIds')
+
+page_cache = TTLCache(maxsize=PAGE_CACHE_SIZE, ttl=PAGE_CACHE_TTL, max_bytes=PAGE_CACHE_BYTES)
+parsed_cache = TTLCache(maxsize=PARSED_CACHE_SIZE, ttl=PAGE_CACHE_TTL)
+page_flight = SingleFlight()
+
+
+def page_key(params: Dict[str, str]) -> Tuple[str, ...]:
+    """
+    Функция построения ключа страницы по параметрам запроса /properties/list
+
+    :param params: параметры запроса (Dict)
+    :return: ключ страницы (Tuple)
+    """
+    return tuple(params.get(field, '') for field in PAGE_KEY_FIELDS)
+
+
+def load_page(client: HotelsApiClient, params: Dict[str, str]) -> Tuple[Tuple[str, ...], bytes]:
+    """
+    Функция получения страницы /properties/list. Страница берется из кэша page_cache, а при его отсутствии
+     загружается с сайта. Одновременные загрузки одной и той же страницы объединяются в один запрос на сайт. Если
+      запрос отклонен из-за исчерпанного бюджета другого пользователя (QuotaExceeded), ожидавший поток загружает
+       страницу сам за счет бюджета своего пользователя.
+
+    :param client: клиент API (HotelsApiClient)
+    :param params: параметры запроса (Dict)
+    :return: ключ страницы и тело ответа (Tuple)
+    """
+    key = page_key(params)
+    raw = page_cache.get(key)
+    metrics.inc('cache_requests_total', cache='page', result='miss' if raw is None else 'hit')
+    if raw is None:
+        leader = list()
+
+        def download() -> bytes:
+            leader.append(True)
+            return _download_page(client, key, params)
+
+        try:
+            raw = page_flight.do(key, download)
+        except QuotaExceeded:
+            if leader:
+                raise
+            raw = _download_page(client, key, params)  # Бюджет запросов у каждого пользователя свой
+    return key, raw
+
+
+def parse_page(key: Hashable, raw: bytes, parser: Callable[..., Any], **kwargs) -> Any:
+    """
+    Функция разбора страницы переданной функцией (hotel_search или hotel_search_distance). Результат разбора
+     сохраняется в кэше parsed_cache с учетом параметров разбора, поэтому при повторном запросе функция разбора не
+      выполняется. Страница, которую не удалось разобрать, удаляется из кэша page_cache, чтобы следующий поиск
+       загрузил ее с сайта заново, а не получил ту же ошибку.
+
+    :param key: ключ страницы (Hashable)
+    :param raw: тело ответа (bytes)
+    :param parser: функция разбора, принимающая тело ответа data и именованные параметры (Callable)
+    :param kwargs: параметры функции разбора
+    :return: результат функции разбора
+    :raise ApiError: страницу не удалось декодировать
+    """
+    parsed_key = (key, parser.__name__, tuple(sorted(kwargs.items())))
+    result = parsed_cache.get(parsed_key)
+    metrics.inc('cache_requests_total', cache='parsed', result='miss' if result is None else 'hit')
+    if result is None:
+        try:
+            with metrics.timer('parse_seconds', parser=parser.__name__):
+                result = parser(data=raw, **kwargs)
+        except ValueError as error:
+            page_cache.delete(key)
+            raise ApiError(f'/properties/list: invalid JSON ({error})') from error
+        parsed_cache.set(parsed_key, result)
+    return result
+
+
+def _download_page(client: HotelsApiClient, key: Tuple[str, ...], params: Dict[str, str]) -> bytes:
+    raw = client.get_raw('/properties/list', params, validate=True)  # Ошибочный ответ не попадает в кэш
+    page_cache.set(key, raw)
+    return raw
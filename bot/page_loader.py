@@ -0,0 +1,48 @@
+import contextvars
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Dict, Iterator, Optional, Tuple
+
+from decouple import config
+
+PAGE_PREFETCH = config('PAGE_PREFETCH', default=2, cast=int)
+PAGE_WORKERS = config('PAGE_WORKERS', default=16, cast=int)
+
+_executor = ThreadPoolExecutor(max_workers=PAGE_WORKERS, thread_name_prefix='page_loader')
+
+
+def iterate_pages(fetch_page: Callable[[int], Dict], first_page: int = 1, last_page: int = 10,
+                  prefetch: Optional[int] = None) -> Iterator[Tuple[int, Dict]]:
+    """
+    Генератор страниц результатов поиска. Страницы выдаются строго по порядку номеров, но при prefetch > 0
+     одновременно с текущей страницей загружаются следующие prefetch страниц в общем ограниченном пуле потоков.
+    Вызывающий цикл сохраняет свои условия выхода: при выходе из цикла (break) генератор закрывается, ещё не начатые
+     загрузки отменяются, а результаты уже выполняющихся загрузок отбрасываются.
+
+    :param fetch_page: функция загрузки страницы по её номеру (Callable)
+    :param first_page: номер первой страницы (int)
+    :param last_page: номер последней страницы включительно (int)
+    :param prefetch: количество страниц, загружаемых заранее; 0 - последовательная загрузка, по умолчанию -
+     значение PAGE_PREFETCH (int)
+    :return: итератор кортежей из номера страницы и данных страницы (Iterator)
+    """
+    if prefetch is None:
+        prefetch = PAGE_PREFETCH
+    if prefetch <= 0:
+        for page_number in range(first_page, last_page + 1):
+            yield page_number, fetch_page(page_number)
+        return
+
+    pending: Deque[Tuple[int, Future]] = deque()
+    next_page = first_page
+    try:
+        while pending or next_page <= last_page:
+            while next_page <= last_page and len(pending) <= prefetch:
+                # Загрузка выполняется в контексте вызывающего потока (например, с пользователем bot.quota)
+                pending.append((next_page, _executor.submit(contextvars.copy_context().run, fetch_page, next_page)))
+                next_page += 1
+            page_number, future = pending.popleft()
+            yield page_number, future.result()
+    finally:
+        for _, future in pending:  # Лишние страницы больше не нужны
+            future.cancel()
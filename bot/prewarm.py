@@ -0,0 +1,218 @@
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from decouple import config
+
+from bot import hotel_index
+from bot.api_client import get_client
+from bot.low_high_price import sort_query
+from bot.page_cache import load_page, page_cache, page_key
+from bot.quota import QuotaExceeded
+from bot.rate_limit import TokenBucket
+
+PREWARM_TOP = config('PREWARM_TOP', default=20, cast=int)
+PREWARM_HOURS = config('PREWARM_HOURS', default='1-7')
+PREWARM_BUDGET = config('PREWARM_BUDGET', default=500, cast=int)
+PREWARM_INTERVAL = config('PREWARM_INTERVAL', default=15 * 60, cast=float)
+POPULARITY_HALF_LIFE = config('POPULARITY_HALF_LIFE', default=3 * 24 * 60 * 60, cast=float)
+POPULARITY_SIZE = 4096
+
+
+class PopularityTracker:
+    """
+    Класс - счетчик популярности направлений. Каждый выбор города пользователем увеличивает счет направления на
+     единицу, со временем счет уменьшается вдвое за half_life секунд, поэтому популярность следует за сезоном.
+    Хранится не более maxsize направлений, при переполнении удаляются наименее популярные.
+
+    Args:
+        half_life (float): время уменьшения счета вдвое в секундах
+        maxsize (int): максимальное количество направлений
+    """
+
+    def __init__(self, half_life: float = POPULARITY_HALF_LIFE, maxsize: int = POPULARITY_SIZE) -> None:
+        self.half_life = half_life
+        self.maxsize = maxsize
+        self.__scores: Dict[str, Tuple[float, float]] = dict()
+        self.__lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.__scores)
+
+    def record(self, destination_id: str) -> None:
+        """
+        Метод учета выбора направления
+
+        :param destination_id: идентификационный номер города (str)
+        """
+        now = time.monotonic()
+        with self.__lock:
+            self.__scores[str(destination_id)] = (self.__score(str(destination_id), now) + 1, now)
+            if len(self.__scores) > self.maxsize:
+                for destination, _ in heapq.nsmallest(len(self.__scores) - self.maxsize, self.__scores.items(),
+                                                      key=lambda item: self.__score(item[0], now)):
+                    del self.__scores[destination]
+
+    def top(self, count: int) -> List[str]:
+        """
+        Метод получения самых популярных направлений
+
+        :param count: количество направлений (int)
+        :return: идентификационные номера городов по убыванию популярности (List)
+        """
+        now = time.monotonic()
+        with self.__lock:
+            return heapq.nlargest(count, self.__scores, key=lambda destination: self.__score(destination, now))
+
+    def __score(self, destination_id: str, now: float) -> float:
+        score, updated = self.__scores.get(destination_id, (0.0, now))
+        return score * 0.5 ** ((now - updated) / self.half_life)
+
+
+class Prewarmer:
+    """
+    Класс - планировщик предварительного построения локальных индексов отелей (bot.hotel_index) популярных
+     направлений. Планировщик проверяет время раз в interval секунд; прогрев выполняется один раз за период низкой
+      нагрузки (hours, например, '1-7' - с 01:00 до 07:00 местного времени) - при последней проверке перед его
+       окончанием, чтобы индексы (HOTEL_INDEX_TTL) были как можно свежее в часы пик. Для top самых популярных
+        направлений на текущие даты заезда и выезда строятся индексы, если их нет или они старше
+         HOTEL_INDEX_REFRESH. Страницы кэша page_cache хранятся несколько минут и до часов пик не доживают, поэтому
+          при отключенном индексе прогрев не выполняется.
+    Запросы на сайт идут через общий ограничитель квоты (bot.quota.governor) наравне с запросами пользователей и
+     дополнительно расходуют собственный бюджет budget запросов в сутки ("ведро токенов"): направление прогревается,
+      только если и бюджета, и общей квоты хватает на все его страницы. Бюджет в долг не берется, поэтому прогрев
+       расходует не больше budget запросов в сутки, но эти запросы уменьшают общую квоту, доступную пользователям.
+
+    Args:
+        tracker (PopularityTracker): счетчик популярности направлений
+        api_key (str): ключ доступа на хост
+        top (int): количество прогреваемых направлений
+        budget (int): количество запросов на сайт в сутки
+        interval (float): период проверки в секундах
+        hours (str): часы низкой нагрузки в виде 'начало-конец', пустая строка - прогрев при каждой проверке
+    """
+
+    def __init__(self, tracker: PopularityTracker, api_key: str, top: int = PREWARM_TOP, budget: int = PREWARM_BUDGET,
+                 interval: float = PREWARM_INTERVAL, hours: str = PREWARM_HOURS) -> None:
+        self.tracker = tracker
+        self.api_key = api_key
+        self.top = top
+        self.interval = interval
+        self.hours = tuple(int(hour) for hour in hours.split('-')) if hours else None
+        self.warmed, self.requests, self.skipped = 0, 0, 0
+        self.__budget = TokenBucket(budget / (24 * 60 * 60), budget)
+        self.__lock = threading.Lock()
+        self.__stopped = threading.Event()
+        self.__thread = None
+
+    def start(self) -> None:
+        """
+        Метод запуска планировщика в фоновом потоке
+        """
+        self.__thread = threading.Thread(target=self.__run, name='prewarm', daemon=True)
+        self.__thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Метод остановки планировщика
+
+        :param timeout: время ожидания текущего прогрева в секундах (float)
+        """
+        self.__stopped.set()
+        if self.__thread is not None:
+            self.__thread.join(timeout)
+
+    def off_peak(self, hour: int) -> bool:
+        """
+        Метод проверки, относится ли час к часам низкой нагрузки
+
+        :param hour: час местного времени от 0 до 23 (int)
+        :return: True - прогрев разрешен (bool)
+        """
+        if self.hours is None:
+            return True
+        start, end = self.hours
+        return start <= hour < end if start <= end else hour >= start or hour < end
+
+    def due(self, now: datetime) -> bool:
+        """
+        Метод проверки, нужен ли прогрев при проверке в момент now: в часы низкой нагрузки - только при последней
+         проверке перед их окончанием (следующая проверка через interval секунд будет уже вне их)
+
+        :param now: местное время проверки (datetime)
+        :return: True - прогрев выполняется (bool)
+        """
+        if not hotel_index.HOTEL_INDEX or not self.off_peak(now.hour):
+            return False
+        return self.hours is None or not self.off_peak((now + timedelta(seconds=self.interval)).hour)
+
+    def run_once(self) -> int:
+        """
+        Метод прогрева популярных направлений, которым прогрев нужен, в пределах бюджета
+
+        :return: количество прогретых направлений (int)
+        """
+        warmed = 0
+        for destination_id in self.tracker.top(self.top):
+            if self.__stopped.is_set():
+                break
+            if not self.__needs_warming(destination_id):
+                continue
+            if not self.__affordable():
+                self.skipped += 1
+                break
+            self.warm(destination_id)
+            warmed += 1
+        self.warmed += warmed
+        return warmed
+
+    def warm(self, destination_id: str) -> None:
+        """
+        Метод прогрева одного направления
+
+        :param destination_id: идентификационный номер города (str)
+        """
+        client = get_client(self.api_key)
+
+        def fetch_page(search_kind: str, page_number: int) -> Tuple[Tuple[str, ...], bytes]:
+            params = sort_query(int(destination_id), search_kind, page_number)
+            if page_cache.get(page_key(params)) is None:  # Бюджет расходуют только запросы на сайт
+                with self.__lock:
+                    now = time.monotonic()
+                    wait = self.__budget.delay(now)
+                    if wait > 0:  # Бюджет в долг не берется: прогрев направления прерывается до пополнения
+                        raise QuotaExceeded('prewarm', wait)
+                    self.__budget.take(now)
+                    self.requests += 1
+            return load_page(client, params)
+
+        hotel_index.hotel_indexes.set(hotel_index.index_key(destination_id),
+                                      hotel_index.build_index(lambda number: fetch_page('PRICE', number)))
+
+    @staticmethod
+    def __needs_warming(destination_id: str) -> bool:
+        index = hotel_index.hotel_indexes.get(hotel_index.index_key(destination_id))
+        return index is None or index.age() >= hotel_index.HOTEL_INDEX_REFRESH
+
+    def __affordable(self) -> bool:
+        pages = hotel_index.LAST_PAGE
+        if min(get_client(self.api_key).governor.remaining().values(), default=pages) < pages:
+            return False
+        with self.__lock:
+            self.__budget.delay(time.monotonic())
+            return self.__budget.tokens >= pages
+
+    def __run(self) -> None:
+        while not self.__stopped.wait(self.interval):
+            if not self.due(datetime.now()):
+                continue
+            try:
+                self.run_once()
+            except Exception as error:  # Прогрев не должен останавливать бота
+                logging.exception(error)
+
+
+popularity = PopularityTracker()
@@ -0,0 +1,150 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from decouple import config
+
+from bot import metrics
+from bot.cache import TTLCache
+from bot.resilience import ApiError
+from bot.rate_limit import TokenBucket
+
+QUOTA_USER_MINUTE = config('QUOTA_USER_MINUTE', default=30, cast=int)
+QUOTA_USER_DAY = config('QUOTA_USER_DAY', default=300, cast=int)
+QUOTA_GLOBAL_MINUTE = config('QUOTA_GLOBAL_MINUTE', default=600, cast=int)
+QUOTA_GLOBAL_DAY = config('QUOTA_GLOBAL_DAY', default=20000, cast=int)
+QUOTA_USERS = config('QUOTA_USERS', default=65536, cast=int)
+MINUTE = 60
+DAY = 24 * 60 * 60
+
+# Пользователь, от имени которого выполняются запросы на сайт в текущем потоке или задаче asyncio
+_current_user: ContextVar[Optional[str]] = ContextVar('quota_user', default=None)
+
+
+class QuotaExceeded(ApiError):
+    """
+    Класс - ошибка быстрого отказа: бюджет запросов на сайт пользователя или всего бота исчерпан, запрос на сайт не
+     выполняется
+
+    Args:
+        scope (str): исчерпанный бюджет: 'user' - пользователя, 'global' - всего бота, 'prewarm' - прогрева
+        retry_after (float): время до появления бюджета в секундах
+    """
+
+    def __init__(self, scope: str, retry_after: float) -> None:
+        super().__init__(f'{scope} quota exceeded, retry after {retry_after:.0f} s')
+        self.scope = scope
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        return False
+
+
+class QuotaGovernor:
+    """
+    Класс - ограничитель расхода квоты RapidAPI. Каждый запрос на сайт расходует по одному токену из бюджетов
+     пользователя (в минуту и в сутки) и из общих бюджетов бота ("ведра токенов"). Если хотя бы в одном бюджете нет
+      токена, запрос не выполняется и вызывается исключение QuotaExceeded. Ответы из кэшей и локального индекса
+       бюджет не расходуют, поэтому пользователь с исчерпанным бюджетом продолжает получать их.
+    Пользователь определяется контекстом user_context; запросы вне контекста (построение индекса, прогрев)
+     расходуют только общий бюджет. Бюджеты хранятся не более чем для max_users пользователей, бюджеты
+      пользователей, не обращавшихся к сайту сутки, удаляются (к этому времени они полностью восстанавливаются).
+
+    Args:
+        user_minute (int): запросов пользователя в минуту, 0 - без ограничения
+        user_day (int): запросов пользователя в сутки, 0 - без ограничения
+        global_minute (int): запросов бота в минуту, 0 - без ограничения
+        global_day (int): запросов бота в сутки, 0 - без ограничения
+        max_users (int): максимальное количество хранимых бюджетов пользователей
+    """
+
+    def __init__(self, user_minute: int = QUOTA_USER_MINUTE, user_day: int = QUOTA_USER_DAY,
+                 global_minute: int = QUOTA_GLOBAL_MINUTE, global_day: int = QUOTA_GLOBAL_DAY,
+                 max_users: int = QUOTA_USERS) -> None:
+        self.limits = (('minute', user_minute, MINUTE), ('day', user_day, DAY))
+        self.global_buckets = _buckets((('minute', global_minute, MINUTE), ('day', global_day, DAY)))
+        self.allowed, self.rejected = 0, 0
+        self.__users = TTLCache(maxsize=max_users, ttl=DAY, sliding=True)
+        self.__lock = threading.Lock()
+
+    def acquire(self, user_id: Optional[str] = None) -> None:
+        """
+        Метод расходования бюджета на один запрос на сайт
+
+        :param user_id: id пользователя, по умолчанию - пользователь текущего контекста (str)
+        :raise QuotaExceeded: бюджет пользователя или бота исчерпан
+        """
+        if user_id is None:
+            user_id = _current_user.get()
+        now = time.monotonic()
+        with self.__lock:
+            buckets = [('user', bucket) for _, bucket in self.__user_buckets(user_id)]
+            buckets.extend(('global', bucket) for _, bucket in self.global_buckets)
+            retry_after, scope = 0.0, None
+            for bucket_scope, bucket in buckets:
+                delay = bucket.delay(now)
+                if delay > retry_after:
+                    retry_after, scope = delay, bucket_scope
+            if scope is None:
+                for _, bucket in buckets:
+                    bucket.take(now)
+                self.allowed += 1
+            else:
+                self.rejected += 1
+        metrics.inc('quota_requests_total', scope=scope or 'none', result='allowed' if scope is None else 'rejected')
+        if scope is not None:
+            raise QuotaExceeded(scope, retry_after)
+
+    def remaining(self, user_id: Optional[str] = None) -> Dict[str, int]:
+        """
+        Метод получения остатка бюджетов. Отключенные бюджеты (с ограничением 0) в результат не входят
+
+        :param user_id: id пользователя, None - только общие бюджеты (str)
+        :return: словарь с остатками, например, {'global_minute': 590, 'global_day': 19990} (Dict)
+        """
+        now = time.monotonic()
+        with self.__lock:
+            remaining = {f'global_{period}': _tokens(bucket, now) for period, bucket in self.global_buckets}
+            if user_id is not None:
+                remaining.update((f'user_{period}', _tokens(bucket, now))
+                                 for period, bucket in self.__user_buckets(str(user_id)))
+        return remaining
+
+    def __user_buckets(self, user_id: Optional[str]) -> List[Tuple[str, TokenBucket]]:
+        if user_id is None:
+            return list()
+        buckets = self.__users.get(user_id)
+        if buckets is None:
+            buckets = _buckets(self.limits)
+            self.__users.set(user_id, buckets)
+        return buckets
+
+
+def _buckets(limits: Tuple[Tuple[str, int, int], ...]) -> List[Tuple[str, TokenBucket]]:
+    return [(label, TokenBucket(limit / period, limit)) for label, limit, period in limits if limit > 0]
+
+
+def _tokens(bucket: TokenBucket, now: float) -> int:
+    bucket.delay(now)  # Пополнение токенов на текущее время
+    return max(int(bucket.tokens), 0)
+
+
+@contextmanager
+def user_context(user_id: int) -> Iterator[None]:
+    """
+    Контекстный менеджер, относящий запросы на сайт внутри блока к бюджету пользователя. Контекст передается в
+     задачи asyncio и в потоки загрузки страниц (iterate_pages).
+
+    :param user_id: id пользователя в телеграмме (int)
+    """
+    token = _current_user.set(str(user_id))
+    try:
+        yield
+    finally:
+        _current_user.reset(token)
+
+
+governor = QuotaGovernor()
@@ -0,0 +1,46 @@
+import time
+
+
+class TokenBucket:
+    """
+    Класс - ограничитель частоты по алгоритму "ведро токенов": токены пополняются со скоростью rate в секунду до
+     capacity штук, каждая операция (отправка сообщения, запрос на сайт) расходует один токен. Токен можно взять в
+      долг, тогда метод take возвращает время, которое нужно подождать перед операцией. Класс не потокобезопасен,
+       вызовы защищаются блокировкой владельца.
+
+    Args:
+        rate (float): скорость пополнения, токенов в секунду
+        capacity (int): максимальное количество токенов (допустимая пачка операций)
+    """
+
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def delay(self, now: float) -> float:
+        """
+        Метод определения времени до появления свободного токена
+
+        :param now: текущее время time.monotonic() (float)
+        :return: время ожидания в секундах, 0 - токен есть (float)
+        """
+        self.__refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> float:
+        """
+        Метод расходования одного токена
+
+        :param now: текущее время time.monotonic() (float)
+        :return: время, которое нужно подождать перед операцией, в секундах (float)
+        """
+        wait = self.delay(now)
+        self.tokens -= 1
+        return wait
+
+    def __refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
@@ -0,0 +1,201 @@
+import logging
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, Iterable, List, Optional
+
+import telebot
+from decouple import config
+from telebot import types
+
+from bot.cache import TTLCache
+from bot.user import SearchMode
+
+MESSAGE_LIMIT = 4096
+RESULT_PAGE_SIZE = config('RESULT_PAGE_SIZE', default=0, cast=int)
+RESULT_PAGES_TTL = config('RESULT_PAGES_TTL', default=60 * 60, cast=float)
+PROGRESSIVE_RESULTS = config('PROGRESSIVE_RESULTS', default=False, cast=bool)
+PROGRESS_INTERVAL = config('PROGRESS_INTERVAL', default=1.0, cast=float)
+PAGE_CALLBACK = 'hotels'
+PROGRESS_FAILED = '<b>Поиск прерван.</b\n>'
+
+# Страницы результатов для листания кнопками: ключ - (id чата, номер результата), значение - список текстов
+result_pages = TTLCache(maxsize=10000, ttl=RESULT_PAGES_TTL)
+
+
+def format_hotel(name: str, value: List, flag_search: SearchMode) -> str:
+    """
+    Функция формирования описания одного отеля для вывода пользователю
+
+    :param name: наименование отеля (str)
+    :param value: список, где элемент с индексом "0" - адрес, "1" - стоимость снятия номера на ночь, "2" - дистанция
+     от центра до отеля (только для SearchMode.BEST_DEAL) (List)
+    :param flag_search: вид поиска (SearchMode)
+    :return: описание отеля (str)
+    """
+    if flag_search == SearchMode.BEST_DEAL:
+        return (f'{name}\nАдрес: {value[0]}\nСтоимость от {value[1]} рублей за ночь\n'
+                f'Расстояние от центра составляет {value[2]} км')
+    return f'{name}\nАдрес: {value[0]}\nСтоимость от {value[1]} рублей за ночь '
+
+
+def render_hotels(hotels: Dict[str, List], flag_search: SearchMode, header: str = 'Результат:',
+                  page_size: int = 0, limit: int = MESSAGE_LIMIT) -> List[str]:
+    """
+    Функция упаковки описаний отелей в минимальное количество сообщений. Описания отелей разделяются пустой строкой и
+     добавляются в сообщение, пока его длина не превышает ограничение телеграмма в 4096 символов. При переданном
+      page_size в одно сообщение попадает не более page_size отелей.
+
+    :param hotels: словарь с данными отелей (Dict)
+    :param flag_search: вид поиска (SearchMode)
+    :param header: заголовок первого сообщения (str)
+    :param page_size: максимальное количество отелей в сообщении, 0 - без ограничения (int)
+    :param limit: максимальная длина сообщения (int)
+    :return: список текстов сообщений (List)
+    """
+    messages, blocks, length, count = list(), list(), 0, 0
+    if header:
+        blocks, length = [header], len(header)
+    for name, value in hotels.items():
+        block = format_hotel(name, value, flag_search)
+        if count and (length + len(block) + 2 + len('<b></b\n>') > limit or (page_size and count >= page_size)):
+            messages.append('<b>{}</b\n>'.format('\n\n'.join(blocks)))
+            blocks, length, count = list(), 0, 0
+        if blocks:
+            length += 2
+        blocks.append(block)
+        length += len(block)
+        count += 1
+    if blocks:
+        messages.append('<b>{}</b\n>'.format('\n\n'.join(blocks)))
+    return messages
+
+
+def page_keyboard(token: int, page: int, pages_count: int) -> types.InlineKeyboardMarkup:
+    """
+    Функция создания клавиатуры листания страниц результата
+
+    :param token: номер результата (int)
+    :param page: номер текущей страницы, начиная с нуля (int)
+    :param pages_count: количество страниц (int)
+    :return: клавиатура (types.InlineKeyboardMarkup)
+    """
+    keyboard = types.InlineKeyboardMarkup()
+    previous_page = page - 1 if page > 0 else -1  # Номер -1 - кнопка без действия
+    next_page = page + 1 if page + 1 < pages_count else -1
+    keyboard.row(types.InlineKeyboardButton(text='◀', callback_data=f'{PAGE_CALLBACK}:{token}:{previous_page}'),
+                 types.InlineKeyboardButton(text=f'{page + 1}/{pages_count}',
+                                            callback_data=f'{PAGE_CALLBACK}:{token}:-1'),
+                 types.InlineKeyboardButton(text='▶', callback_data=f'{PAGE_CALLBACK}:{token}:{next_page}'))
+    return keyboard
+
+
+def send_hotels(current_bot: telebot.TeleBot, chat_id: int, hotels: Dict[str, List], flag_search: SearchMode,
+                token: int, page_size: Optional[int] = None, message_id: Optional[int] = None) -> None:
+    """
+    Функция вывода результата поиска пользователю. Без листания результат упаковывается в минимальное количество
+     сообщений. При включенном листании (RESULT_PAGE_SIZE > 0) выводится первая страница с клавиатурой, остальные
+      страницы сохраняются в result_pages и показываются функцией show_page.
+    При переданном message_id первое сообщение результата заменяет текст этого сообщения (например, промежуточного
+     результата show_progress), а не отправляется заново.
+
+    :param current_bot: текущий бот телеграмм
+    :param chat_id: id чата (int)
+    :param hotels: словарь с данными отелей (Dict)
+    :param flag_search: вид поиска (SearchMode)
+    :param token: номер результата, например, id сообщения пользователя (int)
+    :param page_size: количество отелей на странице, по умолчанию - значение RESULT_PAGE_SIZE (int)
+    :param message_id: id заменяемого сообщения бота (int)
+    """
+    if page_size is None:
+        page_size = RESULT_PAGE_SIZE
+    messages = render_hotels(hotels, flag_search, page_size=page_size)
+    reply_markup = None
+    if page_size and len(messages) > 1:
+        result_pages.set((chat_id, token), messages)
+        messages, reply_markup = messages[:1], page_keyboard(token, 0, len(messages))
+    for number, text in enumerate(messages):
+        if number == 0 and message_id is not None:
+            current_bot.edit_message_text(text=text, chat_id=chat_id, message_id=message_id, parse_mode='html',
+                                          reply_markup=reply_markup)
+        elif reply_markup is not None:
+            current_bot.send_message(chat_id=chat_id, text=text, parse_mode='html', reply_markup=reply_markup)
+        else:
+            current_bot.send_message(chat_id=chat_id, text=text, parse_mode='html')
+
+
+def show_progress(current_bot: telebot.TeleBot, chat_id: int, message: Any, results: Iterable[Dict[str, List]],
+                  flag_search: SearchMode, quantity: int, interval: float = PROGRESS_INTERVAL) -> Dict[str, List]:
+    """
+    Функция вывода промежуточных результатов поиска (при PROGRESSIVE_RESULTS=True): текст сообщения message
+     ("Ищу гостиницы...") заменяется уже найденными отелями по мере загрузки страниц. Первые найденные отели
+      выводятся сразу, следующие изменения - не чаще одного раза в interval секунд, чтобы не превышать ограничения
+       телеграмма на изменение сообщений. Итоговый результат выводится функцией send_hotels с message_id.
+    Пока сообщение message не отправлено очередью отправки, промежуточные результаты пропускаются. Если поиск
+     завершился ошибкой, текст сообщения заменяется на PROGRESS_FAILED, а ошибка передается обработчику.
+
+    :param current_bot: текущий бот телеграмм
+    :param chat_id: id чата (int)
+    :param message: отправленное сообщение или объект Future с ним при отправке через очередь (Any)
+    :param results: итератор словарей с данными отелей, например, iter_hotel_search_sort (Iterable)
+    :param flag_search: вид поиска (SearchMode)
+    :param quantity: количество отелей (int)
+    :param interval: минимальный интервал между изменениями сообщения в секундах (float)
+    :return: итоговый словарь с данными отелей (Dict)
+    """
+    hotels, shown, completed = dict(), None, False
+    try:
+        for hotels in results:
+            now = time.monotonic()
+            if not hotels or len(hotels) >= quantity or (shown is not None and now - shown < interval):
+                continue
+            message_id = message_id_of(message)
+            if message_id is None:
+                continue
+            header = f'Найдено отелей: {len(hotels)} из {quantity}. Продолжаю поиск...'
+            current_bot.edit_message_text(text=render_hotels(hotels, flag_search, header=header)[0],
+                                          chat_id=chat_id, message_id=message_id, parse_mode='html')
+            shown = now
+        completed = True
+    finally:
+        message_id = None if completed else message_id_of(message)
+        if message_id is not None:
+            try:
+                current_bot.edit_message_text(text=PROGRESS_FAILED, chat_id=chat_id, message_id=message_id,
+                                              parse_mode='html')
+            except Exception as error_message:  # Ошибка поиска важнее ошибки изменения сообщения
+                logging.warning(f'Progress message update failed: {error_message}')
+    return hotels
+
+
+def message_id_of(message: Any) -> Optional[int]:
+    """
+    Функция получения id отправленного сообщения без ожидания отправки
+
+    :param message: сообщение (telebot.types.Message) или объект Future с ним при отправке через очередь (Any)
+    :return: id сообщения или None, если сообщение еще не отправлено или его не удалось отправить (int)
+    """
+    if isinstance(message, Future):
+        if not message.done() or message.cancelled() or message.exception() is not None:
+            return None
+        message = message.result()
+    return message.message_id
+
+
+def show_page(current_bot: telebot.TeleBot, call: telebot.types.CallbackQuery) -> None:
+    """
+    Функция обработки кнопок листания результата: текст сообщения заменяется выбранной страницей
+
+    :param current_bot: текущий бот телеграмм
+    :param call: объект из Bot API, содержащий в себе номер результата и номер страницы
+    """
+    _, token, page = call.data.split(':')
+    messages = result_pages.get((call.message.chat.id, int(token)))
+    if messages is None:  # Результат устарел, убираем клавиатуру
+        current_bot.edit_message_reply_markup(chat_id=call.message.chat.id, message_id=call.message.message_id,
+                                              reply_markup=None)
+    elif 0 <= int(page) < len(messages):
+        page = int(page)
+        current_bot.edit_message_text(text=messages[page], chat_id=call.message.chat.id,
+                                      message_id=call.message.message_id, parse_mode='html',
+                                      reply_markup=page_keyboard(int(token), page, len(messages)))
+    current_bot.answer_callback_query(call.id)
@@ -0,0 +1,143 @@
+import random
+import threading
+import time
+from typing import Dict, Iterator, Optional
+
+from decouple import config
+
+API_RETRIES = config('API_RETRIES', default=2, cast=int)
+API_BACKOFF = config('API_BACKOFF', default=0.2, cast=float)
+API_BACKOFF_MAX = config('API_BACKOFF_MAX', default=2.0, cast=float)
+API_TIMEOUTS = config('API_TIMEOUTS', default='/locations/search=5,/properties/list=10')
+API_HEDGE_AFTER = config('API_HEDGE_AFTER', default=0.0, cast=float)
+CIRCUIT_FAILURES = config('CIRCUIT_FAILURES', default=5, cast=int)
+CIRCUIT_RESET = config('CIRCUIT_RESET', default=30.0, cast=float)
+
+# Коды ответа, после которых запрос повторяется: сайт перегружен или временно недоступен
+RETRY_STATUSES = frozenset((408, 429, 500, 502, 503, 504))
+
+
+class ApiError(Exception):
+    """
+    Класс - ошибка запроса к API сайта: ответ с кодом ошибки, таймаут, ошибка соединения или ответ, который не
+     удалось декодировать. Обработчики бота сообщают пользователю, что сервис временно недоступен.
+
+    Args:
+        message (str): описание ошибки
+        status (int): код ответа, None - ответ не получен
+    """
+
+    def __init__(self, message: str, status: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.status = status
+
+    @property
+    def retryable(self) -> bool:
+        return self.status is None or self.status in RETRY_STATUSES
+
+
+class CircuitOpenError(ApiError):
+    """
+    Класс - ошибка быстрого отказа: автомат защиты разомкнут, запрос на сайт не выполняется
+    """
+
+
+class CircuitBreaker:
+    """
+    Класс - автомат защиты от недоступного сайта. После failures подряд запросов, неудачных после всех повторов
+     (таймауты, ошибки соединения, ответы 5xx), автомат размыкается, и в течение reset секунд запросы сразу
+      завершаются ошибкой CircuitOpenError без обращения к сайту. Затем пропускается один пробный запрос: при успехе
+       автомат замыкается, при неудаче снова размыкается на reset секунд.
+
+    Args:
+        failures (int): количество неудачных запросов подряд до размыкания, 0 - автомат отключен
+        reset (float): время до пробного запроса в секундах
+    """
+
+    def __init__(self, failures: int = CIRCUIT_FAILURES, reset: float = CIRCUIT_RESET) -> None:
+        self.failures = failures
+        self.reset = reset
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial = False
+        self.__lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self.__lock:
+            if self.opened_at is None:
+                return 'closed'
+            return 'half-open' if time.monotonic() - self.opened_at >= self.reset else 'open'
+
+    def before_request(self) -> bool:
+        """
+        Метод проверки перед запросом
+
+        :return: запрос пробный (bool)
+        :raise CircuitOpenError: автомат разомкнут
+        """
+        if self.failures <= 0:
+            return False
+        with self.__lock:
+            if self.opened_at is None:
+                return False
+            if time.monotonic() - self.opened_at < self.reset or self.trial:
+                raise CircuitOpenError('API circuit is open')
+            self.trial = True  # Пробный запрос после паузы
+            return True
+
+    def cancel_trial(self) -> None:
+        """
+        Метод отмены пробного запроса, который не был отправлен на сайт (например, бюджет запросов исчерпан):
+         пробным станет следующий запрос
+        """
+        with self.__lock:
+            self.trial = False
+
+    def record_success(self) -> None:
+        """
+        Метод учета успешного запроса
+        """
+        with self.__lock:
+            self.consecutive_failures, self.opened_at, self.trial = 0, None, False
+
+    def record_failure(self) -> None:
+        """
+        Метод учета неудачного запроса
+        """
+        if self.failures <= 0:
+            return
+        with self.__lock:
+            self.consecutive_failures += 1
+            if self.trial or self.consecutive_failures >= self.failures:
+                self.opened_at, self.trial = time.monotonic(), False
+
+
+def backoff_delays(retries: int = API_RETRIES, base: float = API_BACKOFF,
+                   maximum: float = API_BACKOFF_MAX) -> Iterator[float]:
+    """
+    Генератор пауз между повторами запроса: экспоненциальный рост с "полным разбросом" (случайная пауза от 0 до
+     base * 2 ** номер повтора, но не более maximum), чтобы повторы разных пользователей не совпадали по времени
+
+    :param retries: количество повторов (int)
+    :param base: пауза перед первым повтором в секундах (float)
+    :param maximum: максимальная пауза в секундах (float)
+    :return: итератор пауз в секундах (Iterator)
+    """
+    for attempt in range(retries):
+        yield random.uniform(0, min(maximum, base * 2 ** attempt))
+
+
+def parse_timeouts(value: str) -> Dict[str, float]:
+    """
+    Функция разбора таймаутов чтения ответа по путям запросов из строки вида '/locations/search=5,/properties/list=10'
+
+    :param value: строка настройки (str)
+    :return: словарь путь - таймаут в секундах (Dict)
+    """
+    timeouts = dict()
+    for item in value.split(','):
+        if '=' in item:
+            path, seconds = item.split('=', 1)
+            timeouts[path.strip()] = float(seconds)
+    return timeouts
@@ -0,0 +1,271 @@
+import asyncio
+import functools
+import inspect
+import threading
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+from decouple import config
+
+from bot import metrics
+from bot.quota import QuotaExceeded
+
+SEARCH_FLIGHT = config('SEARCH_FLIGHT', default=True, cast=bool)
+
+Arguments = Dict[str, Any]
+
+
+class _Flight:
+    """
+    Класс - выполняющийся поиск, к которому присоединяются одинаковые поиски
+    """
+    __slots__ = ('quantity', 'event', 'future', 'result', 'error')
+
+    def __init__(self, quantity: int) -> None:
+        self.quantity = quantity
+        self.event = threading.Event()
+        self.future: Optional[asyncio.Future] = None
+        self.result: Optional[Dict] = None
+        self.error: Optional[Exception] = None
+
+
+class SearchFlight:
+    """
+    Класс объединения одновременных одинаковых поисков отелей. Пока выполняется поиск с ключом (вид поиска, город,
+     даты, диапазоны цен и дистанций), поиски с тем же ключом и не большим количеством отелей не выполняются, а
+      ожидают его и получают часть его результата: первые quantity отелей или, для поиска самых дорогих отелей,
+       последние quantity отелей (результат отсортирован по возрастанию цены). Поиск большего количества отелей
+        выполняется отдельно, и к нему присоединяются следующие поиски.
+    Ошибка поиска передается всем ожидающим, кроме QuotaExceeded: бюджет запросов у каждого пользователя свой,
+     поэтому ожидающие выполняют поиск сами. Так же поступают ожидающие, если выполнявший поиск перестал перебирать
+      результаты генератора поиска (например, iter_hotel_search_sort) до конца.
+    Генераторы поиска объединяются с обычными функциями поиска с тем же ключом: выполняющий поиск генератор выдает
+     промежуточные результаты, ожидающие получают только итоговый результат.
+
+    Args:
+        enabled (bool): объединение поисков включено
+    """
+
+    def __init__(self, enabled: bool = SEARCH_FLIGHT) -> None:
+        self.enabled = enabled
+        self.coalesced = 0
+        self.__calls: Dict[Hashable, _Flight] = dict()
+        self.__tasks: Dict[Hashable, _Flight] = dict()
+        self.__lock = threading.Lock()
+
+    def coalesce(self, key: Callable[[Arguments], Hashable],
+                 tail: Optional[Callable[[Arguments], bool]] = None) -> Callable[[Callable], Callable]:
+        """
+        Декоратор объединения одновременных вызовов функции поиска с параметром quantity. Обычные функции и
+         генераторы объединяются между потоками, сопрограммы и асинхронные генераторы - внутри цикла событий.
+
+        :param key: функция построения ключа поиска по словарю аргументов (Callable)
+        :param tail: функция, определяющая по аргументам, что нужны последние отели результата (Callable)
+        :return: декоратор (Callable)
+        """
+        def decorator(function: Callable) -> Callable:
+            if not self.enabled:
+                return function
+            signature = inspect.signature(function)
+
+            def arguments_of(args: tuple, kwargs: Dict[str, Any]) -> Arguments:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                return bound.arguments
+
+            if asyncio.iscoroutinefunction(function):
+                @functools.wraps(function)
+                async def wrapped_async(*args, **kwargs) -> Dict:
+                    arguments = arguments_of(args, kwargs)
+                    return await self.do_async(key(arguments), arguments['quantity'],
+                                               lambda: function(*args, **kwargs),
+                                               tail is not None and tail(arguments))
+
+                return wrapped_async
+
+            if inspect.isasyncgenfunction(function):
+                @functools.wraps(function)
+                async def wrapped_async_generator(*args, **kwargs) -> AsyncIterator[Dict]:
+                    arguments = arguments_of(args, kwargs)
+                    async for result in self.iterate_async(key(arguments), arguments['quantity'],
+                                                           lambda: function(*args, **kwargs),
+                                                           tail is not None and tail(arguments)):
+                        yield result
+
+                return wrapped_async_generator
+
+            if inspect.isgeneratorfunction(function):
+                @functools.wraps(function)
+                def wrapped_generator(*args, **kwargs) -> Iterator[Dict]:
+                    arguments = arguments_of(args, kwargs)
+                    yield from self.iterate(key(arguments), arguments['quantity'], lambda: function(*args, **kwargs),
+                                            tail is not None and tail(arguments))
+
+                return wrapped_generator
+
+            @functools.wraps(function)
+            def wrapped(*args, **kwargs) -> Dict:
+                arguments = arguments_of(args, kwargs)
+                return self.do(key(arguments), arguments['quantity'], lambda: function(*args, **kwargs),
+                               tail is not None and tail(arguments))
+
+            return wrapped
+
+        return decorator
+
+    def do(self, key: Hashable, quantity: int, search: Callable[[], Dict], tail: bool = False) -> Dict:
+        """
+        Метод выполнения поиска с объединением одновременных поисков по ключу
+
+        :param key: ключ поиска (Hashable)
+        :param quantity: количество отелей (int)
+        :param search: функция поиска без аргументов (Callable)
+        :param tail: нужны последние отели результата (bool)
+        :return: словарь с данными отелей (Dict)
+        """
+        flight, leader = self.__join(key, quantity)
+        if not leader:
+            flight.event.wait()
+            if self.__own_search_needed(flight):
+                return search()
+            return self.__slice(flight.result, quantity, tail)
+        try:
+            flight.result = search()
+            return flight.result
+        except Exception as error:
+            flight.error = error
+            raise
+        finally:
+            self.__land(key, flight)
+
+    def iterate(self, key: Hashable, quantity: int, search: Callable[[], Iterator[Dict]],
+                tail: bool = False) -> Iterator[Dict]:
+        """
+        Генератор выполнения поиска-генератора с объединением одновременных поисков по ключу: выполняющий поиск
+         выдает все результаты генератора search, ожидающий - одну часть итогового результата
+
+        :param key: ключ поиска (Hashable)
+        :param quantity: количество отелей (int)
+        :param search: функция без аргументов, возвращающая генератор поиска (Callable)
+        :param tail: нужны последние отели результата (bool)
+        :return: итератор словарей с данными отелей (Iterator)
+        """
+        flight, leader = self.__join(key, quantity)
+        if not leader:
+            flight.event.wait()
+            if self.__own_search_needed(flight):
+                yield from search()
+            else:
+                yield self.__slice(flight.result, quantity, tail)
+            return
+        try:
+            result = dict()
+            for result in search():
+                yield result
+            flight.result = result
+        except Exception as error:
+            flight.error = error
+            raise
+        finally:  # В том числе при закрытии генератора до конца перебора
+            self.__land(key, flight)
+
+    async def do_async(self, key: Hashable, quantity: int, search: Callable[[], Awaitable[Dict]],
+                       tail: bool = False) -> Dict:
+        """
+        Асинхронный вариант метода do
+
+        :param key: ключ поиска (Hashable)
+        :param quantity: количество отелей (int)
+        :param search: сопрограммная функция поиска без аргументов (Callable)
+        :param tail: нужны последние отели результата (bool)
+        :return: словарь с данными отелей (Dict)
+        """
+        flight = self.__tasks.get(key)
+        if flight is None or flight.quantity < quantity:
+            flight = self.__tasks[key] = _Flight(quantity)
+            flight.future = asyncio.ensure_future(search())
+            flight.future.add_done_callback(lambda future: self.__task_done(key, flight))
+            return await asyncio.shield(flight.future)  # Отмена одного поиска не отменяет общий поиск
+        self.coalesced += 1
+        try:
+            result = await asyncio.shield(flight.future)
+        except QuotaExceeded:
+            result = None
+        if result is None:
+            return await search()
+        return self.__slice(result, quantity, tail)
+
+    async def iterate_async(self, key: Hashable, quantity: int, search: Callable[[], AsyncIterator[Dict]],
+                            tail: bool = False) -> AsyncIterator[Dict]:
+        """
+        Асинхронный вариант генератора iterate
+
+        :param key: ключ поиска (Hashable)
+        :param quantity: количество отелей (int)
+        :param search: функция без аргументов, возвращающая асинхронный генератор поиска (Callable)
+        :param tail: нужны последние отели результата (bool)
+        :return: асинхронный итератор словарей с данными отелей (AsyncIterator)
+        """
+        flight = self.__tasks.get(key)
+        if flight is not None and flight.quantity >= quantity:
+            self.coalesced += 1
+            try:
+                result = await asyncio.shield(flight.future)
+            except QuotaExceeded:
+                result = None
+            if result is None:
+                async for result in search():
+                    yield result
+            else:
+                yield self.__slice(result, quantity, tail)
+            return
+        flight = self.__tasks[key] = _Flight(quantity)
+        flight.future = asyncio.get_running_loop().create_future()
+        flight.future.add_done_callback(lambda future: self.__task_done(key, flight))
+        result, completed = None, False
+        try:
+            async for result in search():
+                yield result
+            completed = True
+        except Exception as error:
+            flight.future.set_exception(error)
+            raise
+        finally:  # Если перебор прерван, ожидающие выполняют поиск сами
+            if not flight.future.done():
+                flight.future.set_result(result if completed else None)
+
+    def __join(self, key: Hashable, quantity: int) -> Tuple[_Flight, bool]:
+        with self.__lock:
+            flight = self.__calls.get(key)
+            leader = flight is None or flight.quantity < quantity
+            if leader:
+                flight = self.__calls[key] = _Flight(quantity)
+            else:
+                self.coalesced += 1
+        return flight, leader
+
+    def __land(self, key: Hashable, flight: _Flight) -> None:
+        with self.__lock:
+            if self.__calls.get(key) is flight:
+                del self.__calls[key]
+        flight.event.set()
+
+    @staticmethod
+    def __own_search_needed(flight: _Flight) -> bool:
+        if flight.error is not None and not isinstance(flight.error, QuotaExceeded):
+            raise flight.error
+        return flight.result is None  # Бюджет запросов у каждого пользователя свой, или перебор результатов прерван
+
+    @staticmethod
+    def __slice(result: Dict, quantity: int, tail: bool) -> Dict:
+        metrics.inc('search_coalesced_total')
+        items: List = list(result.items())
+        return dict(items[max(len(items) - quantity, 0):] if tail else items[:quantity])
+
+    def __task_done(self, key: Hashable, flight: _Flight) -> None:
+        if self.__tasks.get(key) is flight:
+            del self.__tasks[key]
+        if not flight.future.cancelled():
+            flight.future.exception()  # Ошибка получена, даже если все ожидающие поиски отменены
+
+
+search_flight = SearchFlight()
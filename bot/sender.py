@@ -0,0 +1,325 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import telebot
+from decouple import config
+
+from bot import metrics
+from bot.rate_limit import TokenBucket
+from bot.render import MESSAGE_LIMIT
+
+SEND_WORKERS = config('SEND_WORKERS', default=4, cast=int)
+SEND_RATE = config('SEND_RATE', default=30.0, cast=float)
+SEND_BURST = config('SEND_BURST', default=30, cast=int)
+CHAT_SEND_RATE = config('CHAT_SEND_RATE', default=1.0, cast=float)
+CHAT_SEND_BURST = config('CHAT_SEND_BURST', default=3, cast=int)
+SEND_RETRIES = config('SEND_RETRIES', default=3, cast=int)
+
+# Параметры send_message, при которых соседние сообщения одного чата можно склеить в одно
+_COALESCE_KEYS = frozenset(('chat_id', 'text', 'parse_mode'))
+
+
+class _Outgoing:
+    """
+    Класс - запрос к Bot API в очереди отправки
+    """
+    __slots__ = ('method', 'kwargs', 'future', 'enqueued', 'attempts')
+
+    def __init__(self, method: str, kwargs: Dict[str, Any]) -> None:
+        self.method = method
+        self.kwargs = kwargs
+        self.future: Future = Future()
+        self.enqueued = time.monotonic()
+        self.attempts = 0
+
+
+class _Chat:
+    """
+    Класс - состояние очереди одного чата
+    """
+    __slots__ = ('messages', 'bucket', 'busy', 'idle_since')
+
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.messages: Deque[_Outgoing] = deque()
+        self.bucket = TokenBucket(rate, capacity)
+        self.busy = False  # Чат запланирован к отправке или отправляется одним из потоков
+        self.idle_since = 0.0
+
+
+class OutboundQueue:
+    """
+    Класс - общая очередь исходящих запросов к Bot API телеграмма. Обработчики ставят запрос в очередь и сразу
+     продолжают работу, а отправку выполняют потоки очереди с соблюдением ограничений телеграмма:
+        - общее ведро токенов ограничивает частоту запросов всего бота;
+        - ведро токенов каждого чата ограничивает частоту сообщений в один чат;
+        - при ответе 429 чат откладывается на время retry_after из ответа, после чего запрос повторяется;
+        - идущие подряд простые текстовые сообщения одного чата (без клавиатуры) склеиваются в одно сообщение, если
+         суммарная длина не превышает ограничение телеграмма;
+        - из идущих подряд изменений текста одного сообщения (например, промежуточных результатов поиска)
+         отправляется только последнее.
+    Запросы одного чата отправляются строго по порядку: в каждый момент чат обрабатывается не более чем одним потоком.
+
+    Args:
+        bot (telebot.TeleBot): бот телеграмма, через который выполняются запросы
+        workers (int): количество потоков отправки
+        rate (float): общая частота запросов в секунду
+        burst (int): размер общей пачки запросов
+        chat_rate (float): частота сообщений в один чат в секунду
+        chat_burst (int): размер пачки сообщений в один чат
+        retries (int): максимальное количество повторов запроса после ответа 429
+    """
+
+    def __init__(self, bot: telebot.TeleBot, workers: int = SEND_WORKERS, rate: float = SEND_RATE,
+                 burst: int = SEND_BURST, chat_rate: float = CHAT_SEND_RATE, chat_burst: int = CHAT_SEND_BURST,
+                 retries: int = SEND_RETRIES) -> None:
+        self.bot = bot
+        self.chat_rate, self.chat_burst, self.retries = chat_rate, chat_burst, retries
+        self.submitted, self.sent, self.requests, self.coalesced, self.throttled, self.failed = 0, 0, 0, 0, 0, 0
+        self.latency_total, self.latency_max = 0.0, 0.0
+        self.__pending = 0
+        self.__bucket = TokenBucket(rate, burst)
+        self.__chats: Dict[Any, _Chat] = dict()
+        self.__schedule: List[Tuple[float, int, Any]] = list()  # Куча из (время готовности, номер, id чата)
+        self.__idle: Deque[Tuple[float, Any]] = deque()
+        self.__counter = itertools.count()
+        self.__ready = threading.Condition()
+        self.__stopping = False
+        self.__threads = [threading.Thread(target=self.__work, daemon=True, name=f'sender_{number}')
+                          for number in range(max(workers, 1))]
+        for thread in self.__threads:
+            thread.start()
+
+    def submit(self, method: str, **kwargs) -> Future:
+        """
+        Метод постановки запроса в очередь чата, указанного в аргументе chat_id
+
+        :param method: наименование метода telebot.TeleBot, например, 'send_message' (str)
+        :param kwargs: именованные аргументы метода
+        :return: объект Future, в который будет записан результат запроса (Future)
+        """
+        outgoing = _Outgoing(method, kwargs)
+        chat_id = kwargs.get('chat_id')
+        with self.__ready:
+            now = time.monotonic()
+            self.__sweep(now)
+            chat = self.__chats.get(chat_id)
+            if chat is None:
+                chat = self.__chats[chat_id] = _Chat(self.chat_rate, self.chat_burst)
+            chat.messages.append(outgoing)
+            self.submitted += 1
+            self.__pending += 1
+            if not chat.busy:
+                chat.busy = True
+                self.__push(now + chat.bucket.delay(now), chat_id)
+        return outgoing.future
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Метод получения метрик очереди: глубины очереди, количества запросов и задержки отправки (время от постановки
+         в очередь до ответа телеграмма)
+
+        :return: словарь метрик (Dict)
+        """
+        with self.__ready:
+            return {'queue_depth': self.__pending, 'chats': len(self.__chats), 'submitted': self.submitted,
+                    'sent': self.sent, 'requests': self.requests, 'coalesced': self.coalesced,
+                    'throttled': self.throttled, 'failed': self.failed,
+                    'latency_avg': self.latency_total / self.sent if self.sent else 0.0,
+                    'latency_max': self.latency_max}
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Метод остановки потоков после отправки уже поставленных в очередь запросов
+
+        :param timeout: максимальное время ожидания завершения каждого потока в секундах (float)
+        """
+        with self.__ready:
+            self.__stopping = True
+            self.__ready.notify_all()
+        for thread in self.__threads:
+            thread.join(timeout)
+
+    def __push(self, ready_time: float, chat_id: Any) -> None:
+        heapq.heappush(self.__schedule, (ready_time, next(self.__counter), chat_id))
+        self.__ready.notify()
+
+    def __sweep(self, now: float) -> None:
+        # Чат, простоявший без сообщений дольше времени полного пополнения ведра, удаляется без потери ограничения
+        refill = self.chat_burst / self.chat_rate
+        while self.__idle and self.__idle[0][0] + refill <= now:
+            idle_since, chat_id = self.__idle.popleft()
+            chat = self.__chats.get(chat_id)
+            if chat is not None and not chat.busy and chat.idle_since == idle_since:
+                del self.__chats[chat_id]
+
+    def __next_chat(self) -> Optional[Any]:
+        with self.__ready:
+            while True:
+                if self.__schedule:
+                    ready_time = self.__schedule[0][0]
+                    now = time.monotonic()
+                    if ready_time <= now:
+                        return heapq.heappop(self.__schedule)[2]
+                    self.__ready.wait(ready_time - now)
+                elif self.__stopping and self.__pending == 0:
+                    self.__ready.notify_all()
+                    return None
+                else:
+                    self.__ready.wait()
+
+    def __take_batch(self, chat: _Chat) -> List[_Outgoing]:
+        batch = [chat.messages.popleft()]
+        first = batch[0]
+        if first.method == 'edit_message_text':
+            while (chat.messages and chat.messages[0].method == 'edit_message_text' and
+                   chat.messages[0].kwargs.get('message_id') == first.kwargs.get('message_id')):
+                batch.append(chat.messages.popleft())
+            return batch
+        if first.method != 'send_message' or not _COALESCE_KEYS.issuperset(first.kwargs):
+            return batch
+        length = len(first.kwargs['text'])
+        while chat.messages:
+            following = chat.messages[0]
+            if (following.method != 'send_message' or not _COALESCE_KEYS.issuperset(following.kwargs) or
+                    following.kwargs.get('parse_mode') != first.kwargs.get('parse_mode') or
+                    length + 1 + len(following.kwargs['text']) > MESSAGE_LIMIT):
+                break
+            length += 1 + len(following.kwargs['text'])
+            batch.append(chat.messages.popleft())
+        return batch
+
+    def __work(self) -> None:
+        while True:
+            chat_id = self.__next_chat()
+            if chat_id is None:
+                break
+            with self.__ready:
+                chat = self.__chats[chat_id]
+                batch = self.__take_batch(chat)
+                now = time.monotonic()
+                chat.bucket.take(now)
+                wait = self.__bucket.take(now)
+            if wait > 0:
+                time.sleep(wait)
+            retry_after = self.__send(batch)
+            with self.__ready:
+                now = time.monotonic()
+                if retry_after:
+                    chat.messages.extendleft(reversed(batch))
+                    self.__push(now + retry_after, chat_id)
+                elif chat.messages:
+                    self.__push(now + chat.bucket.delay(now), chat_id)
+                else:
+                    chat.busy = False
+                    chat.idle_since = now
+                    self.__idle.append((now, chat_id))
+                if self.__stopping:
+                    self.__ready.notify_all()
+
+    def __send(self, batch: List[_Outgoing]) -> float:
+        first = batch[0]
+        kwargs = first.kwargs
+        if first.method == 'edit_message_text':  # Промежуточные изменения сообщения заменены последним
+            kwargs = batch[-1].kwargs
+        elif len(batch) > 1:
+            kwargs = dict(kwargs, text='\n'.join(outgoing.kwargs['text'] for outgoing in batch))
+        try:
+            with metrics.timer('telegram_request_seconds', method=first.method):
+                result = getattr(self.bot, first.method)(**kwargs)
+        except telebot.apihelper.ApiTelegramException as error_message:
+            retry_after = (error_message.result_json.get('parameters') or dict()).get('retry_after')
+            if error_message.error_code == 429 and first.attempts < self.retries:
+                with self.__ready:
+                    self.requests += 1
+                    self.throttled += 1
+                for outgoing in batch:
+                    outgoing.attempts += 1
+                metrics.inc('telegram_retries_total', method=first.method)
+                return float(retry_after or 1)
+            self.__finish(batch, error=error_message)
+        except Exception as error_message:
+            self.__finish(batch, error=error_message)
+        else:
+            self.__finish(batch, result=result)
+        return 0.0
+
+    def __finish(self, batch: List[_Outgoing], result: Any = None, error: Optional[Exception] = None) -> None:
+        now = time.monotonic()
+        with self.__ready:
+            self.requests += 1
+            self.__pending -= len(batch)
+            if error is None:
+                self.sent += len(batch)
+                self.coalesced += len(batch) - 1
+                for outgoing in batch:
+                    latency = now - outgoing.enqueued
+                    self.latency_total += latency
+                    self.latency_max = max(self.latency_max, latency)
+            else:
+                self.failed += len(batch)
+        metrics.inc('telegram_messages_total', len(batch), method=batch[0].method,
+                    result='sent' if error is None else 'failed')
+        if error is None:
+            for outgoing in batch:
+                outgoing.future.set_result(result)
+        else:
+            logging.error(f'Telegram request {batch[0].method} failed: {error}')
+            for outgoing in batch:
+                outgoing.future.set_exception(error)
+
+
+class QueuedBot:
+    """
+    Класс - обертка бота телеграмма, отправляющая сообщения и изменения сообщений через очередь OutboundQueue.
+     Методы send_message, edit_message_text и edit_message_reply_markup ставят запрос в очередь и сразу возвращают
+      объект Future, остальные атрибуты (обработчики, register_next_step_handler, polling и т.д.) берутся у бота.
+
+    Args:
+        bot (telebot.TeleBot): бот телеграмма
+        outbox (OutboundQueue): очередь исходящих запросов
+    """
+
+    def __init__(self, bot: telebot.TeleBot, outbox: OutboundQueue) -> None:
+        self.bot = bot
+        self.outbox = outbox
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.bot, name)
+
+    def send_message(self, chat_id: int, text: str, **kwargs) -> Future:
+        """
+        Метод постановки сообщения в очередь отправки
+
+        :param chat_id: id чата (int)
+        :param text: текст сообщения (str)
+        :param kwargs: остальные параметры telebot.TeleBot.send_message
+        :return: объект Future с отправленным сообщением (Future)
+        """
+        return self.outbox.submit('send_message', chat_id=chat_id, text=text, **kwargs)
+
+    def edit_message_text(self, text: str, chat_id: Optional[int] = None, **kwargs) -> Future:
+        """
+        Метод постановки изменения текста сообщения в очередь отправки
+
+        :param text: новый текст сообщения (str)
+        :param chat_id: id чата (int)
+        :param kwargs: остальные параметры telebot.TeleBot.edit_message_text
+        :return: объект Future с измененным сообщением (Future)
+        """
+        return self.outbox.submit('edit_message_text', text=text, chat_id=chat_id, **kwargs)
+
+    def edit_message_reply_markup(self, chat_id: Optional[int] = None, **kwargs) -> Future:
+        """
+        Метод постановки изменения клавиатуры сообщения в очередь отправки
+
+        :param chat_id: id чата (int)
+        :param kwargs: остальные параметры telebot.TeleBot.edit_message_reply_markup
+        :return: объект Future с измененным сообщением (Future)
+        """
+        return self.outbox.submit('edit_message_reply_markup', chat_id=chat_id, **kwargs)
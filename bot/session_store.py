@@ -0,0 +1,209 @@
+import functools
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Optional
+
+from decouple import config
+
+from bot.cache import TTLCache
+from bot.user import USER_FIELDS, SearchMode, User
+
+SESSION_BACKEND = config('SESSION_BACKEND', default='memory')
+SESSION_DB = config('SESSION_DB', default='sessions.sqlite3')
+SESSION_IDLE_TIMEOUT = config('SESSION_IDLE_TIMEOUT', default=24 * 60 * 60, cast=float)
+SESSION_CACHE_SIZE = config('SESSION_CACHE_SIZE', default=100000, cast=int)
+
+SESSION_FIELDS = USER_FIELDS
+
+
+class SessionStore(ABC):
+    """
+    Абстрактный базовый класс хранилища сессий пользователей. Ключ сессии - id пользователя в телеграмме в виде строки,
+     значение - экземпляр класса User. Интерфейс повторяет используемую часть словаря (get и присваивание по ключу),
+      поэтому функция get_user и обработчики работают с любым хранилищем.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[User]:
+        """
+        Метод получения сессии пользователя
+
+        :param key: id пользователя (str)
+        :return: экземпляр класса User или None при отсутствии действующей сессии
+        """
+
+    @abstractmethod
+    def __setitem__(self, key: str, user: User) -> None:
+        """
+        Метод сохранения сессии пользователя
+
+        :param key: id пользователя (str)
+        :param user: экземпляр класса User
+        """
+
+    def flush(self) -> None:
+        """
+        Метод сохранения измененных полей сессий, полученных после предыдущего вызова flush
+        """
+
+    def write_back(self, handler: Callable) -> Callable:
+        """
+        Декоратор обработчика, сохраняющий изменения сессий после выполнения обработчика
+
+        :param handler: обработчик сообщений бота
+        :return: wrapped_handler
+        """
+
+        @functools.wraps(handler)
+        def wrapped_handler(*args, **kwargs) -> Any:
+            try:
+                return handler(*args, **kwargs)
+            finally:
+                self.flush()
+
+        return wrapped_handler
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Класс - хранилище сессий в памяти с ограничением количества сессий (LRU) и удалением сессий, простаивающих
+     дольше idle_timeout секунд.
+
+    Args:
+        maxsize (int): максимальное количество сессий
+        idle_timeout (float): время простоя сессии в секундах, после которого она удаляется
+    """
+
+    def __init__(self, maxsize: int = SESSION_CACHE_SIZE, idle_timeout: float = SESSION_IDLE_TIMEOUT) -> None:
+        self.sessions = TTLCache(maxsize=maxsize, ttl=idle_timeout, sliding=True)
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def get(self, key: str) -> Optional[User]:
+        return self.sessions.get(key)
+
+    def __setitem__(self, key: str, user: User) -> None:
+        self.sessions.set(key, user)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Класс - хранилище сессий в базе данных SQLite, сохраняющее сессии между перезапусками бота.
+    Сессия загружается из базы данных при первом обращении и далее хранится в памяти (LRU с ограничением времени
+     простоя). Метод flush записывает в базу данных только измененные поля сессий, полученных текущим потоком после
+      предыдущего вызова flush, и время последнего обращения всех этих сессий, в том числе не изменившихся. Сессии,
+       к которым не обращались дольше idle_timeout секунд, считаются отсутствующими и удаляются.
+
+    Args:
+        path (str): путь к файлу базы данных
+        maxsize (int): максимальное количество сессий в памяти
+        idle_timeout (float): время простоя сессии в секундах, после которого она удаляется
+    """
+
+    def __init__(self, path: str = SESSION_DB, maxsize: int = SESSION_CACHE_SIZE,
+                 idle_timeout: float = SESSION_IDLE_TIMEOUT) -> None:
+        self.idle_timeout = idle_timeout
+        self.sessions = TTLCache(maxsize=maxsize, ttl=idle_timeout, sliding=True)
+        self.__lock = threading.RLock()
+        self.__touched = threading.local()
+        self.__connection = sqlite3.connect(path, check_same_thread=False)
+        with self.__lock, self.__connection:
+            self.__connection.execute('CREATE TABLE IF NOT EXISTS sessions (user_id TEXT PRIMARY KEY, '
+                                      'flag_search INTEGER, current_city_id TEXT, message_id INTEGER, '
+                                      'minimum_price INTEGER, maximum_price INTEGER, minimum_distance REAL, '
+                                      'maximum_distance REAL, result_cities TEXT, last_seen REAL NOT NULL)')
+        self.purge()
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def get(self, key: str) -> Optional[User]:
+        user = self.sessions.get(key)
+        if user is None:
+            user = self.__load(key)
+            if user is not None:
+                self.sessions.set(key, user)
+        if user is not None:
+            self.__touch(user)
+        return user
+
+    def __setitem__(self, key: str, user: User) -> None:
+        user.clear_changes()
+        values = [self.__column_value(user, field) for field in SESSION_FIELDS]
+        with self.__lock, self.__connection:
+            self.__connection.execute(f'INSERT OR REPLACE INTO sessions (user_id, {", ".join(SESSION_FIELDS)}, '
+                                      f'last_seen) VALUES ({", ".join("?" * (len(SESSION_FIELDS) + 2))})',
+                                      (key, *values, time.time()))
+        self.sessions.set(key, user)
+        self.__touch(user)
+
+    def flush(self) -> None:
+        touched_users = getattr(self.__touched, 'users', None)
+        if not touched_users:
+            return
+        self.__touched.users = list()
+        now = time.time()
+        unchanged_users = list()
+        with self.__lock, self.__connection:
+            for user in {id(user): user for user in touched_users}.values():
+                changed_fields = [field for field in SESSION_FIELDS if field in user.changed_fields]
+                if not changed_fields:  # Сессия только прочитана: обновляется лишь время последнего обращения
+                    unchanged_users.append((now, str(user.user_id)))
+                    continue
+                user.clear_changes()
+                assignments = ''.join(f'{field} = ?, ' for field in changed_fields)
+                self.__connection.execute(f'UPDATE sessions SET {assignments}last_seen = ? WHERE user_id = ?',
+                                          (*[self.__column_value(user, field) for field in changed_fields],
+                                           now, str(user.user_id)))
+            self.__connection.executemany('UPDATE sessions SET last_seen = ? WHERE user_id = ?', unchanged_users)
+
+    def purge(self) -> None:
+        """
+        Метод удаления из базы данных сессий, простаивающих дольше idle_timeout секунд
+        """
+        with self.__lock, self.__connection:
+            self.__connection.execute('DELETE FROM sessions WHERE last_seen < ?', (time.time() - self.idle_timeout,))
+
+    def __touch(self, user: User) -> None:
+        touched_users = getattr(self.__touched, 'users', None)
+        if touched_users is None:
+            touched_users = self.__touched.users = list()
+        touched_users.append(user)
+
+    def __load(self, key: str) -> Optional[User]:
+        with self.__lock:
+            row = self.__connection.execute(f'SELECT {", ".join(SESSION_FIELDS)}, last_seen FROM sessions '
+                                            f'WHERE user_id = ?', (key,)).fetchone()
+        if row is None or row[-1] < time.time() - self.idle_timeout:
+            return None
+        user = User(int(key))
+        for field, value in zip(SESSION_FIELDS, row):
+            if field == 'result_cities':
+                value = json.loads(value)
+            elif field == 'flag_search' and isinstance(value, str):  # Сессии, сохраненные до появления SearchMode
+                value = SearchMode[value]
+            setattr(user, field, value)
+        user.clear_changes()
+        return user
+
+    @staticmethod
+    def __column_value(user: User, field: str) -> Any:
+        value = getattr(user, field)
+        if field == 'result_cities':
+            return json.dumps(value, ensure_ascii=False)
+        return int(value) if field == 'flag_search' else value
+
+
+def create_session_store() -> SessionStore:
+    """
+    Функция создания хранилища сессий в соответствии с настройкой SESSION_BACKEND ('memory' или 'sqlite')
+
+    :return: хранилище сессий (SessionStore)
+    """
+    if SESSION_BACKEND == 'sqlite':
+        return SQLiteSessionStore()
+    return MemorySessionStore()
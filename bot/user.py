@@ -1,43 +1,83 @@
-from typing import Dict
+import json
+import struct
+from enum import IntEnum
+from typing import Dict, Set
+
+
+class SearchMode(IntEnum):
+    """
+    Вид поиска, выбранный пользователем
+    """
+    NOT_CHOSEN = 0
+    LOW_PRICE = 1
+    HIGH_PRICE = 2
+    BEST_DEAL = 3
+
+
+# Порядок полей определяет биты маски измененных полей
+USER_FIELDS = ('flag_search', 'current_city_id', 'message_id', 'minimum_price', 'maximum_price',
+               'minimum_distance', 'maximum_distance', 'result_cities')
+_FIELD_BITS = {field: 1 << number for number, field in enumerate(USER_FIELDS)}
+# user_id, flag_search, message_id, minimum_price, maximum_price, minimum_distance, maximum_distance, длина id города
+_HEADER = struct.Struct('<qBqqqddH')
 
 
 class User:
     """
-    Класс - "User" (пользователь), обеспечивающий хранение данных пользователя в ходе выполнения поиска
+    Класс - "User" (пользователь), обеспечивающий хранение данных пользователя в ходе выполнения поиска.
+    Экземпляры класса не имеют __dict__ (используются __slots__), вид поиска хранится в виде SearchMode, а изменения
+     полей отмечаются битовой маской, поэтому сессия занимает минимум памяти и быстро сериализуется методом to_bytes.
 
     Args:
          user_id (int): идентификационный номер пользователя
     Arguments:
-        self.flag_search (bool): флаг информирующий о том, что какой вид поиска был выбрал пользователем, либо о том,
-         что выбор еще не осуществлен. Возможные значения аргумента:
-              'NOT_CHOSEN' - выбор еше не осуществлен (значение по умолчанию)
-              'LOW_PRICE' - выбран поиск наиболее бюджетных отелей в выбранном городе
-              'HIGH_PRICE' - выбран поиск наиболее дорогих отелей в выбранном городе
-              'BEST_DEAL' - выбран поиск отелей, наиболее подходящих по цене и расположению от центра (наиболее
-                            дешёвые и расположены ближе всего к центру)
+        self.flag_search (SearchMode): флаг информирующий о том, что какой вид поиска был выбрал пользователем, либо
+         о том, что выбор еще не осуществлен. Возможные значения аргумента:
+              SearchMode.NOT_CHOSEN - выбор еше не осуществлен (значение по умолчанию)
+              SearchMode.LOW_PRICE - выбран поиск наиболее бюджетных отелей в выбранном городе
+              SearchMode.HIGH_PRICE - выбран поиск наиболее дорогих отелей в выбранном городе
+              SearchMode.BEST_DEAL - выбран поиск отелей, наиболее подходящих по цене и расположению от центра
+                                     (наиболее дешёвые и расположены ближе всего к центру)
         self.current_city_id (str) - идентификационный номер города, в котором будет осуществляться поиск отелей. Данный
                                     номер передается с API сайта hotels.com
         self.result_cities (Dict) - словарь, в котором ключи - идентификационные номера городов, значения ключей -
                                     наименования городов и их расположение
-        self.minimum_price (float) - минимальная стоимость, необходимая для снятия номера на ночь в рублях
-        self.maximum_price (float) - максимальная стоимость, необходимая для снятия номера на ночь в рублях
+        self.minimum_price (int) - минимальная стоимость, необходимая для снятия номера на ночь в рублях
+        self.maximum_price (int) - максимальная стоимость, необходимая для снятия номера на ночь в рублях
         self.minimum_distance (float) - минимальная дистанция от центра до отеля в километрах
         self.maximum_distance (float) - максимальная дистанция от центра до отеля в километрах
+        self.changed_fields (Set[str]) - имена полей, измененных после последнего сохранения в хранилище сессий
     """
 
+    __slots__ = ('__user_id', '__flag_search', '__current_city_id', '__message_id', '__minimum_price',
+                 '__maximum_price', '__minimum_distance', '__maximum_distance', '__result_cities', '__changed')
+
     def __init__(self, user_id: int) -> None:
         self.__user_id = user_id
-        self.__flag_search, self.__current_city_id, self.__message_id = 'NOT_CHOSEN', '', 0
-        self.__minimum_price, self.__maximum_price, self.__minimum_distance, self.__maximum_distance = 0, 0, 0, 0
-        self.__result_cities = dict()
+        self.__flag_search, self.__current_city_id, self.__message_id = SearchMode.NOT_CHOSEN, '', 0
+        self.__minimum_price, self.__maximum_price, self.__minimum_distance, self.__maximum_distance = 0, 0, 0.0, 0.0
+        self.__result_cities = None  # Словарь создается только после поиска городов
+        self.__changed = 0
 
     @property
-    def flag_search(self) -> str:
+    def user_id(self) -> int:
+        return self.__user_id
+
+    @property
+    def changed_fields(self) -> Set[str]:
+        return {field for field, bit in _FIELD_BITS.items() if self.__changed & bit}
+
+    def clear_changes(self) -> None:
+        self.__changed = 0
+
+    @property
+    def flag_search(self) -> SearchMode:
         return self.__flag_search
 
     @flag_search.setter
-    def flag_search(self, value: str) -> None:
-        self.__flag_search = value
+    def flag_search(self, value: SearchMode) -> None:
+        self.__flag_search = SearchMode(value)
+        self.__changed |= 1
 
     @property
     def current_city_id(self) -> str:
@@ -46,22 +86,34 @@ class User:
     @current_city_id.setter
     def current_city_id(self, value: str) -> None:
         self.__current_city_id = value
+        self.__changed |= 2
+
+    @property
+    def message_id(self) -> int:
+        return self.__message_id
+
+    @message_id.setter
+    def message_id(self, value: int) -> None:
+        self.__message_id = value
+        self.__changed |= 4
 
     @property
-    def minimum_price(self) -> float:
+    def minimum_price(self) -> int:
         return self.__minimum_price
 
     @minimum_price.setter
-    def minimum_price(self, value: float) -> None:
+    def minimum_price(self, value: int) -> None:
         self.__minimum_price = value
+        self.__changed |= 8
 
     @property
-    def maximum_price(self) -> float:
+    def maximum_price(self) -> int:
         return self.__maximum_price
 
     @maximum_price.setter
-    def maximum_price(self, value: float) -> None:
+    def maximum_price(self, value: int) -> None:
         self.__maximum_price = value
+        self.__changed |= 16
 
     @property
     def minimum_distance(self) -> float:
@@ -70,6 +122,7 @@ class User:
     @minimum_distance.setter
     def minimum_distance(self, value: float) -> None:
         self.__minimum_distance = value
+        self.__changed |= 32
 
     @property
     def maximum_distance(self) -> float:
@@ -78,19 +131,46 @@ class User:
     @maximum_distance.setter
     def maximum_distance(self, value: float) -> None:
         self.__maximum_distance = value
+        self.__changed |= 64
 
     @property
     def result_cities(self) -> Dict:
-        return self.__result_cities
+        return self.__result_cities or dict()
 
     @result_cities.setter
     def result_cities(self, value: Dict) -> None:
-        self.__result_cities = value
-
-    @property
-    def message_id(self) -> int:
-        return self.__message_id
-
-    @message_id.setter
-    def message_id(self, value: int) -> None:
-        self.__message_id = value
+        self.__result_cities = value or None
+        self.__changed |= 128
+
+    def to_bytes(self) -> bytes:
+        """
+        Метод сериализации сессии: числовые поля упаковываются модулем struct, за ними следуют id города и словарь
+         найденных городов в виде JSON
+
+        :return: сериализованная сессия (bytes)
+        """
+        city_id = str(self.__current_city_id).encode('utf-8')
+        header = _HEADER.pack(self.__user_id, self.__flag_search, self.__message_id, int(self.__minimum_price),
+                              int(self.__maximum_price), self.__minimum_distance, self.__maximum_distance,
+                              len(city_id))
+        cities = json.dumps(self.__result_cities, ensure_ascii=False).encode('utf-8') if self.__result_cities else b''
+        return header + city_id + cities
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'User':
+        """
+        Метод восстановления сессии из результата метода to_bytes
+
+        :param data: сериализованная сессия (bytes)
+        :return: экземпляр класса User без отметок об изменениях
+        """
+        (user_id, flag_search, message_id, minimum_price, maximum_price, minimum_distance, maximum_distance,
+         city_id_length) = _HEADER.unpack_from(data)
+        user = cls(user_id)
+        user.__flag_search, user.__message_id = SearchMode(flag_search), message_id
+        user.__minimum_price, user.__maximum_price = minimum_price, maximum_price
+        user.__minimum_distance, user.__maximum_distance = minimum_distance, maximum_distance
+        offset = _HEADER.size + city_id_length
+        user.__current_city_id = data[_HEADER.size:offset].decode('utf-8')
+        user.__result_cities = json.loads(data[offset:]) if len(data) > offset else None
+        return user
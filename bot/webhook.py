@@ -0,0 +1,167 @@
+import hmac
+import json
+import logging
+import signal
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+import requests
+import telebot
+from decouple import config
+
+WEBHOOK_HOST = config('WEBHOOK_HOST', default='0.0.0.0')
+WEBHOOK_PORT = config('WEBHOOK_PORT', default=8443, cast=int)
+WEBHOOK_PATH = config('WEBHOOK_PATH', default='/telegram')
+WEBHOOK_SECRET = config('WEBHOOK_SECRET', default='')
+WEBHOOK_URL = config('WEBHOOK_URL', default='')
+WEBHOOK_CONCURRENCY = config('WEBHOOK_CONCURRENCY', default=16, cast=int)
+WEBHOOK_DRAIN_TIMEOUT = config('WEBHOOK_DRAIN_TIMEOUT', default=30.0, cast=float)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+class WebhookServer:
+    """
+    Класс - HTTP-сервер приема обновлений телеграмма в режиме webhook. Каждый POST-запрос с JSON обновления
+     проверяется по секретному токену и передается в bot.process_new_updates, т.е. в те же обработчики, что и при
+      опросе сервера (start, get_text_messages, callback_worker и т.д.).
+    Одновременно обрабатывается не более concurrency обновлений, остальные получают ответ 503, и телеграмм повторяет
+     их доставку. При остановке сервер перестает принимать запросы и дожидается обработки уже принятых обновлений.
+
+    Args:
+        bot (telebot.TeleBot): бот телеграмма
+        host (str): адрес, на котором принимаются запросы
+        port (int): порт
+        path (str): путь, на который телеграмм отправляет обновления
+        secret (str): секретный токен; пустая строка - проверка отключена
+        concurrency (int): максимальное количество одновременно обрабатываемых обновлений
+    """
+
+    def __init__(self, bot: telebot.TeleBot, host: str = WEBHOOK_HOST, port: int = WEBHOOK_PORT,
+                 path: str = WEBHOOK_PATH, secret: str = WEBHOOK_SECRET,
+                 concurrency: int = WEBHOOK_CONCURRENCY) -> None:
+        self.bot = bot
+        self.path = path
+        self.secret = secret
+        self.accepted, self.rejected, self.in_flight = 0, 0, 0
+        self.__slots = threading.BoundedSemaphore(concurrency)
+        self.__idle = threading.Condition()
+        self.__draining = False
+        self.httpd = ThreadingHTTPServer((host, port), self.__handler_class())
+        self.httpd.daemon_threads = True
+
+    def serve_forever(self) -> None:
+        """
+        Метод приема запросов до вызова метода shutdown
+        """
+        self.httpd.serve_forever()
+
+    def shutdown(self, timeout: float = WEBHOOK_DRAIN_TIMEOUT) -> None:
+        """
+        Метод остановки сервера: новые обновления больше не принимаются, уже принятые обрабатываются до конца
+
+        :param timeout: максимальное время ожидания обработки принятых обновлений в секундах (float)
+        """
+        self.__draining = True
+        self.httpd.shutdown()
+        with self.__idle:
+            self.__idle.wait_for(lambda: self.in_flight == 0, timeout)
+        self.httpd.server_close()
+        dispatcher = getattr(self.bot, 'dispatcher', None)
+        if dispatcher is not None:
+            dispatcher.stop(timeout)
+        outbox = getattr(self.bot, 'outbox', None)
+        if outbox is not None:  # Ответы, поставленные обработчиками в очередь, отправляются до завершения
+            outbox.stop(timeout)
+
+    def process(self, body: bytes, secret: str) -> int:
+        """
+        Метод обработки одного запроса телеграмма
+
+        :param body: тело запроса (bytes)
+        :param secret: значение заголовка с секретным токеном (str)
+        :return: HTTP-код ответа (int)
+        """
+        if self.secret and not hmac.compare_digest(secret.encode('utf-8'), self.secret.encode('utf-8')):
+            return 403
+        try:
+            update = telebot.types.Update.de_json(json.loads(body))
+        except (ValueError, KeyError, TypeError):
+            return 400
+        if self.__draining or not self.__slots.acquire(blocking=False):
+            with self.__idle:
+                self.rejected += 1
+            return 503
+        with self.__idle:
+            self.in_flight += 1
+            self.accepted += 1
+        try:
+            self.bot.process_new_updates([update])
+        except Exception as error_message:
+            logging.exception(error_message)
+        finally:
+            self.__slots.release()
+            with self.__idle:
+                self.in_flight -= 1
+                self.__idle.notify_all()
+        return 200
+
+    def __handler_class(self) -> Any:
+        server = self
+
+        class WebhookHandler(BaseHTTPRequestHandler):
+
+            def do_POST(self) -> None:
+                if self.path != server.path:
+                    status = 404
+                else:
+                    body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                    status = server.process(body, self.headers.get(SECRET_HEADER, ''))
+                self.send_response(status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        return WebhookHandler
+
+
+def set_webhook(bot: telebot.TeleBot, url: str = WEBHOOK_URL, secret: str = WEBHOOK_SECRET,
+                max_connections: int = WEBHOOK_CONCURRENCY) -> None:
+    """
+    Функция регистрации адреса webhook и секретного токена на сервере телеграмма
+
+    :param bot: бот телеграмма
+    :param url: внешний адрес сервера, включая путь (str)
+    :param secret: секретный токен (str)
+    :param max_connections: максимальное количество одновременных соединений от телеграмма (int)
+    """
+    params = {'url': url, 'max_connections': max_connections}
+    if secret:
+        params['secret_token'] = secret
+    response = requests.post(telebot.apihelper.API_URL.format(bot.token, 'setWebhook'), data=params, timeout=30)
+    response.raise_for_status()
+
+
+def run_webhook(bot: telebot.TeleBot) -> None:
+    """
+    Функция запуска бота в режиме webhook. Сервер работает до получения сигнала SIGINT или SIGTERM, после чего
+     дожидается обработки принятых обновлений.
+
+    :param bot: бот телеграмма
+    """
+    if WEBHOOK_URL:
+        set_webhook(bot)
+    server = WebhookServer(bot)
+    stopping = threading.Thread(target=server.shutdown, daemon=True)
+
+    def stop(*args) -> None:
+        if stopping.ident is None:  # Повторный сигнал во время остановки игнорируется
+            stopping.start()
+
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signal_number, stop)
+    server.serve_forever()
+    stopping.join()
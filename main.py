@@ -1,30 +1,62 @@
 import logging
+import math
+from typing import Dict, Iterator, List
 import telebot
 from decouple import config
 from telebot import types
-from bot.bestdeal import hotel_search_range
+from bot import metrics
+from bot.bestdeal import hotel_search_range, iter_hotel_search_range
+from bot.dispatcher import DISPATCH_WORKERS, ChatDispatcher, DispatchingTeleBot
 from bot.function import at_first, after_failure, get_user, user_logging, checking_numbers
 from bot.locations_search import city_search
-from bot.low_high_price import hotel_search_sort
-from bot.user import User
+from bot.log_pipeline import setup_logging
+from bot.low_high_price import hotel_search_sort, iter_hotel_search_sort
+from bot.normalize import city_normalizer
+from bot.prewarm import PREWARM_TOP, Prewarmer, popularity
+from bot.quota import QuotaExceeded, governor, user_context
+from bot.render import PAGE_CALLBACK, PROGRESSIVE_RESULTS, message_id_of, send_hotels, show_page, show_progress
+from bot.resilience import ApiError
+from bot.sender import SEND_WORKERS, OutboundQueue, QueuedBot
+from bot.session_store import create_session_store
+from bot.webhook import run_webhook
+from bot.user import SearchMode, User
 
 bot_token = config('BOT_TOKEN')
+bot_mode = config('BOT_MODE', default='polling')
 api_key = config('API_KEY')
-bot = telebot.TeleBot(bot_token)
-users = dict()
+if DISPATCH_WORKERS > 0:  # Разные чаты обрабатываются параллельно, сообщения одного чата - по порядку
+    bot = DispatchingTeleBot(bot_token, dispatcher=ChatDispatcher())
+else:
+    bot = telebot.TeleBot(bot_token)
+if SEND_WORKERS > 0:  # Сообщения отправляются через общую очередь с ограничением частоты, обработчики не ждут ответа
+    bot = QueuedBot(bot, outbox=OutboundQueue(bot))
+users = create_session_store()
+prewarmer = Prewarmer(popularity, api_key)  # Прогрев популярных направлений в часы низкой нагрузки
+metrics.gauge('sessions', lambda: len(users))
+if SEND_WORKERS > 0:
+    metrics.gauge('send_queue_depth', lambda: bot.outbox.metrics()['queue_depth'])
+if DISPATCH_WORKERS > 0:
+    metrics.gauge('dispatch_queue_depth', lambda: sum(bot.dispatcher.metrics()['queue_depth']))
+for budget in governor.remaining():  # quota_global_minute_remaining и quota_global_day_remaining, если заданы
+    metrics.gauge(f'quota_{budget}_remaining', lambda budget=budget: governor.remaining()[budget])
 help_message = ('<b>/lowprice — отображение наиболее бюджетных отелей в выбранном городе\n'
                 '/highprice — отображение наиболее дорогостоящих отелей в выбранном городе\n'
                 '/bestdeal — отображение отелей, наиболее подходящих по цене и расположению от центра (наиболее'
                 ' дешёвые и расположены ближе всего к центру)</b\n>')
+unavailable_message = ('<b>Сервис поиска отелей временно недоступен.\nПожалуйста, повторите попытку через'
+                       ' несколько минут</b\n>')
+quota_message = ('<b>Превышен лимит запросов поиска.\nПожалуйста, повторите попытку через {} мин. Ранее найденные'
+                 ' города и отели доступны без ограничений</b\n>')
 
 
 @bot.message_handler(commands=['start'])
 @user_logging
+@users.write_back
 def start(message: telebot.types.Message) -> None:
     """
     Функция обработки команды start. При каждом поступлении команды создается экземпляр класса User, где будут храниться
-     данные о текущим пользователе. Экземпляры класса хранятся в словаре users, где ключ в словаре - это id пользователя
-      в телеграмме, значение ключа - экземпляр класса с данными о соответствующем пользователе
+     данные о текущим пользователе. Экземпляры класса хранятся в хранилище сессий users, где ключ - это id
+      пользователя в телеграмме, значение ключа - экземпляр класса с данными о соответствующем пользователе
 
     :param message: объект из Bot API, содержащий в себе информацию о сообщении и данные о пользователе
     """
@@ -40,11 +72,12 @@ def start(message: telebot.types.Message) -> None:
 
 @bot.message_handler(content_types=['text'])
 @user_logging
+@users.write_back
 def get_text_messages(message: telebot.types.Message) -> None:
     """
     Функция, обрабатывающая текстовые сообщения от пользователя. В зависимости от введенного пользователем сообщения,
      выполняется один из трех веток алгоритма программы, или выводиться информационное сообщение о командах.
-    В случае отсутствия данных в словаре users о текущем пользователе, функция создает экземпляр класса с данными
+    В случае отсутствия данных в хранилище users о текущем пользователе, функция создает экземпляр класса с данными
      о текущем пользователе и выполняется вновь
 
     :param message: объект из Bot API, содержащий в себе информацию о сообщении и данные о пользователе
@@ -62,29 +95,31 @@ def get_text_messages(message: telebot.types.Message) -> None:
                              text='<b>В каком городе ищем?</b\n>',
                              parse_mode='html')
             if message.text.lower() == '/lowprice':
-                current_user.flag_search = 'LOW_PRICE'
+                current_user.flag_search = SearchMode.LOW_PRICE
             elif message.text.lower() == '/highprice':
-                current_user.flag_search = 'HIGH_PRICE'
+                current_user.flag_search = SearchMode.HIGH_PRICE
             elif message.text.lower() == '/bestdeal':
-                current_user.flag_search = 'BEST_DEAL'
+                current_user.flag_search = SearchMode.BEST_DEAL
             bot.register_next_step_handler(message=message, callback=get_city_name)
         else:
-            current_user.flag_search = 'NOT_CHOSEN'
+            current_user.flag_search = SearchMode.NOT_CHOSEN
             bot.send_message(chat_id=message.from_user.id, text=help_message, parse_mode='html')
 
 
 @user_logging
+@users.write_back
 def get_city_name(message: telebot.types.Message) -> None:
     """
     Функция, определяющая id города, в котором требуется найти информацию об отелях.
     Алгоритм функции:
-        - получение экземпляра класса о текущем пользователе из словаря. При отсутствии данных создается экземпляр
+        - получение экземпляра класса о текущем пользователе из хранилища. При отсутствии данных создается экземпляр
          класса на текущего пользователя и программа выполняется с начального этапа;
-        - при наличии экземпляра класса осуществляется контроль ввода: в названии города должны присутствовать только
-         буквы английского алфавита и знак пробела. Если введена одна из команд /lowprice, /highprice, /bestdeal -
-          выполняется поиск с начального этапа, при вводе команды /help выводиться информационное сообщение о командах;
-        - после прохождения контроля ввода определяется код языка, после чего выполняется запрос на API сайта
-         hotels.com с помощью функции city_search;
+        - при наличии экземпляра класса осуществляется контроль ввода: из названия города удаляются все символы, кроме
+         букв, дефиса и пробела, оставшиеся буквы должны относиться к алфавиту одного из языков (CityNormalizer).
+          Если введена одна из команд /lowprice, /highprice, /bestdeal - выполняется поиск с начального этапа, при
+           вводе команды /help выводиться информационное сообщение о командах;
+        - после прохождения контроля ввода по алфавиту определяется код языка, после чего выполняется запрос на API
+         сайта hotels.com с помощью функции city_search;
         - при наличии города или городов со введенным названием, пользователю выводится список городов в виде Inline
          клавиатуры для выбора нужного города, после чего id города сохраняется в переменной current_city_id экземпляра
           класса User. При наличии только одного города, результат сразу выводится сообщением и id города также
@@ -107,17 +142,9 @@ def get_city_name(message: telebot.types.Message) -> None:
             bot.send_message(chat_id=message.from_user.id, text=help_message, parse_mode='html')
             bot.register_next_step_handler(message=message, callback=get_city_name)
         else:
-            letters = 'abcdefghijklmnopqrstuvwxyz- абвгдеёжзийклмнопрстуфхцчшщъыьэюя'
-            current_message = ''.join([symbol for symbol in current_message if symbol in letters])
+            current_message, current_local = city_normalizer.normalize(current_message)
 
-            if all([True if symbol in letters[26:] else False for symbol in current_message]):
-                current_local = 'ru_RU'
-            elif all([True if symbol in letters[:28] else False for symbol in current_message]):
-                current_local = 'en_US'
-            else:
-                current_local = 'ERROR'
-
-            if current_local == 'ERROR':
+            if current_local is None:
                 bot.send_message(chat_id=message.from_user.id,
                                  text='<b>Название города введено не верно, повторите пожалуйста попытку</b\n>',
                                  parse_mode='html')
@@ -125,7 +152,22 @@ def get_city_name(message: telebot.types.Message) -> None:
             else:
                 bot.send_message(chat_id=message.chat.id, text='<b>Ищу города с данным названием...</b\n>',
                                  parse_mode='html')
-                current_user.result_cities = city_search(current_message, api_key=api_key, local=current_local)
+                try:
+                    with user_context(message.from_user.id):  # Запросы на сайт расходуют бюджет пользователя
+                        current_user.result_cities = city_search(current_message, api_key=api_key,
+                                                                 local=current_local)
+                except QuotaExceeded as error_message:
+                    logging.warning(f'City search rejected: {error_message}')
+                    bot.send_message(chat_id=message.chat.id,
+                                     text=quota_message.format(math.ceil(error_message.retry_after / 60)),
+                                     parse_mode='html')
+                    bot.register_next_step_handler(message=message, callback=get_city_name)
+                    return
+                except ApiError as error_message:
+                    logging.warning(f'City search failed: {error_message}')
+                    bot.send_message(chat_id=message.chat.id, text=unavailable_message, parse_mode='html')
+                    bot.register_next_step_handler(message=message, callback=get_city_name)
+                    return
 
                 if len(current_user.result_cities) > 0:  # Проверяем результат поиска городов со введенным названием
                     if len(current_user.result_cities) > 1:
@@ -138,20 +180,22 @@ def get_city_name(message: telebot.types.Message) -> None:
                     else:  # Если только один город, сразу выводим
                         for destination_id, city in current_user.result_cities.items():
                             current_user.current_city_id = destination_id
+                            popularity.record(destination_id)
                             bot.send_message(chat_id=message.chat.id, text='<b>Результат поиска:</b\n>',
                                              parse_mode='html')
                             bot.send_message(chat_id=message.chat.id, text=f'<b>{city}</b\n>', parse_mode='html')
-                        if current_user.flag_search in ['LOW_PRICE', 'HIGH_PRICE']:
+                        if current_user.flag_search in (SearchMode.LOW_PRICE, SearchMode.HIGH_PRICE):
                             bot.send_message(chat_id=message.chat.id,
                                              text='<b>Сколько гостиниц найти? (не более 25)</b\n>',
                                              parse_mode='html')
-                        elif current_user.flag_search == 'BEST_DEAL':
+                        elif current_user.flag_search == SearchMode.BEST_DEAL:
                             bot.send_message(chat_id=message.chat.id,
                                              text='<b>Введите минимальную стоимость одной ночи в рублях</b\n>',
                                              parse_mode='html')
-                    if current_user.flag_search in ['LOW_PRICE', 'HIGH_PRICE']:  # Переходим на соответствующую ветку
+                    # Переходим на соответствующую ветку
+                    if current_user.flag_search in (SearchMode.LOW_PRICE, SearchMode.HIGH_PRICE):
                         bot.register_next_step_handler(message=message, callback=get_number_of_hotels)
-                    elif current_user.flag_search == 'BEST_DEAL':
+                    elif current_user.flag_search == SearchMode.BEST_DEAL:
                         bot.register_next_step_handler(message=message, callback=get_minimum_price)
                 else:
                     bot.send_message(chat_id=message.from_user.id,
@@ -161,8 +205,20 @@ def get_city_name(message: telebot.types.Message) -> None:
                     bot.register_next_step_handler(message=message, callback=get_city_name)
 
 
+@bot.callback_query_handler(func=lambda call: call.data.startswith(f'{PAGE_CALLBACK}:'))
+@user_logging
+def result_page_worker(call: telebot.types.CallbackQuery) -> None:
+    """
+    Функция обработки кнопок листания результата поиска (при RESULT_PAGE_SIZE > 0)
+
+    :param call: объект из Bot API, содержащий в себе номер результата и номер выбранной страницы
+    """
+    show_page(current_bot=bot, call=call)
+
+
 @bot.callback_query_handler(func=lambda call: True)
 @user_logging
+@users.write_back
 def callback_worker(call: telebot.types.CallbackQuery) -> None:
     """
     Функция обработки кнопок с названиями городов. При нажатии кнопок объект call возвращает соответствующий кнопке
@@ -184,15 +240,16 @@ def callback_worker(call: telebot.types.CallbackQuery) -> None:
     else:
         if current_user.message_id + 2 == call.message.message_id:
             current_user.current_city_id = call.data
+            popularity.record(call.data)
             bot.edit_message_reply_markup(chat_id=call.message.chat.id, message_id=call.message.message_id,
                                           reply_markup=None)
             bot.send_message(chat_id=call.message.chat.id,
                              text=f'<b>{current_user.result_cities[current_user.current_city_id]}</b\n>',
                              parse_mode='html')
-            if current_user.flag_search in ['LOW_PRICE', 'HIGH_PRICE']:
+            if current_user.flag_search in (SearchMode.LOW_PRICE, SearchMode.HIGH_PRICE):
                 bot.send_message(chat_id=call.message.chat.id, text='<b>Сколько гостиниц найти? (не более 25)</b\n>',
                                  parse_mode='html')
-            elif current_user.flag_search == 'BEST_DEAL':
+            elif current_user.flag_search == SearchMode.BEST_DEAL:
                 bot.send_message(chat_id=call.message.chat.id,
                                  text='<b>Введите минимальную стоимость одной ночи в рублях</b\n>',
                                  parse_mode='html')
@@ -202,12 +259,13 @@ def callback_worker(call: telebot.types.CallbackQuery) -> None:
 
 
 @user_logging
+@users.write_back
 def get_number_of_hotels(message: telebot.types.Message) -> None:
     """
     Функция, необходимая для определения количества отелей и выдающая пользователю полученные данные об отелях:
      наименование, цену снятия номера на ночь и дистанцию от центра до отеля (при поиске по команде /bestdeal).
     Алгоритм работы:
-        - получение экземпляра класса о текущем пользователе из словаря. При отсутствии данных создается экземпляр
+        - получение экземпляра класса о текущем пользователе из хранилища. При отсутствии данных создается экземпляр
          класса на текущего пользователя и программа выполняется с начального этапа;
         - при наличии экземпляра класса осуществляется контроль ввода: в сообщении должны присутствовать только
          цифры. Если введена одна из команд /lowprice, /highprice, /bestdeal - выполняется поиск с начального этапа,
@@ -240,43 +298,55 @@ def get_number_of_hotels(message: telebot.types.Message) -> None:
             if number_of_hotels > 25:  # Максимальное количество отелей не более 25
                 number_of_hotels = 25
             result_hotels = dict()
-            bot.send_message(chat_id=message.from_user.id, text=f'<b>Ищу гостиницы...</b\n>', parse_mode='html')
-            if current_user.flag_search == 'LOW_PRICE':
-                result_hotels = hotel_search_sort(quantity=number_of_hotels,
-                                                  city_id=int(current_user.current_city_id),
-                                                  api_key=api_key,
-                                                  search_kind='PRICE')
-            elif current_user.flag_search == 'HIGH_PRICE':
-                result_hotels = hotel_search_sort(quantity=number_of_hotels,
-                                                  city_id=current_user.current_city_id,
-                                                  api_key=api_key,
-                                                  search_kind='PRICE_HIGHEST_FIRST')
-            elif current_user.flag_search == 'BEST_DEAL':
-                result_hotels = hotel_search_range(quantity=number_of_hotels,
-                                                   city_id=current_user.current_city_id,
-                                                   minimum_price=current_user.minimum_price,
-                                                   maximum_price=current_user.maximum_price,
-                                                   minimum_distance=current_user.minimum_distance,
-                                                   maximum_distance=current_user.maximum_distance,
-                                                   api_key=api_key)
+            progress_message = bot.send_message(chat_id=message.from_user.id, text=f'<b>Ищу гостиницы...</b\n>',
+                                                parse_mode='html')
+            try:
+                with user_context(message.from_user.id):  # Запросы на сайт расходуют бюджет пользователя
+                    if PROGRESSIVE_RESULTS:  # Найденные отели показываются по мере загрузки страниц
+                        result_hotels = show_progress(current_bot=bot, chat_id=message.chat.id,
+                                                      message=progress_message,
+                                                      results=search_results(current_user, number_of_hotels),
+                                                      flag_search=current_user.flag_search,
+                                                      quantity=number_of_hotels)
+                    elif current_user.flag_search == SearchMode.LOW_PRICE:
+                        result_hotels = hotel_search_sort(quantity=number_of_hotels,
+                                                          city_id=int(current_user.current_city_id),
+                                                          api_key=api_key,
+                                                          search_kind='PRICE')
+                    elif current_user.flag_search == SearchMode.HIGH_PRICE:
+                        result_hotels = hotel_search_sort(quantity=number_of_hotels,
+                                                          city_id=current_user.current_city_id,
+                                                          api_key=api_key,
+                                                          search_kind='PRICE_HIGHEST_FIRST')
+                    elif current_user.flag_search == SearchMode.BEST_DEAL:
+                        result_hotels = hotel_search_range(quantity=number_of_hotels,
+                                                           city_id=current_user.current_city_id,
+                                                           minimum_price=current_user.minimum_price,
+                                                           maximum_price=current_user.maximum_price,
+                                                           minimum_distance=current_user.minimum_distance,
+                                                           maximum_distance=current_user.maximum_distance,
+                                                           api_key=api_key)
+            except QuotaExceeded as error_message:
+                logging.warning(f'Hotel search rejected: {error_message}')
+                bot.send_message(chat_id=message.from_user.id,
+                                 text=quota_message.format(math.ceil(error_message.retry_after / 60)),
+                                 parse_mode='html')
+                bot.register_next_step_handler(message=message, callback=get_number_of_hotels)
+                return
+            except ApiError as error_message:  # Пользователь может повторить поиск, введя количество отелей еще раз
+                logging.warning(f'Hotel search failed: {error_message}')
+                bot.send_message(chat_id=message.from_user.id, text=unavailable_message, parse_mode='html')
+                bot.register_next_step_handler(message=message, callback=get_number_of_hotels)
+                return
             if len(result_hotels) > 0:
-                bot.send_message(message.chat.id, '<b>Результат:</b\n>', parse_mode='html')
-                if current_user.flag_search in ['LOW_PRICE', 'HIGH_PRICE']:
-                    for name, value in result_hotels.items():
-                        bot.send_message(chat_id=message.chat.id,
-                                         text=f'<b>{name}\nАдрес: {value[0]}\nСтоимость от {value[1]} рублей'
-                                              f' за ночь </b\n>',
-                                         parse_mode='html')
-                elif current_user.flag_search == 'BEST_DEAL':
-                    for name, value in result_hotels.items():
-                        bot.send_message(chat_id=message.chat.id,
-                                         text=f'<b>{name}\nАдрес: {value[0]}\nСтоимость от {value[1]} рублей за ночь\n'
-                                              f'Расстояние от центра составляет {value[2]} км</b\n>', parse_mode='html')
-                current_user.flag_search = 'NOT_CHOSEN'
+                send_hotels(current_bot=bot, chat_id=message.chat.id, hotels=result_hotels,
+                            flag_search=current_user.flag_search, token=message.message_id,
+                            message_id=message_id_of(progress_message) if PROGRESSIVE_RESULTS else None)
+                current_user.flag_search = SearchMode.NOT_CHOSEN
             else:
                 bot.send_message(chat_id=message.from_user.id,
                                  text='<b>Не нашел подходящих вариантов.\nПопробуйте ещё раз.</b\n>', parse_mode='html')
-                if current_user.flag_search in ['LOW_PRICE', 'HIGH_PRICE']:
+                if current_user.flag_search in (SearchMode.LOW_PRICE, SearchMode.HIGH_PRICE):
                     bot.register_next_step_handler(message=message, callback=get_city_name)
                 else:
                     bot.send_message(chat_id=message.from_user.id,
@@ -285,12 +355,37 @@ def get_number_of_hotels(message: telebot.types.Message) -> None:
                     bot.register_next_step_handler(message=message, callback=get_minimum_price)
 
 
+def search_results(current_user: User, quantity: int) -> Iterator[Dict[str, List]]:
+    """
+    Функция получения итератора результатов поиска отелей (iter_hotel_search_sort или iter_hotel_search_range) по
+     виду поиска и данным, введенным пользователем
+
+    :param current_user: экземпляр класса User с данными о текущем пользователе
+    :param quantity: количество отелей (int)
+    :return: итератор словарей с данными отелей (Iterator)
+    """
+    if current_user.flag_search == SearchMode.LOW_PRICE:
+        return iter_hotel_search_sort(quantity=quantity, city_id=int(current_user.current_city_id), api_key=api_key,
+                                      search_kind='PRICE')
+    if current_user.flag_search == SearchMode.HIGH_PRICE:
+        return iter_hotel_search_sort(quantity=quantity, city_id=current_user.current_city_id, api_key=api_key,
+                                      search_kind='PRICE_HIGHEST_FIRST')
+    if current_user.flag_search == SearchMode.BEST_DEAL:
+        return iter_hotel_search_range(quantity=quantity, city_id=current_user.current_city_id,
+                                       minimum_price=current_user.minimum_price,
+                                       maximum_price=current_user.maximum_price,
+                                       minimum_distance=current_user.minimum_distance,
+                                       maximum_distance=current_user.maximum_distance, api_key=api_key)
+    return iter(())
+
+
 @user_logging
+@users.write_back
 def get_minimum_price(message: telebot.types.Message) -> None:
     """
     Функция получения минимальной стоимости за ночевку в номере гостиницы
     Алгоритм работы:
-        - получение экземпляра класса о текущем пользователе из словаря. При отсутствии данных создается экземпляр
+        - получение экземпляра класса о текущем пользователе из хранилища. При отсутствии данных создается экземпляр
          класса на текущего пользователя и программа выполняется с начального этапа;
         - при наличии экземпляра класса осуществляется контроль ввода:
           а) если введена одна из команд /lowprice, /highprice, /bestdeal -  выполняется поиск отелей с начального
@@ -323,11 +418,12 @@ def get_minimum_price(message: telebot.types.Message) -> None:
 
 
 @user_logging
+@users.write_back
 def get_maximum_price(message: telebot.types.Message) -> None:
     """
     Функция получения максимальной стоимости за ночевку в номере гостиницы
     Алгоритм работы:
-        - получение экземпляра класса о текущем пользователе из словаря. При отсутствии данных создается экземпляр
+        - получение экземпляра класса о текущем пользователе из хранилища. При отсутствии данных создается экземпляр
          класса на текущего пользователя и программа выполняется с начального этапа;
         - при наличии экземпляра класса осуществляется контроль ввода:
           а) если введена одна из команд /lowprice, /highprice, /bestdeal -  выполняется поиск отелей с начального
@@ -359,11 +455,12 @@ def get_maximum_price(message: telebot.types.Message) -> None:
 
 
 @user_logging
+@users.write_back
 def get_minimum_distance(message: telebot.types.Message) -> None:
     """
     Функция получения минимальной дистанции от центра до отеля
     Алгоритм работы:
-        - получение экземпляра класса о текущем пользователе из словаря. При отсутствии данных создается экземпляр
+        - получение экземпляра класса о текущем пользователе из хранилища. При отсутствии данных создается экземпляр
          класса на текущего пользователя и программа выполняется с начального этапа;
         - при наличии экземпляра класса осуществляется контроль ввода:
           а) если введена одна из команд /lowprice, /highprice, /bestdeal -  выполняется поиск отелей с начального
@@ -396,11 +493,12 @@ def get_minimum_distance(message: telebot.types.Message) -> None:
 
 
 @user_logging
+@users.write_back
 def get_maximum_distance(message: telebot.types.Message) -> None:
     """
     Функция получения максимальной дистанции от центра до отеля
     Алгоритм работы:
-        - получение экземпляра класса о текущем пользователе из словаря. При отсутствии данных создается экземпляр
+        - получение экземпляра класса о текущем пользователе из хранилища. При отсутствии данных создается экземпляр
          класса на текущего пользователя и программа выполняется с начального этапа;
         - при наличии экземпляра класса осуществляется контроль ввода:
           а) если введена одна из команд /lowprice, /highprice, /bestdeal -  выполняется поиск отелей с начального
@@ -432,11 +530,19 @@ def get_maximum_distance(message: telebot.types.Message) -> None:
                                                   ' повторите попытку', variable='MAXIMUM_DISTANCE')
 
 
-logging.basicConfig(filename='log_file.log', level=logging.INFO, filemode='w', format='%(asctime)s - %(message)s')
+if __name__ == '__main__':
+    setup_logging()  # Журнал в формате JSON записывается фоновым потоком
+    if PREWARM_TOP > 0:
+        prewarmer.start()
+    metrics.start_server(metrics.registry)  # Метрики в формате Prometheus при METRICS_ENABLED=True
 
-while True:
-    try:
-        print('<<< Бот "Too Easy Travel" работает>>>')
-        bot.polling(none_stop=True, interval=0)
-    except Exception as error_message:
-        logging.exception(error_message)
+    if bot_mode == 'webhook':  # Обновления принимаются HTTP-сервером вместо опроса сервера телеграмма
+        print('<<< Бот "Too Easy Travel" работает (webhook)>>>')
+        run_webhook(bot)
+    else:
+        while True:
+            try:
+                print('<<< Бот "Too Easy Travel" работает>>>')
+                bot.polling(none_stop=True, interval=0)
+            except Exception as error_message:
+                logging.exception(error_message)
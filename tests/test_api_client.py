@@ -0,0 +1,76 @@
+import threading
+import time
+import unittest
+from typing import Dict, Tuple
+
+from bot import api_client
+from bot.api_client import HotelsApiClient, MockTransport
+from bot.quota import QuotaGovernor
+from bot.resilience import CircuitBreaker
+
+PAGE = b'{"result": "OK"}'
+
+
+class SlowFirstApi:
+    """
+    Класс - имитатор сайта, первое обращение к которому при delay > 0 через delay секунд завершается ответом 503,
+     а остальные выполняются сразу
+
+    Args:
+        delay (float): задержка первого ответа в секундах, 0 - все ответы быстрые и успешные
+    """
+
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self.calls = 0
+        self.__lock = threading.Lock()
+
+    def __call__(self, path: str, params: Dict[str, str]) -> Tuple[int, bytes]:
+        with self.__lock:
+            self.calls += 1
+            first = self.calls == 1
+        if first and self.delay > 0:
+            time.sleep(self.delay)
+            return 503, b'{"message": "Service unavailable"}'
+        return 200, PAGE
+
+
+class HedgedRequestTest(unittest.TestCase):
+    """
+    Класс - проверка дублирования медленных запросов клиентом API
+    """
+
+    def make_client(self, api: SlowFirstApi, governor: QuotaGovernor) -> HotelsApiClient:
+        return HotelsApiClient('test-hedge', transport=MockTransport(api), retries=0, hedge_after=0.05,
+                               breaker=CircuitBreaker(), governor=governor)
+
+    def test_hedge_answers_failed_request(self) -> None:
+        api, governor = SlowFirstApi(delay=0.3), QuotaGovernor(user_minute=0, user_day=0, global_minute=0,
+                                                                global_day=0)
+        self.assertEqual(self.make_client(api, governor).get_raw('/properties/list', {}), PAGE)
+        self.assertEqual(api.calls, 2)
+        self.assertEqual(governor.allowed, 2)  # Дублирующий запрос расходует бюджет
+
+    def test_fast_request_not_hedged(self) -> None:
+        api, governor = SlowFirstApi(delay=0.0), QuotaGovernor(user_minute=0, user_day=0, global_minute=0,
+                                                                global_day=0)
+        self.assertEqual(self.make_client(api, governor).get_raw('/properties/list', {}), PAGE)
+        time.sleep(0.1)
+        self.assertEqual(api.calls, 1)
+
+    def test_first_request_not_queued(self) -> None:
+        release = threading.Event()
+        busy = [api_client._hedge_executor.submit(release.wait, 5) for _ in range(api_client.HEDGE_WORKERS)]
+        try:
+            api = SlowFirstApi(delay=0.0)
+            start = time.monotonic()
+            self.make_client(api, QuotaGovernor()).get_raw('/properties/list', {})
+            self.assertLess(time.monotonic() - start, 0.5)
+        finally:
+            release.set()
+            for future in busy:
+                future.result()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import json
+import unittest
+from typing import Dict, Tuple
+
+from benchmarks.fake_data import make_properties_page
+from bot.bestdeal import RangeCollector
+
+
+def make_page(page_number: int, sold_out: bool = False, empty: bool = False) -> Tuple[Tuple[str, ...], bytes]:
+    """
+    Функция создания ключа и тела страницы /properties/list
+
+    :param page_number: номер страницы (int)
+    :param sold_out: у всех отелей страницы нет стоимости (bool)
+    :param empty: на странице нет отелей (bool)
+    :return: ключ и тело страницы (Tuple)
+    """
+    page: Dict = make_properties_page(page_number)
+    results = page['data']['body']['searchResults']['results']
+    if empty:
+        results.clear()
+    for hotel in results if sold_out else ():
+        del hotel['ratePlan']
+    return ('test-bestdeal', str(page_number), str(sold_out), str(empty)), json.dumps(page).encode('utf-8')
+
+
+class RangeCollectorTest(unittest.TestCase):
+    """
+    Класс - проверка прекращения запросов поиска /bestdeal
+    """
+
+    def make_collector(self) -> RangeCollector:
+        return RangeCollector(quantity=5, minimum_price=0, maximum_price=10 ** 6, minimum_distance=0.0,
+                              maximum_distance=10.0)
+
+    def test_sold_out_page_continues(self) -> None:
+        collector = self.make_collector()
+        self.assertFalse(collector.add_page(*make_page(1, sold_out=True)))
+        self.assertEqual(collector.final_hotels, dict())
+        self.assertTrue(collector.add_page(*make_page(2)))
+        self.assertEqual(len(collector.result()), 5)
+
+    def test_empty_page_stops(self) -> None:
+        collector = self.make_collector()
+        self.assertTrue(collector.add_page(*make_page(1, empty=True)))
+
+    def test_sold_out_page_sorted_by_distance(self) -> None:
+        collector = RangeCollector(quantity=5, minimum_price=0, maximum_price=10 ** 6, minimum_distance=0.0,
+                                   maximum_distance=10.0, distance_sort=True)
+        self.assertFalse(collector.add_page(*make_page(1, sold_out=True)))
+
+
+if __name__ == '__main__':
+    unittest.main()
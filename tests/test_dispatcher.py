@@ -0,0 +1,75 @@
+import threading
+import time
+import unittest
+from typing import List
+
+import telebot
+
+from bot.dispatcher import ChatDispatcher, DispatchingTeleBot
+
+
+def make_message(message_id: int, chat_id: int, text: str) -> telebot.types.Message:
+    """
+    Функция создания текстового сообщения Bot API
+
+    :param message_id: id сообщения (int)
+    :param chat_id: id чата (int)
+    :param text: текст сообщения (str)
+    :return: сообщение (telebot.types.Message)
+    """
+    return telebot.types.Message.de_json({
+        'message_id': message_id, 'date': 1633000000 + message_id, 'text': text,
+        'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Tester'},
+        'chat': {'id': chat_id, 'type': 'private', 'first_name': 'Tester'}})
+
+
+class DispatchingTeleBotTest(unittest.TestCase):
+    """
+    Класс - проверка выбора обработчика следующего шага, когда обработчик предыдущего сообщения чата еще выполняется
+    """
+
+    def setUp(self) -> None:
+        self.dispatcher = ChatDispatcher(workers=2, queue_size=10)
+        self.bot = DispatchingTeleBot('1:x', dispatcher=self.dispatcher)
+        self.calls: List[str] = list()
+        self.done = threading.Event()
+
+        @self.bot.message_handler(commands=['lowprice'])
+        def slow_command(message: telebot.types.Message) -> None:
+            time.sleep(0.2)  # Долгий обработчик: следующее сообщение приходит до регистрации следующего шага
+            self.calls.append('lowprice')
+            self.bot.register_next_step_handler(message=message, callback=next_step)
+
+        @self.bot.message_handler(content_types=['text'])
+        def any_text(message: telebot.types.Message) -> None:
+            self.calls.append(f'text:{message.text}')
+            self.done.set()
+
+        def next_step(message: telebot.types.Message) -> None:
+            self.calls.append(f'next_step:{message.text}')
+            self.done.set()
+
+    def tearDown(self) -> None:
+        self.dispatcher.stop(timeout=1)
+
+    def test_separate_updates(self) -> None:
+        self.bot.process_new_messages([make_message(1, 100, '/lowprice')])
+        self.bot.process_new_messages([make_message(2, 100, 'Moscow')])
+        self.assertTrue(self.done.wait(2))
+        self.assertEqual(self.calls, ['lowprice', 'next_step:Moscow'])
+
+    def test_one_batch(self) -> None:
+        self.bot.process_new_messages([make_message(1, 100, '/lowprice'), make_message(2, 100, 'Moscow')])
+        self.assertTrue(self.done.wait(2))
+        self.assertEqual(self.calls, ['lowprice', 'next_step:Moscow'])
+
+    def test_other_chat_not_blocked(self) -> None:
+        start = time.monotonic()
+        self.bot.process_new_messages([make_message(1, 100, '/lowprice'), make_message(2, 101, 'Paris')])
+        self.assertTrue(self.done.wait(2))
+        self.assertLess(time.monotonic() - start, 0.2)
+        self.assertEqual(self.calls, ['text:Paris'])
+
+
+if __name__ == '__main__':
+    unittest.main()
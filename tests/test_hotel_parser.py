@@ -0,0 +1,29 @@
+import unittest
+from unittest import mock
+
+from bot import hotel_parser
+from bot.hotel_parser import iter_results
+
+TRUNCATED_PAGE = b'{"data": {"body": {"searchResults": {"results": [{"name": "Hotel 1"}, {"name": '
+
+
+class InvalidJsonTest(unittest.TestCase):
+    """
+    Класс - проверка ошибки разбора ответа не в формате JSON: при любом способе разбора - ValueError
+    """
+
+    def test_json_codec(self) -> None:
+        with mock.patch.object(hotel_parser, '_ijson', None):
+            with self.assertRaises(ValueError):
+                list(iter_results(TRUNCATED_PAGE))
+
+    @unittest.skipIf(hotel_parser._ijson is None, 'ijson с библиотекой yajl2 не установлен')
+    def test_ijson(self) -> None:
+        with self.assertRaises(ValueError):
+            list(iter_results(TRUNCATED_PAGE))
+        with self.assertRaises(ValueError):
+            list(iter_results(b'<html><body>Service temporarily unavailable</body></html>'))
+
+
+if __name__ == '__main__':
+    unittest.main()
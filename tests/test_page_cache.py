@@ -0,0 +1,88 @@
+import threading
+import unittest
+from typing import Dict, Tuple
+from unittest import mock
+
+from benchmarks.fake_data import fake_hotels_api
+from bot import hotel_index
+from bot.api_client import HotelsApiClient, MockTransport, set_client
+from bot.function import hotel_search
+from bot.low_high_price import hotel_search_sort, sort_query
+from bot.page_cache import page_cache, page_key, parse_page
+from bot.quota import QuotaGovernor
+from bot.resilience import ApiError, CircuitBreaker
+
+API_KEY = 'test-page-cache'
+HTML_PAGE = b'<html><body>Service temporarily unavailable</body></html>'
+
+
+class FaultyApi:
+    """
+    Класс - имитатор API сайта, первые faults ответов которого на запрос первой страницы /properties/list -
+     html-страница с кодом 200
+
+    Args:
+        faults (int): количество ошибочных ответов
+    """
+
+    def __init__(self, faults: int) -> None:
+        self.faults = faults
+        self.__lock = threading.Lock()
+
+    def __call__(self, path: str, params: Dict[str, str]) -> Tuple[int, bytes]:
+        with self.__lock:
+            if path == '/properties/list' and params.get('pageNumber') == '1' and self.faults > 0:
+                self.faults -= 1
+                return 200, HTML_PAGE
+        return fake_hotels_api(path, params)
+
+
+class InvalidPageTest(unittest.TestCase):
+    """
+    Класс - проверка поиска, когда сайт возвращает страницу /properties/list не в формате JSON
+    """
+
+    city_id = 900000
+
+    def setUp(self) -> None:
+        InvalidPageTest.city_id += 1
+        patcher = mock.patch.object(hotel_index, 'HOTEL_INDEX', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def use_api(self, api: FaultyApi, retries: int) -> None:
+        set_client(HotelsApiClient(API_KEY, transport=MockTransport(api), retries=retries, breaker=CircuitBreaker(),
+                                   governor=QuotaGovernor()))
+
+    def test_invalid_page_retried(self) -> None:
+        api = FaultyApi(faults=1)
+        self.use_api(api, retries=1)
+        hotels = hotel_search_sort(quantity=5, city_id=self.city_id, api_key=API_KEY, search_kind='PRICE')
+        self.assertEqual(len(hotels), 5)
+        self.assertEqual(api.faults, 0)
+
+    def test_invalid_page_raises_api_error(self) -> None:
+        api = FaultyApi(faults=100)
+        self.use_api(api, retries=0)
+        with self.assertRaises(ApiError):
+            hotel_search_sort(quantity=5, city_id=self.city_id, api_key=API_KEY, search_kind='PRICE')
+        self.assertIsNone(page_cache.get(page_key(sort_query(self.city_id, 'PRICE', 1))))
+
+    def test_invalid_page_not_cached(self) -> None:
+        api = FaultyApi(faults=1)
+        self.use_api(api, retries=0)
+        with self.assertRaises(ApiError):
+            hotel_search_sort(quantity=5, city_id=self.city_id, api_key=API_KEY, search_kind='PRICE')
+        hotels = hotel_search_sort(quantity=5, city_id=self.city_id, api_key=API_KEY, search_kind='PRICE')
+        self.assertEqual(len(hotels), 5)
+
+    def test_unparsable_cached_page_evicted(self) -> None:
+        key = page_key(sort_query(self.city_id, 'PRICE', 1))
+        page_cache.set(key, HTML_PAGE)
+        with self.assertRaises(ApiError):
+            parse_page(key, HTML_PAGE, hotel_search, quantity=5)
+        self.assertIsNone(page_cache.get(key))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+from datetime import datetime
+from typing import List
+from unittest import mock
+
+from bot import hotel_index
+from bot.prewarm import PopularityTracker, Prewarmer
+
+
+class PrewarmScheduleTest(unittest.TestCase):
+    """
+    Класс - проверка выбора момента прогрева: один раз за часы низкой нагрузки, перед их окончанием
+    """
+
+    @staticmethod
+    def checks(prewarmer: Prewarmer) -> List[str]:
+        return [f'{hour:02}:{minute:02}' for hour in range(24) for minute in range(0, 60, 15)
+                if prewarmer.due(datetime(2026, 1, 1, hour, minute))]
+
+    def test_once_before_end(self) -> None:
+        prewarmer = Prewarmer(PopularityTracker(), 'test-prewarm', interval=15 * 60, hours='1-7')
+        self.assertEqual(self.checks(prewarmer), ['06:45'])
+
+    def test_window_across_midnight(self) -> None:
+        prewarmer = Prewarmer(PopularityTracker(), 'test-prewarm', interval=15 * 60, hours='23-5')
+        self.assertEqual(self.checks(prewarmer), ['04:45'])
+
+    def test_disabled_without_index(self) -> None:
+        prewarmer = Prewarmer(PopularityTracker(), 'test-prewarm', interval=15 * 60, hours='')
+        self.assertEqual(len(self.checks(prewarmer)), 96)
+        with mock.patch.object(hotel_index, 'HOTEL_INDEX', False):
+            self.assertEqual(self.checks(prewarmer), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
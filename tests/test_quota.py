@@ -0,0 +1,93 @@
+import unittest
+from typing import Dict, List, Tuple
+
+from bot.api_client import HotelsApiClient, MockTransport
+from bot.quota import QuotaExceeded, QuotaGovernor, user_context
+from bot.resilience import ApiError, CircuitBreaker
+
+
+class QuotaGovernorTest(unittest.TestCase):
+    """
+    Класс - проверка расходования и остатка бюджетов ограничителя квоты
+    """
+
+    def test_remaining_labels(self) -> None:
+        governor = QuotaGovernor(user_minute=0, user_day=5, global_minute=0, global_day=100)
+        self.assertEqual(governor.remaining('1'), {'global_day': 100, 'user_day': 5})
+
+    def test_acquire_spends_user_and_global(self) -> None:
+        governor = QuotaGovernor(user_minute=3, user_day=10, global_minute=100, global_day=1000)
+        governor.acquire('1')
+        governor.acquire()
+        self.assertEqual(governor.remaining('1'), {'global_minute': 98, 'global_day': 998, 'user_minute': 2,
+                                                   'user_day': 9})
+        self.assertEqual(governor.remaining('2')['user_minute'], 3)
+
+    def test_user_quota_exceeded(self) -> None:
+        governor = QuotaGovernor(user_minute=2, user_day=0, global_minute=0, global_day=0)
+        governor.acquire('1')
+        governor.acquire('1')
+        with self.assertRaises(QuotaExceeded) as context:
+            governor.acquire('1')
+        self.assertEqual(context.exception.scope, 'user')
+        self.assertGreater(context.exception.retry_after, 0)
+        governor.acquire('2')  # Бюджет другого пользователя не израсходован
+        self.assertEqual((governor.allowed, governor.rejected), (3, 1))
+
+    def test_global_quota_exceeded(self) -> None:
+        governor = QuotaGovernor(user_minute=0, user_day=0, global_minute=0, global_day=1)
+        governor.acquire('1')
+        with self.assertRaises(QuotaExceeded) as context:
+            governor.acquire('2')
+        self.assertEqual(context.exception.scope, 'global')
+        self.assertEqual(governor.remaining(), {'global_day': 0})
+
+    def test_user_context(self) -> None:
+        governor = QuotaGovernor(user_minute=1, user_day=0, global_minute=0, global_day=0)
+        with user_context(1):
+            governor.acquire()
+            with self.assertRaises(QuotaExceeded):
+                governor.acquire()
+        governor.acquire()  # Вне контекста расходуется только общий бюджет
+        self.assertEqual(governor.remaining('1'), {'user_minute': 0})
+
+
+class UnavailableApi:
+    """
+    Класс - имитатор перегруженного сайта: на все запросы отвечает кодом 503
+    """
+
+    def __init__(self) -> None:
+        self.requests: List[str] = list()
+
+    def __call__(self, path: str, params: Dict[str, str]) -> Tuple[int, bytes]:
+        self.requests.append(path)
+        return 503, b'{"message": "Service unavailable"}'
+
+
+class ClientQuotaTest(unittest.TestCase):
+    """
+    Класс - проверка расхода квоты клиентом API: бюджет расходует каждое обращение к сайту, включая повторы
+    """
+
+    def make_client(self, api: UnavailableApi, governor: QuotaGovernor) -> HotelsApiClient:
+        return HotelsApiClient('test-quota', transport=MockTransport(api), retries=2, breaker=CircuitBreaker(),
+                               governor=governor)
+
+    def test_retries_charged(self) -> None:
+        api, governor = UnavailableApi(), QuotaGovernor(user_minute=0, user_day=0, global_minute=0, global_day=0)
+        with self.assertRaises(ApiError):
+            self.make_client(api, governor).get_raw('/properties/list', {})
+        self.assertEqual(len(api.requests), 3)
+        self.assertEqual(governor.allowed, 3)
+
+    def test_retries_stop_without_quota(self) -> None:
+        api, governor = UnavailableApi(), QuotaGovernor(user_minute=0, user_day=0, global_minute=2, global_day=0)
+        with self.assertRaises(QuotaExceeded):
+            self.make_client(api, governor).get_raw('/properties/list', {})
+        self.assertEqual(len(api.requests), 2)
+        self.assertEqual((governor.allowed, governor.rejected), (2, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
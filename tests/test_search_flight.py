@@ -0,0 +1,232 @@
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from bot.quota import QuotaExceeded
+from bot.search_flight import SearchFlight
+
+KEY = ('PRICE', 1000, '2026-01-01')
+HOTELS = {f'Hotel {number}': ['Street', 1000.0 + number] for number in range(10)}
+
+
+def first(count: int) -> Dict:
+    """
+    Функция получения первых (самых дешевых) отелей результата HOTELS
+
+    :param count: количество отелей (int)
+    :return: словарь с данными отелей (Dict)
+    """
+    return dict(list(HOTELS.items())[:count])
+
+
+def last(count: int) -> Dict:
+    """
+    Функция получения последних (самых дорогих) отелей результата HOTELS
+
+    :param count: количество отелей (int)
+    :return: словарь с данными отелей (Dict)
+    """
+    return dict(list(HOTELS.items())[-count:])
+
+
+class SearchFlightTest(unittest.TestCase):
+    """
+    Класс - проверка объединения одновременных поисков в потоках: выполняющий поиск (ведущий) ждет, пока к нему
+     присоединятся ожидающие, и только затем завершается
+    """
+
+    def setUp(self) -> None:
+        self.flight = SearchFlight(enabled=True)
+        self.release = threading.Event()
+        self.calls: List[str] = list()
+        self.executor = ThreadPoolExecutor(max_workers=4)
+        self.addCleanup(self.executor.shutdown)
+
+    def search(self, name: str, result: Dict, error: Optional[Exception] = None) -> Callable[[], Dict]:
+        def run() -> Dict:
+            self.calls.append(name)
+            if name == 'leader':
+                self.assertTrue(self.release.wait(2))
+            if error is not None:
+                raise error
+            return result
+
+        return run
+
+    def generator(self, name: str, results: List[Dict]) -> Callable[[], Iterator[Dict]]:
+        def run() -> Iterator[Dict]:
+            self.calls.append(name)
+            for result in results:
+                if name == 'leader':
+                    self.assertTrue(self.release.wait(2))
+                yield result
+
+        return run
+
+    def wait_coalesced(self, count: int) -> None:
+        deadline = time.monotonic() + 2
+        while self.flight.coalesced < count:
+            self.assertLess(time.monotonic(), deadline, 'ожидающий поиск не присоединился')
+            time.sleep(0.005)
+
+    def start_leader(self, quantity: int, error: Optional[Exception] = None) -> Future:
+        leader = self.executor.submit(self.flight.do, KEY, quantity, self.search('leader', HOTELS, error))
+        while 'leader' not in self.calls:
+            time.sleep(0.005)
+        return leader
+
+    def test_waiter_gets_head(self) -> None:
+        leader = self.start_leader(10)
+        waiter = self.executor.submit(self.flight.do, KEY, 3, self.search('waiter', dict()))
+        self.wait_coalesced(1)
+        self.release.set()
+        self.assertEqual(leader.result(2), HOTELS)
+        self.assertEqual(waiter.result(2), first(3))
+        self.assertEqual(self.calls, ['leader'])
+
+    def test_waiter_gets_tail(self) -> None:
+        leader = self.start_leader(10)
+        waiter = self.executor.submit(self.flight.do, KEY, 3, self.search('waiter', dict()), True)
+        self.wait_coalesced(1)
+        self.release.set()
+        leader.result(2)
+        self.assertEqual(waiter.result(2), last(3))
+
+    def test_larger_quantity_new_flight(self) -> None:
+        leader = self.start_leader(5)
+        larger = self.executor.submit(self.flight.do, KEY, 8, self.search('larger', first(8)))
+        self.assertEqual(larger.result(2), first(8))
+        self.assertEqual(self.flight.coalesced, 0)
+        self.release.set()
+        leader.result(2)
+        self.assertEqual(self.calls, ['leader', 'larger'])
+
+    def test_quota_exceeded_waiter_searches(self) -> None:
+        leader = self.start_leader(10, QuotaExceeded('user', 60))
+        waiter = self.executor.submit(self.flight.do, KEY, 3, self.search('waiter', first(3)))
+        self.wait_coalesced(1)
+        self.release.set()
+        self.assertRaises(QuotaExceeded, leader.result, 2)
+        self.assertEqual(waiter.result(2), first(3))
+        self.assertEqual(self.calls, ['leader', 'waiter'])
+
+    def test_error_passed_to_waiter(self) -> None:
+        leader = self.start_leader(10, RuntimeError('search failed'))
+        waiter = self.executor.submit(self.flight.do, KEY, 3, self.search('waiter', first(3)))
+        self.wait_coalesced(1)
+        self.release.set()
+        self.assertRaises(RuntimeError, leader.result, 2)
+        self.assertRaises(RuntimeError, waiter.result, 2)
+        self.assertEqual(self.calls, ['leader'])
+
+    def test_generator_waiter_gets_final_result(self) -> None:
+        leader = self.executor.submit(list, self.flight.iterate(KEY, 10, self.generator('leader',
+                                                                                          [first(5), HOTELS])))
+        while 'leader' not in self.calls:
+            time.sleep(0.005)
+        waiter = self.executor.submit(self.flight.do, KEY, 3, self.search('waiter', dict()), True)
+        self.wait_coalesced(1)
+        self.release.set()
+        self.assertEqual(leader.result(2), [first(5), HOTELS])
+        self.assertEqual(waiter.result(2), last(3))
+
+    def test_abandoned_generator_waiter_searches(self) -> None:
+        self.release.set()
+        leader = self.flight.iterate(KEY, 10, self.generator('leader', [first(5), HOTELS]))
+        self.assertEqual(next(leader), first(5))
+        waiter = self.executor.submit(list, self.flight.iterate(KEY, 3, self.generator('waiter', [first(3)])))
+        self.wait_coalesced(1)
+        leader.close()  # Ведущий перестал перебирать результаты
+        self.assertEqual(waiter.result(2), [first(3)])
+        self.assertEqual(self.calls, ['leader', 'waiter'])
+
+
+class AsyncSearchFlightTest(unittest.TestCase):
+    """
+    Класс - проверка объединения одновременных поисков внутри цикла событий
+    """
+
+    def setUp(self) -> None:
+        self.flight = SearchFlight(enabled=True)
+        self.calls: List[str] = list()
+
+    def search(self, name: str, result: Dict, error: Optional[Exception] = None) -> Callable:
+        async def run() -> Dict:
+            self.calls.append(name)
+            await asyncio.sleep(0.01)
+            if error is not None:
+                raise error
+            return result
+
+        return run
+
+    def generator(self, name: str, results: List[Dict]) -> Callable[[], AsyncIterator[Dict]]:
+        async def run() -> AsyncIterator[Dict]:
+            self.calls.append(name)
+            for result in results:
+                await asyncio.sleep(0.01)
+                yield result
+
+        return run
+
+    async def collect(self, iterator: AsyncIterator[Dict]) -> List[Dict]:
+        return [result async for result in iterator]
+
+    def test_waiter_gets_slice(self) -> None:
+        async def run() -> List:
+            return await asyncio.gather(self.flight.do_async(KEY, 10, self.search('leader', HOTELS)),
+                                        self.flight.do_async(KEY, 3, self.search('waiter', dict())),
+                                        self.flight.do_async(KEY, 3, self.search('waiter', dict()), True))
+
+        self.assertEqual(asyncio.run(run()), [HOTELS, first(3), last(3)])
+        self.assertEqual(self.calls, ['leader'])
+
+    def test_larger_quantity_new_flight(self) -> None:
+        async def run() -> List:
+            return await asyncio.gather(self.flight.do_async(KEY, 5, self.search('leader', first(5))),
+                                        self.flight.do_async(KEY, 8, self.search('larger', first(8))))
+
+        self.assertEqual(asyncio.run(run()), [first(5), first(8)])
+        self.assertEqual(self.calls, ['leader', 'larger'])
+
+    def test_quota_exceeded_waiter_searches(self) -> None:
+        async def run() -> List:
+            return await asyncio.gather(self.flight.do_async(KEY, 10, self.search('leader', HOTELS,
+                                                                                  QuotaExceeded('user', 60))),
+                                        self.flight.do_async(KEY, 3, self.search('waiter', first(3))),
+                                        return_exceptions=True)
+
+        leader, waiter = asyncio.run(run())
+        self.assertIsInstance(leader, QuotaExceeded)
+        self.assertEqual(waiter, first(3))
+        self.assertEqual(self.calls, ['leader', 'waiter'])
+
+    def test_generator_waiter_gets_final_result(self) -> None:
+        async def run() -> List:
+            return await asyncio.gather(
+                self.collect(self.flight.iterate_async(KEY, 10, self.generator('leader', [first(5), HOTELS]))),
+                self.collect(self.flight.iterate_async(KEY, 3, self.generator('waiter', [dict()]), True)))
+
+        self.assertEqual(asyncio.run(run()), [[first(5), HOTELS], [last(3)]])
+        self.assertEqual(self.calls, ['leader'])
+
+    def test_abandoned_generator_waiter_searches(self) -> None:
+        async def run() -> List[Dict]:
+            leader = self.flight.iterate_async(KEY, 10, self.generator('leader', [first(5), HOTELS]))
+            self.assertEqual(await leader.__anext__(), first(5))
+            waiter = asyncio.ensure_future(self.collect(self.flight.iterate_async(KEY, 3, self.generator(
+                'waiter', [first(3)]))))
+            await asyncio.sleep(0)
+            self.assertEqual(self.flight.coalesced, 1)
+            await leader.aclose()  # Ведущий перестал перебирать результаты
+            return await waiter
+
+        self.assertEqual(asyncio.run(run()), [first(3)])
+        self.assertEqual(self.calls, ['leader', 'waiter'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import threading
+import unittest
+from typing import Any, Dict, List, Optional, Tuple
+
+import telebot
+
+from bot.render import MESSAGE_LIMIT
+from bot.sender import OutboundQueue
+
+CHAT_ID = 100
+
+
+class StubBot:
+    """
+    Класс - бот телеграмма без сети, записывающий запросы. Первый запрос отмечает событие started и ждет события
+     release, чтобы следующие запросы успели встать в очередь; на первый запрос с текстом throttled_text отвечает
+      ошибкой 429
+
+    Args:
+        throttled_text (str): текст сообщения, на первую отправку которого телеграмм отвечает 429
+    """
+
+    def __init__(self, throttled_text: Optional[str] = None) -> None:
+        self.throttled_text = throttled_text
+        self.calls: List[Tuple[str, Dict[str, Any]]] = list()
+        self.started, self.release = threading.Event(), threading.Event()
+
+    def send_message(self, **kwargs) -> str:
+        return self.__call('send_message', kwargs)
+
+    def edit_message_text(self, **kwargs) -> str:
+        return self.__call('edit_message_text', kwargs)
+
+    def __call(self, method: str, kwargs: Dict[str, Any]) -> str:
+        if not self.calls:
+            self.started.set()
+            assert self.release.wait(2)
+        self.calls.append((method, kwargs))
+        if kwargs.get('text') == self.throttled_text:
+            self.throttled_text = None
+            raise telebot.apihelper.ApiTelegramException(method, None, {
+                'ok': False, 'error_code': 429, 'description': 'Too Many Requests: retry after 0.05',
+                'parameters': {'retry_after': 0.05}})
+        return f'{method}:{kwargs.get("text")}'
+
+
+class OutboundQueueTest(unittest.TestCase):
+    """
+    Класс - проверка склеивания сообщений, замены изменений сообщения последним и порядка отправки после ответа 429
+    """
+
+    def start(self, bot: StubBot) -> OutboundQueue:
+        outbox = OutboundQueue(bot, workers=1, rate=1000, burst=1000, chat_rate=1000, chat_burst=1000)
+        self.addCleanup(outbox.stop, 2)
+        outbox.submit('send_message', chat_id=CHAT_ID, text='start')  # Отправляется, пока очередь заполняется
+        self.assertTrue(bot.started.wait(2))
+        return outbox
+
+    def texts(self, bot: StubBot) -> List[str]:
+        return [kwargs['text'] for _, kwargs in bot.calls]
+
+    def test_merge_up_to_limit(self) -> None:
+        bot = StubBot()
+        outbox = self.start(bot)
+        parts = [letter * (MESSAGE_LIMIT // 2 - 1) for letter in 'abc']
+        futures = [outbox.submit('send_message', chat_id=CHAT_ID, text=part, parse_mode='html') for part in parts]
+        bot.release.set()
+        self.assertEqual(futures[2].result(2), f'send_message:{parts[2]}')
+        self.assertEqual(self.texts(bot), ['start', f'{parts[0]}\n{parts[1]}', parts[2]])
+        self.assertEqual(futures[0].result(), futures[1].result())
+        self.assertEqual(outbox.metrics()['coalesced'], 1)
+
+    def test_no_merge_across_parse_mode_or_markup(self) -> None:
+        bot = StubBot()
+        outbox = self.start(bot)
+        outbox.submit('send_message', chat_id=CHAT_ID, text='a', parse_mode='html')
+        outbox.submit('send_message', chat_id=CHAT_ID, text='b')
+        outbox.submit('send_message', chat_id=CHAT_ID, text='c', reply_markup='keyboard')
+        last = outbox.submit('send_message', chat_id=CHAT_ID, text='d')
+        bot.release.set()
+        last.result(2)
+        self.assertEqual(self.texts(bot), ['start', 'a', 'b', 'c', 'd'])
+
+    def test_only_last_edit_sent(self) -> None:
+        bot = StubBot()
+        outbox = self.start(bot)
+        edits = [outbox.submit('edit_message_text', chat_id=CHAT_ID, message_id=1, text=f'page {number}')
+                 for number in range(1, 4)]
+        other = outbox.submit('edit_message_text', chat_id=CHAT_ID, message_id=2, text='other')
+        bot.release.set()
+        other.result(2)
+        self.assertEqual(self.texts(bot), ['start', 'page 3', 'other'])
+        self.assertEqual([edit.result() for edit in edits], ['edit_message_text:page 3'] * 3)
+
+    def test_order_after_throttling(self) -> None:
+        bot = StubBot(throttled_text='a\nb')
+        outbox = self.start(bot)
+        first = outbox.submit('send_message', chat_id=CHAT_ID, text='a')
+        second = outbox.submit('send_message', chat_id=CHAT_ID, text='b')
+        third = outbox.submit('send_message', chat_id=CHAT_ID, text='c', reply_markup='keyboard')
+        bot.release.set()
+        self.assertEqual(third.result(2), 'send_message:c')
+        self.assertEqual(self.texts(bot), ['start', 'a\nb', 'a\nb', 'c'])
+        self.assertEqual(first.result(), 'send_message:a\nb')
+        self.assertEqual(second.result(), 'send_message:a\nb')
+        self.assertEqual(outbox.metrics()['throttled'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()